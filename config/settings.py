@@ -5,6 +5,7 @@ Generated by 'django-admin startproject' using Django 6.0.1.
 """
 
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -40,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'cs2_stats.middleware.MetricsMiddleware',
+    'cs2_stats.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,7 +56,8 @@ ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени рендеринга (заголовок Server-Timing)
+        'BACKEND': 'cs2_stats.utils.timing.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -114,4 +118,109 @@ STATICFILES_DIRS = [
 ]
 
 # Ключ Steam API
-STEAM_API_KEY = os.getenv('STEAM_API_KEY', '')
\ No newline at end of file
+STEAM_API_KEY = os.getenv('STEAM_API_KEY', '')
+# Адрес Steam Web API; для нагрузочных тестов - локальный сервер fake_steam_server
+STEAM_API_BASE_URL = os.getenv('STEAM_API_BASE_URL', 'https://api.steampowered.com')
+# Запись/воспроизведение ответов Steam (тесты без сети): файл кассеты
+# и режим record (запросы в сеть с записью) или replay (только из кассеты)
+STEAM_API_CASSETTE = os.getenv('STEAM_API_CASSETTE', '')
+STEAM_API_CASSETTE_MODE = os.getenv('STEAM_API_CASSETTE_MODE', 'replay')
+
+# Параметры HTTP клиента Steam API (пул соединений, повторы, лимит частоты)
+STEAM_API_CONNECT_TIMEOUT = float(os.getenv('STEAM_API_CONNECT_TIMEOUT', '3.05'))
+STEAM_API_READ_TIMEOUT = float(os.getenv('STEAM_API_READ_TIMEOUT', '10'))
+STEAM_API_MAX_RETRIES = int(os.getenv('STEAM_API_MAX_RETRIES', '3'))
+STEAM_API_RATE_LIMIT = float(os.getenv('STEAM_API_RATE_LIMIT', '10'))  # запросов в секунду на процесс
+STEAM_API_RATE_BURST = int(os.getenv('STEAM_API_RATE_BURST', '10'))
+STEAM_API_POOL_SIZE = int(os.getenv('STEAM_API_POOL_SIZE', '10'))
+
+# Кэш ответов Steam API (секунды)
+STEAM_CACHE_TTL = {
+    'summary': int(os.getenv('STEAM_CACHE_SUMMARY_TTL', '3600')),    # ник, аватар, страна
+    'playtime': int(os.getenv('STEAM_CACHE_PLAYTIME_TTL', '3600')),  # часы в CS2
+}
+STEAM_CACHE_NEGATIVE_TTL = int(os.getenv('STEAM_CACHE_NEGATIVE_TTL', '600'))  # неизвестные/приватные профили
+STEAM_CACHE_STALE_TTL = int(os.getenv('STEAM_CACHE_STALE_TTL', '86400'))      # сколько отдавать устаревшие данные
+
+# Как долго данные игрока считаются свежими и не запрашиваются из Steam повторно
+STEAM_REFRESH_INTERVAL = int(os.getenv('STEAM_REFRESH_INTERVAL', '3600'))
+
+# Максимум параллельных запросов к Steam из одного процесса
+STEAM_API_MAX_WORKERS = int(os.getenv('STEAM_API_MAX_WORKERS', '8'))
+
+# Кэш. По умолчанию - таблица в базе данных: она общая для всех процессов
+# веб-сервера и воркеров, поэтому через нее работают межпроцессные блокировки.
+# Таблица создается миграцией 0012_cache_table (или командой createcachetable)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'cs2_stats_cache'),
+    }
+}
+
+# Время хранения готовых графиков профиля в кэше (секунды).
+# Графики также сбрасываются при любом изменении месячной статистики игрока.
+CHART_CACHE_TTL = int(os.getenv('CHART_CACHE_TTL', str(7 * 24 * 3600)))
+
+# Рейтинги игроков: порог матчей по умолчанию и размер страницы
+LEADERBOARD_MIN_MATCHES = int(os.getenv('LEADERBOARD_MIN_MATCHES', '10'))
+LEADERBOARD_PAGE_SIZE = int(os.getenv('LEADERBOARD_PAGE_SIZE', '50'))
+
+# Процентили игроков среди всех игроков за месяц (команда build_percentiles).
+# Месяцы с числом записей больше PERCENTILE_MAX_POINTS хранятся квантилями.
+PERCENTILE_MAX_POINTS = int(os.getenv('PERCENTILE_MAX_POINTS', '2048'))
+
+# Тренды (команда compute_trends): окно скользящего среднего в месяцах
+# и порог z-оценки, после которого месяц считается аномальным
+TREND_WINDOW = int(os.getenv('TREND_WINDOW', '3'))
+TREND_ANOMALY_Z = float(os.getenv('TREND_ANOMALY_Z', '2.0'))
+
+# Токен для выгрузки данных (/export/...) без входа в админку:
+# заголовок "Authorization: Bearer <токен>". Пустой - только для staff.
+EXPORT_API_TOKEN = os.getenv('EXPORT_API_TOKEN', '')
+
+# JSON API (/api/...): строк на странице по умолчанию и максимум
+# (максимум также ограничивает число steam_ids в одном запросе)
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', '50'))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', '200'))
+
+# Каталог игроков и поиск по нику: максимум результатов поиска
+# (и подсказок при вводе) и игроков на странице каталога
+PLAYER_SEARCH_LIMIT = int(os.getenv('PLAYER_SEARCH_LIMIT', '20'))
+PLAYER_DIRECTORY_PAGE_SIZE = int(os.getenv('PLAYER_DIRECTORY_PAGE_SIZE', '50'))
+
+# Пакетная загрузка матчей (POST /api/matches/): токен для клиентов
+# без входа в админку и максимум матчей в одном запросе
+MATCH_INGEST_TOKEN = os.getenv('MATCH_INGEST_TOKEN', '')
+MATCH_INGEST_MAX_BATCH = int(os.getenv('MATCH_INGEST_MAX_BATCH', '5000'))
+
+# Замеры запросов (заголовок Server-Timing): SQL, Steam API, графики, шаблоны.
+# Запросы дольше бюджета (мс) пишутся в лог cs2_stats.timing
+REQUEST_TIMING = os.getenv('REQUEST_TIMING', 'True').lower() == 'true'
+REQUEST_TIMING_BUDGET_MS = int(os.getenv('REQUEST_TIMING_BUDGET_MS', '500'))
+
+# Метрики (/metrics, формат Prometheus). Процессы копят приращения в памяти
+# и раз в METRICS_FLUSH_INTERVAL секунд прибавляют их к общему файлу SQLite -
+# все WSGI-процессы одного сервера должны видеть один METRICS_DB.
+# Доступ: staff или заголовок "Authorization: Bearer <METRICS_TOKEN>".
+# В manage.py test метрики по умолчанию выключены, чтобы тесты не писали в METRICS_DB
+TESTING = sys.argv[1:2] == ['test']
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', str(not TESTING)).lower() == 'true'
+METRICS_DB = os.getenv('METRICS_DB', str(BASE_DIR / 'metrics.sqlite3'))
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Логи приложения (ошибки Steam, медленные запросы cs2_stats.timing) - в stderr
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {'format': '%(asctime)s %(levelname)s %(name)s: %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'plain'},
+    },
+    'loggers': {
+        'cs2_stats': {'handlers': ['console'], 'level': os.getenv('LOG_LEVEL', 'INFO')},
+    },
+}
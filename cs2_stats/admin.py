@@ -1,6 +1,6 @@
 from django.contrib import messages
 from django.contrib import admin
-from .models import Player, MonthlyStat
+from .models import Player, MonthlyStat, Match, SteamRefreshJob, YearStat, LeaderboardEntry
 
 
 @admin.register(Player)
@@ -15,8 +15,10 @@ class PlayerAdmin(admin.ModelAdmin):
     list_filter = ('country', 'last_updated')  # Фильтры по стране и дате обновления
 
     # Поля в форме редактирования
-    fields = ('steam_id', 'nickname', 'avatar', 'country', 'cs2_hours', 'last_updated')
-    readonly_fields = ('last_updated',)  # Поле только для чтения
+    fields = ('steam_id', 'nickname', 'avatar', 'country', 'cs2_hours', 'last_updated',
+              'total_matches', 'total_kills', 'total_deaths', 'total_wins')
+    # Итоги считаются автоматически из MonthlyStat
+    readonly_fields = ('last_updated', 'total_matches', 'total_kills', 'total_deaths', 'total_wins')
 
     # Кнопка обновления из Steam API
     def update_button(self, obj):
@@ -51,7 +53,7 @@ class PlayerAdmin(admin.ModelAdmin):
             from .models import Player
             try:
                 player = Player.objects.get(id=player_id)
-                if player.update_from_steam():
+                if player.update_from_steam(force=True):
                     messages.success(request, f"✅ Successfully updated {player.nickname} from Steam")
                 else:
                     messages.error(request, f"❌ Failed to update {player.nickname}")
@@ -73,13 +75,113 @@ class MonthlyStatAdmin(admin.ModelAdmin):
     """
     Админ-панель для модели MonthlyStat.
     Отображает расчетные поля (K/D ratio, Win Rate).
+    Показатели считаются в SQL, поэтому по ним можно сортировать.
     """
-    list_display = ('player', 'year', 'month', 'matches_played', 'kd_ratio', 'win_rate')
+    list_display = ('player', 'year', 'month', 'matches_played', 'kd_ratio', 'win_rate', 'kills_per_match')
     list_filter = ('year', 'month', 'player')  # Фильтры по году, месяцу и игроку
     search_fields = ('player__nickname',)  # Поиск по нику игрока
+    list_select_related = ('player',)  # Ник игрока без отдельного запроса на строку
 
     # Расчетные поля только для чтения
     readonly_fields = ('kd_ratio', 'win_rate')
 
     # Порядок полей в форме редактирования
-    fields = ('player', 'year', 'month', 'matches_played', 'kills', 'deaths', 'wins', 'kd_ratio', 'win_rate')
\ No newline at end of file
+    fields = ('player', 'year', 'month', 'matches_played', 'kills', 'deaths', 'wins', 'kd_ratio', 'win_rate')
+
+    def get_queryset(self, request):
+        """Добавляет показатели, рассчитанные в базе данных."""
+        return super().get_queryset(request).with_metrics()
+
+    @admin.display(description='K/D ratio', ordering='kd')
+    def kd_ratio(self, obj):
+        return obj.kd_ratio
+
+    @admin.display(description='Win rate', ordering='win_pct')
+    def win_rate(self, obj):
+        return obj.win_rate
+
+    @admin.display(description='Kills per match', ordering='kpm')
+    def kills_per_match(self, obj):
+        return obj.kills_per_match
+
+
+@admin.register(Match)
+class MatchAdmin(admin.ModelAdmin):
+    """
+    Админ-панель матчей.
+    Только просмотр и удаление: матчи загружаются командой ingest_matches
+    или через /api/matches/, удаление вычитает матч из месячной статистики.
+    """
+    list_display = ('player', 'played_at', 'map_name', 'kills', 'deaths', 'result')
+    list_filter = ('result', 'map_name')
+    search_fields = ('player__nickname', 'player__steam_id', 'external_id')
+    list_select_related = ('player',)
+    date_hierarchy = 'played_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(YearStat)
+class YearStatAdmin(admin.ModelAdmin):
+    """
+    Админ-панель годовых итогов.
+    Только просмотр: строки обновляются автоматически вместе с MonthlyStat.
+    """
+    list_display = ('player', 'year', 'months', 'matches_played', 'kd_ratio', 'win_rate')
+    list_filter = ('year',)
+    search_fields = ('player__nickname', 'player__steam_id')
+    list_select_related = ('player',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LeaderboardEntry)
+class LeaderboardEntryAdmin(admin.ModelAdmin):
+    """
+    Админ-панель таблицы рейтинга.
+    Только просмотр: строки пересчитываются вместе с итогами статистики.
+    """
+    list_display = ('player', 'year', 'country', 'matches_played', 'kd_ratio', 'win_rate', 'kills_per_match')
+    list_filter = ('year', 'country')
+    search_fields = ('player__nickname', 'player__steam_id')
+    list_select_related = ('player',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SteamRefreshJob)
+class SteamRefreshJobAdmin(admin.ModelAdmin):
+    """
+    Админ-панель очереди обновлений из Steam.
+    Показывает статус задач и позволяет перезапустить неудачные.
+    """
+    list_display = ('steam_id', 'status', 'attempts', 'run_after', 'updated_at', 'last_error')
+    list_filter = ('status',)
+    search_fields = ('steam_id',)
+    readonly_fields = ('created_at', 'updated_at')
+    actions = ['retry_jobs']
+
+    @admin.action(description='Retry selected jobs')
+    def retry_jobs(self, request, queryset):
+        """Возвращает выбранные завершенные задачи в очередь."""
+        retried = 0
+        for job in queryset.exclude(status__in=SteamRefreshJob.ACTIVE_STATUSES):
+            # Для Steam ID может уже существовать новая активная задача
+            if not SteamRefreshJob.objects.filter(
+                steam_id=job.steam_id, status__in=SteamRefreshJob.ACTIVE_STATUSES
+            ).exists():
+                job.retry()
+                retried += 1
+        messages.success(request, f"✅ {retried} jobs queued again")
@@ -0,0 +1,268 @@
+"""
+Read-only JSON API: игроки, их месячная статистика и итоги.
+
+Общие параметры запросов:
+- fields: поля ответа через запятую (по умолчанию - все), например fields=steam_id,nickname
+- cursor: курсор следующей страницы из ответа (keyset-пагинация)
+- limit: строк на странице (не больше API_MAX_PAGE_SIZE)
+
+Каждый ответ строится одним-двумя SQL-запросами независимо от размера
+страницы: из базы читаются только колонки выбранных полей (values()),
+показатели считаются в Python по счетчикам.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+
+from .models import MonthlyStat, Player, StatMetricsMixin, YearStat, build_totals
+from .utils.pagination import keyset_paginate
+from .utils.player_search import search_players as find_players
+
+TOTAL_COLUMNS = ('total_matches', 'total_kills', 'total_deaths', 'total_wins')
+COUNTER_COLUMNS = ('matches_played', 'kills', 'deaths', 'wins')
+
+# Поля ответа -> колонки БД, которые для них нужны
+PLAYER_FIELDS = {
+    'steam_id': ('steam_id',),
+    'nickname': ('nickname',),
+    'avatar': ('avatar',),
+    'country': ('country',),
+    'cs2_hours': ('cs2_hours',),
+    'last_updated': ('last_updated',),
+    'totals': TOTAL_COLUMNS,
+}
+STAT_FIELDS = {
+    'year': ('year',),
+    'month': ('month',),
+    'matches_played': ('matches_played',),
+    'kills': ('kills',),
+    'deaths': ('deaths',),
+    'wins': ('wins',),
+    'kd_ratio': ('kills', 'deaths'),
+    'win_rate': ('wins', 'matches_played'),
+    'kills_per_match': ('kills', 'matches_played'),
+    'updated_at': ('updated_at',),
+}
+
+# Сортировка страниц (последнее поле уникально в пределах выборки)
+PLAYER_ORDERING = ('steam_id',)
+STAT_ORDERING = ('-year', '-month')
+
+
+class APIError(Exception):
+    """Ошибка запроса к API: превращается в JSON-ответ с кодом status."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class _Counters(StatMetricsMixin):
+    """Счетчики строки values() - для расчета показателей так же, как у моделей."""
+
+    def __init__(self, row):
+        self.matches_played = row.get('matches_played', 0)
+        self.kills = row.get('kills', 0)
+        self.deaths = row.get('deaths', 0)
+        self.wins = row.get('wins', 0)
+
+
+def api_view(view):
+    """
+    Декоратор представлений API: только GET, ошибки APIError - JSON с кодом ошибки.
+    """
+    @require_GET
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return JsonResponse(view(request, *args, **kwargs))
+        except APIError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+    return wrapper
+
+
+def parse_fields(request, available):
+    """
+    Поля ответа из параметра fields.
+
+    Returns:
+        list: Запрошенные поля в порядке available
+
+    Raises:
+        APIError: Неизвестное поле
+    """
+    value = request.GET.get('fields', '').strip()
+    if not value:
+        return list(available)
+    requested = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = requested - set(available)
+    if unknown:
+        raise APIError(f"Unknown fields: {', '.join(sorted(unknown))}. "
+                       f"Available: {', '.join(available)}")
+    return [name for name in available if name in requested]
+
+
+def parse_limit(request):
+    """Размер страницы из параметра limit (API_PAGE_SIZE по умолчанию)."""
+    try:
+        limit = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise APIError("limit must be an integer")
+    return min(max(limit, 1), settings.API_MAX_PAGE_SIZE)
+
+
+def _columns(fields, available, ordering):
+    """Колонки БД для выбранных полей плюс колонки сортировки (нужны для курсора)."""
+    columns = [field.lstrip('-') for field in ordering]
+    for name in fields:
+        columns.extend(column for column in available[name] if column not in columns)
+    return columns
+
+
+def _paginate(request, queryset, ordering):
+    """Страница строк values() по курсору из запроса."""
+    try:
+        return keyset_paginate(queryset, ordering, cursor=request.GET.get('cursor'),
+                               per_page=parse_limit(request))
+    except ValueError as e:
+        raise APIError(str(e))
+
+
+def serialize_player(row, fields):
+    """Игрок из строки values() - только выбранные поля."""
+    data = {}
+    for name in fields:
+        if name == 'totals':
+            data['totals'] = build_totals(*(row[column] for column in TOTAL_COLUMNS))
+        else:
+            data[name] = row[name]
+    return data
+
+
+def serialize_stat(row, fields):
+    """Месячная статистика из строки values() - только выбранные поля."""
+    counters = _Counters(row)
+    return {
+        name: getattr(counters, name) if name in ('kd_ratio', 'win_rate', 'kills_per_match') else row[name]
+        for name in fields
+    }
+
+
+@api_view
+def players(request):
+    """
+    Список игроков, отсортированный по steam_id.
+    Фильтры:
+    - steam_ids: несколько игроков одним запросом (через запятую, не больше API_MAX_PAGE_SIZE)
+    - country: код страны
+    Итоги за все время - поле totals (fields=steam_id,totals).
+    """
+    fields = parse_fields(request, PLAYER_FIELDS)
+    queryset = Player.objects.all()
+
+    steam_ids = [value.strip() for value in request.GET.get('steam_ids', '').split(',') if value.strip()]
+    if len(steam_ids) > settings.API_MAX_PAGE_SIZE:
+        raise APIError(f"At most {settings.API_MAX_PAGE_SIZE} steam_ids per request")
+    if steam_ids:
+        queryset = queryset.filter(steam_id__in=steam_ids)
+    if request.GET.get('country'):
+        queryset = queryset.filter(country=request.GET['country'].strip().upper())
+
+    page = _paginate(request, queryset.values(*_columns(fields, PLAYER_FIELDS, PLAYER_ORDERING)),
+                     PLAYER_ORDERING)
+    result = {
+        'results': [serialize_player(row, fields) for row in page.items],
+        'next_cursor': page.next_cursor,
+    }
+    if steam_ids and page.start == 1 and page.next_cursor is None:
+        # Все найденные игроки поместились на страницу - сообщаем, кого нет
+        found = {row['steam_id'] for row in page.items}
+        result['missing'] = [steam_id for steam_id in steam_ids if steam_id not in found]
+    return result
+
+
+@api_view
+def search_players(request):
+    """
+    Подсказки для поля поиска: игроки по началу ника, подстроке или с опечаткой
+    (см. utils/player_search.py). Параметры: q - строка поиска, limit.
+    """
+    query = request.GET.get('q', '').strip()
+    limit = min(parse_limit(request), settings.PLAYER_SEARCH_LIMIT)
+    return {
+        'query': query,
+        'results': [
+            {
+                'steam_id': row['steam_id'],
+                'nickname': row['nickname'],
+                'avatar': row['avatar'],
+                'country': row['country'],
+                'url': reverse('player_profile', args=[row['steam_id']]),
+            }
+            for row in find_players(query, limit=limit)
+        ],
+    }
+
+
+@api_view
+def player_detail(request, steam_id):
+    """Один игрок (поля как в списке игроков)."""
+    fields = parse_fields(request, PLAYER_FIELDS)
+    row = (Player.objects.filter(steam_id=steam_id)
+           .values(*_columns(fields, PLAYER_FIELDS, PLAYER_ORDERING)).first())
+    if row is None:
+        raise APIError(f"Player {steam_id} not found", status=404)
+    return serialize_player(row, fields)
+
+
+@api_view
+def player_stats(request, steam_id):
+    """
+    Месячная статистика игрока от новых месяцев к старым.
+    Фильтр year - статистика за один год.
+    """
+    fields = parse_fields(request, STAT_FIELDS)
+    player_id = Player.objects.filter(steam_id=steam_id).values_list('pk', flat=True).first()
+    if player_id is None:
+        raise APIError(f"Player {steam_id} not found", status=404)
+
+    queryset = MonthlyStat.objects.filter(player_id=player_id)
+    if request.GET.get('year'):
+        try:
+            queryset = queryset.filter(year=int(request.GET['year']))
+        except ValueError:
+            raise APIError("year must be an integer")
+
+    page = _paginate(request, queryset.values(*_columns(fields, STAT_FIELDS, STAT_ORDERING)),
+                     STAT_ORDERING)
+    return {
+        'steam_id': steam_id,
+        'results': [serialize_stat(row, fields) for row in page.items],
+        'next_cursor': page.next_cursor,
+    }
+
+
+@api_view
+def player_totals(request, steam_id):
+    """
+    Итоги игрока за все время и по годам.
+    Читаются из готовых итогов (поля Player и YearStat), а не суммированием MonthlyStat.
+    """
+    row = Player.objects.filter(steam_id=steam_id).values('pk', *TOTAL_COLUMNS).first()
+    if row is None:
+        raise APIError(f"Player {steam_id} not found", status=404)
+
+    years = []
+    for year_row in (YearStat.objects.filter(player_id=row['pk'])
+                     .order_by('-year').values('year', 'months', *COUNTER_COLUMNS)):
+        totals = build_totals(*(year_row[column] for column in COUNTER_COLUMNS))
+        years.append({'year': year_row['year'], 'months': year_row['months'], **totals})
+
+    return {
+        'steam_id': steam_id,
+        'all_time': build_totals(*(row[column] for column in TOTAL_COLUMNS)),
+        'years': years,
+    }
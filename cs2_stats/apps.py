@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class Cs2StatsConfig(AppConfig):
     name = 'cs2_stats'
 
+    def ready(self):
+        # Подключаем обработчики сигналов моделей
+        from . import signals  # noqa: F401
@@ -1,5 +1,42 @@
 from django import forms
-from .models import MonthlyStat
+from .models import Match, MonthlyStat
+
+# Счетчики месячной статистики (не могут быть отрицательными)
+COUNTER_FIELDS = ('matches_played', 'kills', 'deaths', 'wins')
+
+
+def validate_wins(values):
+    """
+    Победы не могут превышать количество матчей.
+
+    Returns:
+        dict: {поле: сообщение об ошибке}
+    """
+    matches = values.get('matches_played')
+    wins = values.get('wins')
+    if matches is not None and wins is not None and wins > matches:
+        return {'wins': "Wins cannot be greater than matches played!"}
+    return {}
+
+
+def validate_stat_counters(values):
+    """
+    Правила для счетчиков месячной статистики при массовом импорте
+    (utils/importer.py): счетчики не отрицательные, победы не больше матчей.
+
+    Args:
+        values (dict): Уже приведенные к int значения (некоторые могут отсутствовать)
+
+    Returns:
+        dict: {поле: сообщение об ошибке}
+    """
+    errors = {}
+    for field in COUNTER_FIELDS:
+        if values.get(field) is not None and values[field] < 0:
+            errors[field] = "Value cannot be negative!"
+    for field, message in validate_wins(values).items():
+        errors.setdefault(field, message)
+    return errors
 
 
 class MonthlyStatForm(forms.ModelForm):
@@ -59,16 +96,13 @@ class MonthlyStatForm(forms.ModelForm):
         2. Уникальность месяца для игрока
         """
         cleaned_data = super().clean()
-        matches = cleaned_data.get('matches_played')
-        wins = cleaned_data.get('wins')
         year = cleaned_data.get('year')
         month = cleaned_data.get('month')
 
         # Проверка 1: Победы не могут превышать количество матчей
-        if matches is not None and wins is not None:
-            if wins > matches:
-                # Привязываем ошибку к полю 'wins' для отображения рядом с ним
-                self.add_error('wins', "Wins cannot be greater than matches played!")
+        for field, message in validate_wins(cleaned_data).items():
+            # Привязываем ошибку к полю для отображения рядом с ним
+            self.add_error(field, message)
 
         # Проверка 2: Уникальность комбинации игрок-год-месяц
         if self.player and year and month:
@@ -96,4 +130,23 @@ class MonthlyStatForm(forms.ModelForm):
                                    "Please edit the existing entry instead."
                                    )
 
-        return cleaned_data
\ No newline at end of file
+        return cleaned_data
+
+
+class StatImportForm(forms.Form):
+    """Форма загрузки файла с месячной статистикой (CSV или JSONL)."""
+    file = forms.FileField(widget=forms.ClearableFileInput(attrs={
+        'class': 'form-control',
+        'accept': '.csv,.jsonl,.ndjson,.json',
+    }))
+
+
+class MatchForm(forms.ModelForm):
+    """
+    Проверка одного матча при загрузке (команда ingest_matches и /api/matches/).
+    Используются только поля формы для приведения типов, см. utils/matches.py.
+    """
+
+    class Meta:
+        model = Match
+        fields = ['played_at', 'map_name', 'kills', 'deaths', 'result', 'external_id']
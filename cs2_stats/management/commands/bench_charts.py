@@ -0,0 +1,77 @@
+import json
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from cs2_stats.models import MonthlyStat
+from cs2_stats.utils.chart_utils import prepare_all_charts
+
+
+def legacy_prepare_all_charts(monthly_stats):
+    """
+    Прежняя реализация графиков профиля: go.Figure для каждого графика,
+    fig.to_json(), json.loads и повторный json.dumps данных и layout.
+    Оставлена только для сравнения скорости.
+    """
+    import plotly.graph_objects as go
+
+    charts = []
+    months = [f"{stat.year}-{stat.month:02d}" for stat in monthly_stats]
+    kpm_stats = [stat for stat in monthly_stats if stat.matches_played > 0]
+    series = [
+        (go.Scatter, months, [stat.kd_ratio for stat in monthly_stats],
+         dict(mode='lines+markers', name='K/D Ratio', line=dict(color='blue', width=3), marker=dict(size=8)),
+         'K/D Ratio'),
+        (go.Bar, months, [stat.win_rate for stat in monthly_stats],
+         dict(name='Win Rate %', marker_color='green'),
+         'Win Rate (%)'),
+        (go.Scatter, [f"{stat.year}-{stat.month:02d}" for stat in kpm_stats],
+         [round(stat.kills / stat.matches_played, 1) for stat in kpm_stats],
+         dict(mode='lines+markers', name='Kills per Match', line=dict(color='red', width=3), marker=dict(size=8)),
+         'Kills per Match'),
+    ]
+    for trace_class, x, y, trace_options, yaxis_title in series:
+        fig = go.Figure()
+        fig.add_trace(trace_class(x=x, y=y, **trace_options))
+        fig.update_layout(title='', xaxis_title='Month', yaxis_title=yaxis_title,
+                          template='plotly_white', height=400)
+        plot_data = json.loads(fig.to_json())
+        charts.append(json.dumps(plot_data['data']) + json.dumps(plot_data['layout']))
+    return charts
+
+
+class Command(BaseCommand):
+    """
+    Сравнивает скорость построения графиков профиля:
+    прежний путь через go.Figure и сборку Plotly JSON из списков.
+    """
+    help = 'Benchmark profile chart generation: plotly go.Figure vs. direct chart specs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='12,60,240', help='Comma separated month counts')
+        parser.add_argument('--repeat', type=int, default=5, help='Timing repeats (best is reported)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        self.stdout.write(f"{'months':>8} {'go.Figure ms':>14} {'specs ms':>10} {'speedup':>9}")
+
+        for size in (int(value) for value in options['sizes'].split(',')):
+            stats = []
+            for index in range(size):
+                matches = rng.randint(0, 80)
+                stats.append(MonthlyStat(
+                    year=2020 + index // 12, month=index % 12 + 1,
+                    matches_played=matches, kills=matches * rng.randint(8, 25),
+                    deaths=matches * rng.randint(8, 22), wins=rng.randint(0, matches),
+                ))
+
+            number = max(1, 200 // size)
+            legacy = min(timeit.repeat(lambda: legacy_prepare_all_charts(stats),
+                                       number=number, repeat=options['repeat'])) / number
+            current = min(timeit.repeat(lambda: prepare_all_charts(stats),
+                                        number=number, repeat=options['repeat'])) / number
+
+            self.stdout.write(
+                f"{size:>8} {legacy * 1000:>14.2f} {current * 1000:>10.2f} {legacy / current:>8.1f}x"
+            )
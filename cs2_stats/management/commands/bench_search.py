@@ -0,0 +1,51 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cs2_stats.models import Player
+from cs2_stats.utils.player_search import search_players
+
+
+class Command(BaseCommand):
+    """
+    Измеряет задержку поиска игроков на текущей базе: префиксы, подстроки
+    и ники с опечаткой, взятые из случайных игроков.
+    """
+    help = 'Benchmark player search latency (prefix, substring and fuzzy queries)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=300, help='Queries per kind')
+        parser.add_argument('--limit', type=int, default=10, help='Results per query')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        nicknames = list(Player.objects.exclude(nickname='').order_by('?')
+                         .values_list('nickname', flat=True)[:options['queries']])
+        if not nicknames:
+            raise CommandError("No players with nicknames to sample queries from")
+
+        def typo(nickname):
+            index = rng.randrange(len(nickname))
+            return nickname[:index] + rng.choice('abcdefghijklmnopqrstuvwxyz') + nickname[index + 1:]
+
+        kinds = {
+            'prefix': lambda nickname: nickname[:rng.randint(1, 4)],
+            'substring': lambda nickname: nickname[len(nickname) // 3:len(nickname) // 3 + 4],
+            # Триграмма из середины ника - частые совпадают у тысяч игроков
+            'trigram': lambda nickname: nickname[1:4],
+            'fuzzy': typo,
+        }
+        self.stdout.write(f"{Player.objects.count()} players")
+        self.stdout.write(f"{'kind':>10} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+        for kind, make_query in kinds.items():
+            timings = []
+            for nickname in nicknames:
+                query = make_query(nickname)
+                started = time.perf_counter()
+                search_players(query, limit=options['limit'])
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            p50 = timings[len(timings) // 2]
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(f"{kind:>10} {p50:>8.2f} {p95:>8.2f} {timings[-1]:>8.2f}")
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cs2_stats.utils.percentiles import build_percentiles
+
+
+class Command(BaseCommand):
+    """
+    Строит распределения K/D, win rate и убийств за матч по всем игрокам
+    за каждый месяц. По умолчанию пересобирает только месяцы, записи которых
+    изменились после прошлой перестройки - команду можно запускать по расписанию.
+    """
+    help = 'Build per-month population percentile sketches (only stale months unless --force)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild every month')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        report = build_percentiles(force=options['force'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Percentiles: {report['months_built']} months built, "
+            f"{report['months_skipped']} up to date, {report['months_deleted']} removed in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cs2_stats.models import Player
+from cs2_stats.utils.trends import compute_trends
+
+
+class Command(BaseCommand):
+    """
+    Пакетный расчет трендов всех игроков: скользящие средние,
+    изменения к прошлому месяцу, наклон регрессии и аномальные месяцы.
+    """
+    help = 'Compute rolling averages, deltas, regression slopes and anomaly flags for all players'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--steam-id', action='append', dest='steam_ids', default=[],
+            help='Compute only the given Steam ID (can be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        player_ids = None
+        if options['steam_ids']:
+            player_ids = Player.objects.filter(
+                steam_id__in=options['steam_ids']
+            ).values_list('pk', flat=True)
+
+        started = time.perf_counter()
+        report = compute_trends(player_ids)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Trends computed for {report['players']} players from {report['rows']} monthly rows "
+            f"in {elapsed:.2f}s ({report['deleted']} stale removed)"
+        ))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cs2_stats.utils.fake_steam import FakeSteamServer
+
+
+class Command(BaseCommand):
+    """
+    Запускает локальную замену Steam Web API (GetPlayerSummaries, GetOwnedGames)
+    для нагрузочных тестов без сети и ключа: приложение направляется на нее
+    через STEAM_API_BASE_URL. Профили детерминированы (зависят от --seed),
+    задержка и сбои настраиваются.
+    """
+    help = 'Run a local fake Steam Web API with configurable latency, throttling and 5xx injection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+        parser.add_argument('--port', type=int, default=8765, help='Port to listen on')
+        parser.add_argument('--latency', default='none',
+                            help='Latency in ms: none, fixed:50, uniform:20,200, normal:100,30, lognormal:80,0.5')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of 500/502/503 responses')
+        parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of random 429 responses')
+        parser.add_argument('--rate-limit', type=float, default=0.0,
+                            help='Requests per second before answering 429 with Retry-After (0 - unlimited)')
+        parser.add_argument('--missing-rate', type=float, default=0.05, help='Share of unknown Steam IDs')
+        parser.add_argument('--private-rate', type=float, default=0.1, help='Share of private profiles (no games)')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for profiles and injected faults')
+        parser.add_argument('--api-key', default='', help='Require this key (default: accept any)')
+
+    def handle(self, *args, **options):
+        try:
+            server = FakeSteamServer(
+                (options['host'], options['port']), latency=options['latency'],
+                error_rate=options['error_rate'], throttle_rate=options['throttle_rate'],
+                rate_limit=options['rate_limit'], missing_rate=options['missing_rate'],
+                private_rate=options['private_rate'], seed=options['seed'], api_key=options['api_key'],
+            )
+        except (ValueError, OSError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(f"Fake Steam API listening on {server.url}"))
+        self.stdout.write(f"Point the app at it: STEAM_API_BASE_URL={server.url}")
+        self.stdout.write(f"Response counters: {server.url}/__stats__ (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        self.stdout.write(f"Served: {server.stats}")
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cs2_stats.utils.fake_data import FAKE_STEAM_ID_BASE, delete_fake_players, generate_players
+
+
+class Command(BaseCommand):
+    """
+    Создает синтетических игроков с правдоподобной месячной статистикой -
+    для проверки скорости страниц и команд на больших объемах данных.
+    Steam ID синтетических игроков начинаются с 765611900, поэтому
+    их можно удалить, не трогая настоящих (--clear).
+    """
+    help = 'Generate N fake players with M months of realistic monthly stats'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=1000, help='Players to create')
+        parser.add_argument('--months', type=int, default=24, help='Months of stats per player')
+        parser.add_argument('--end', help='Last month as YYYY-MM (default: current month)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (same seed - same data)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Players per transaction')
+        parser.add_argument('--clear', action='store_true', help='Delete previously generated players first')
+
+    def handle(self, *args, **options):
+        end = None
+        if options['end']:
+            try:
+                year, month = (int(part) for part in options['end'].split('-'))
+            except ValueError:
+                raise CommandError("--end must look like 2025-06")
+            if not 1 <= month <= 12:
+                raise CommandError("--end month must be between 1 and 12")
+            end = (year, month)
+        if options['players'] < 0 or options['months'] < 1:
+            raise CommandError("--players must be >= 0 and --months >= 1")
+
+        if options['clear']:
+            deleted = delete_fake_players()
+            self.stdout.write(f"Deleted {deleted} fake players")
+
+        started = time.perf_counter()
+
+        def progress(created):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"  {created}/{options['players']} players ({created / elapsed:.0f} players/s)")
+
+        created = generate_players(
+            options['players'], options['months'], seed=options['seed'], end=end,
+            batch_size=max(1, options['batch_size']), progress=progress,
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(created)} players (Steam IDs from {FAKE_STEAM_ID_BASE}) in {elapsed:.1f}s"
+        ))
+        self.stdout.write("Run build_percentiles and compute_trends to update percentiles and trends")
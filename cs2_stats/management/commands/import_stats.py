@@ -0,0 +1,70 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cs2_stats.models import Player
+from cs2_stats.utils.importer import detect_format, import_stats, iter_rows
+
+
+class Command(BaseCommand):
+    """
+    Массовый импорт месячной статистики из CSV или JSONL.
+    Файл читается потоково и записывается пачками, поэтому размер файла
+    не ограничен памятью. Существующие месяцы обновляются.
+    """
+    help = 'Import monthly stats from a CSV or JSONL file (columns: steam_id, year, month, matches_played, kills, deaths, wins)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import ('-' reads from stdin)")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='File format (default: by extension)')
+        parser.add_argument('--steam-id', help='Import every row to this player (steam_id column is not needed)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per transaction')
+        parser.add_argument(
+            '--create-players', action='store_true',
+            help='Create players with unknown Steam IDs and queue their Steam refresh',
+        )
+
+    def handle(self, *args, **options):
+        player = None
+        if options['steam_id']:
+            player = Player.objects.filter(steam_id=options['steam_id']).first()
+            if player is None:
+                raise CommandError(f"Player {options['steam_id']} not found")
+
+        path = options['path']
+        fmt = options['format'] or ('csv' if path == '-' else detect_format(path))
+        started = time.perf_counter()
+
+        def progress(report):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"  {report.rows} rows read, {report.imported} imported, "
+                f"{report.rejected} rejected ({report.rows / elapsed:.0f} rows/s)"
+            )
+
+        # utf-8-sig: файлы из Excel начинаются с BOM
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8-sig', newline='')
+        try:
+            report = import_stats(
+                iter_rows(stream, fmt), player=player, chunk_size=max(1, options['chunk_size']),
+                create_players=options['create_players'], progress=progress,
+            )
+        except UnicodeDecodeError as e:
+            raise CommandError(f"{path} is not UTF-8 text ({e}); chunks before the error are imported")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for line, message in report.errors:
+            self.stdout.write(self.style.WARNING(f"  line {line}: {message}"))
+        if report.rejected > len(report.errors):
+            self.stdout.write(self.style.WARNING(
+                f"  ... and {report.rejected - len(report.errors)} more rejected rows"
+            ))
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report.imported} monthly stats for {len(report.players)} players "
+            f"from {report.rows} rows in {elapsed:.2f}s ({report.rejected} rejected)"
+        ))
@@ -0,0 +1,72 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cs2_stats.models import Player
+from cs2_stats.utils.importer import detect_format, iter_rows
+from cs2_stats.utils.matches import ingest_matches
+
+
+class Command(BaseCommand):
+    """
+    Массовая загрузка матчей из JSONL или CSV.
+    Файл читается потоково, матчи записываются пачками и в той же
+    транзакции суммируются в месячную статистику игроков.
+    Матчи с уже загруженным external_id пропускаются, поэтому файл
+    можно загружать повторно.
+    """
+    help = ('Ingest matches from a JSONL or CSV file '
+            '(fields: steam_id, played_at, map_name, kills, deaths, result, external_id)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to ingest ('-' reads from stdin)")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='File format (default: by extension)')
+        parser.add_argument('--steam-id', help='Ingest every match for this player (steam_id field is not needed)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Matches per transaction')
+        parser.add_argument(
+            '--create-players', action='store_true',
+            help='Create players with unknown Steam IDs and queue their Steam refresh',
+        )
+
+    def handle(self, *args, **options):
+        player = None
+        if options['steam_id']:
+            player = Player.objects.filter(steam_id=options['steam_id']).first()
+            if player is None:
+                raise CommandError(f"Player {options['steam_id']} not found")
+
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path == '-' else detect_format(path))
+        started = time.perf_counter()
+
+        def progress(report):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"  {report.rows} rows read, {report.imported} ingested, {report.skipped} skipped, "
+                f"{report.rejected} rejected ({report.rows / elapsed:.0f} rows/s)"
+            )
+
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8-sig', newline='')
+        try:
+            report = ingest_matches(
+                iter_rows(stream, fmt), player=player, chunk_size=max(1, options['chunk_size']),
+                create_players=options['create_players'], progress=progress,
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for line, message in report.errors:
+            self.stdout.write(self.style.WARNING(f"  line {line}: {message}"))
+        if report.rejected > len(report.errors):
+            self.stdout.write(self.style.WARNING(
+                f"  ... and {report.rejected - len(report.errors)} more rejected rows"
+            ))
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Ingested {report.imported} matches for {len(report.players)} players "
+            f"from {report.rows} rows in {elapsed:.2f}s "
+            f"({report.skipped} already ingested, {report.rejected} rejected)"
+        ))
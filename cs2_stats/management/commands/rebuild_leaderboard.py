@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cs2_stats.models import Player
+from cs2_stats.utils.leaderboard import rebuild_leaderboard
+
+
+class Command(BaseCommand):
+    """
+    Полностью перестраивает таблицу рейтинга (LeaderboardEntry)
+    из годовых итогов и итогов игроков за все время.
+    """
+    help = 'Rebuild the materialized leaderboard table from YearStat and player totals'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--steam-id', action='append', dest='steam_ids', default=[],
+            help='Rebuild only the given Steam ID (can be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        player_ids = None
+        if options['steam_ids']:
+            player_ids = Player.objects.filter(
+                steam_id__in=options['steam_ids']
+            ).values_list('pk', flat=True)
+
+        started = time.perf_counter()
+        written = rebuild_leaderboard(player_ids)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Leaderboard rebuilt: {written} entries in {elapsed:.2f}s"
+        ))
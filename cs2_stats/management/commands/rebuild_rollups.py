@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cs2_stats.utils.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    """
+    Пересчитывает годовые итоги (YearStat) и итоги игроков за все время
+    из MonthlyStat и сообщает о найденных расхождениях.
+    """
+    help = 'Recompute YearStat rows and player lifetime totals from MonthlyStat'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report drift without writing; exit with an error if drift is found',
+        )
+
+    def handle(self, *args, **options):
+        report = rebuild_rollups(dry_run=options['check'])
+        drift = sum(report.values())
+
+        self.stdout.write(
+            f"Years: {report['years_created']} missing, {report['years_updated']} wrong, "
+            f"{report['years_deleted']} extra; players: {report['players_updated']} wrong totals"
+        )
+
+        if options['check']:
+            if drift:
+                raise CommandError(f"Rollups drifted from MonthlyStat in {drift} rows")
+            self.stdout.write(self.style.SUCCESS("Rollups are consistent"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Rollups rebuilt, {drift} rows fixed"))
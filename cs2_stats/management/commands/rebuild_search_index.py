@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cs2_stats.utils.player_search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    """
+    Заново заполняет полнотекстовый индекс игроков (поиск по нику).
+    Нужна после массовых изменений Player в обход сигналов.
+    """
+    help = 'Rebuild the FTS5 player search index from the Player table'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        indexed = rebuild_search_index()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Search index rebuilt: {indexed} players in {elapsed:.2f}s"
+        ))
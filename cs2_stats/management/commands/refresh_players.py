@@ -0,0 +1,112 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cs2_stats.models import Player
+from cs2_stats.utils.leaderboard import sync_player_countries
+from cs2_stats.utils.player_search import index_players
+from cs2_stats.utils.steam_api import get_steam_api, MAX_STEAMIDS_PER_REQUEST
+
+
+class Command(BaseCommand):
+    """
+    Массовое обновление профилей игроков из Steam.
+    Использует пакетный GetPlayerSummaries (до 100 игроков за запрос)
+    и сохраняет изменения через bulk_update.
+    """
+    help = 'Refresh nickname, avatar and country (optionally CS2 hours) of all players from Steam in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--steam-id', action='append', dest='steam_ids', default=[],
+            help='Refresh only the given Steam ID (can be repeated)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=MAX_STEAMIDS_PER_REQUEST,
+            help=f'Players per Steam request (max {MAX_STEAMIDS_PER_REQUEST})',
+        )
+        parser.add_argument(
+            '--with-playtime', action='store_true',
+            help='Also refresh CS2 hours (one GetOwnedGames request per player, run in parallel)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, min(options['batch_size'], MAX_STEAMIDS_PER_REQUEST))
+        steam_api = get_steam_api()
+
+        self.with_playtime = options['with_playtime']
+
+        players = Player.objects.only(
+            'id', 'steam_id', 'nickname', 'avatar', 'country', 'cs2_hours'
+        ).order_by('pk')
+        if options['steam_ids']:
+            players = players.filter(steam_id__in=options['steam_ids'])
+
+        totals = {'processed': 0, 'updated': 0, 'missing': 0, 'requests': 0}
+        started = time.perf_counter()
+
+        batch = []
+        for player in players.iterator(chunk_size=batch_size):
+            batch.append(player)
+            if len(batch) == batch_size:
+                self._refresh_batch(steam_api, batch, totals)
+                batch = []
+        if batch:
+            self._refresh_batch(steam_api, batch, totals)
+
+        elapsed = time.perf_counter() - started
+        rate = totals['processed'] / elapsed if elapsed > 0 else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {totals['processed']} players in {elapsed:.2f}s "
+            f"({rate:.1f} players/s, {totals['requests']} Steam requests): "
+            f"{totals['updated']} updated, {totals['missing']} not returned by Steam"
+        ))
+
+    def _refresh_batch(self, steam_api, batch, totals):
+        """Обновляет одну пачку игроков: один запрос профилей к Steam и один bulk_update."""
+        steam_ids = [player.steam_id for player in batch]
+
+        # Команда всегда берет актуальные данные у Steam и обновляет кэш
+        if self.with_playtime:
+            profiles = steam_api.get_player_profiles(steam_ids, use_cache=False)
+            totals['requests'] += len(batch)
+        else:
+            summaries = steam_api.get_player_summaries(steam_ids, use_cache=False)
+            profiles = {
+                steam_id: {'summary': summaries.get(steam_id), 'playtime': 0}
+                for steam_id in steam_ids
+            }
+        totals['requests'] += 1
+        totals['processed'] += len(batch)
+
+        now = timezone.now()
+        changed_players = []
+        moved_players = []  # Игроки со сменившейся страной
+        renamed_players = []  # Игроки со сменившимся ником (для поискового индекса)
+        for player in batch:
+            profile = profiles[player.steam_id]
+            if profile['summary'] is None:
+                totals['missing'] += 1
+            changed = player.apply_steam_profile(profile)
+            if changed:
+                # auto_now не срабатывает в bulk_update - выставляем время вручную
+                player.last_updated = player.updated_at = now
+                changed_players.append(player)
+            if 'country' in changed:
+                moved_players.append(player)
+            if 'nickname' in changed:
+                renamed_players.append(player)
+
+        if changed_players:
+            Player.objects.bulk_update(
+                changed_players, ['nickname', 'avatar', 'country', 'cs2_hours', 'last_updated', 'updated_at']
+            )
+            totals['updated'] += len(changed_players)
+        if moved_players:
+            sync_player_countries(moved_players)
+        if renamed_players:
+            # bulk_update не отправляет сигналы - обновляем поиск сами
+            index_players((player.pk, player.nickname, player.steam_id) for player in renamed_players)
+
+        self.stdout.write(f"  batch of {len(batch)}: {len(changed_players)} updated")
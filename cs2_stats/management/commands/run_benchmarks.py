@@ -0,0 +1,184 @@
+import json
+import platform
+import statistics
+import subprocess
+import timeit
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from cs2_stats.forms import MonthlyStatForm
+from cs2_stats.models import Player
+from cs2_stats.utils.chart_cache import bump_stats_version
+from cs2_stats.utils.chart_utils import (
+    build_chart_specs, calculate_total_stats, charts_to_json, fig_to_html, kd_chart_spec, prepare_all_charts,
+)
+from cs2_stats.utils.fake_data import generate_players
+from cs2_stats.utils.stat_series import StatSeries
+
+
+def benchmarks(player, client):
+    """
+    Замеряемые операции для игрока с заданным числом месяцев.
+
+    Returns:
+        dict: {название: функция без аргументов}
+    """
+    stats = player.monthly_stats.all()
+    series = StatSeries.from_queryset(stats)
+    kd_spec = kd_chart_spec(series)
+    profile_url = reverse('player_profile', args=[player.steam_id])
+    charts_url = reverse('player_charts_json', args=[player.steam_id])
+    # Новый месяц - форма проходит все проверки, включая запрос уникальности
+    form_data = {'year': int(series.years[-1]) + 1, 'month': 1,
+                 'matches_played': 40, 'kills': 700, 'deaths': 600, 'wins': 22}
+    form = MonthlyStatForm(form_data, player=player)
+    if not form.is_valid():
+        raise CommandError(f"Benchmark form data is invalid: {form.errors.as_json()}")
+
+    def view(url):
+        response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(f"GET {url} returned {response.status_code}")
+
+    def charts_json_cold():
+        # Сбрасываем кэш графиков - замеряется построение, а не чтение из кэша
+        bump_stats_version(player.pk)
+        view(charts_url)
+
+    return {
+        'prepare_all_charts': lambda: prepare_all_charts(series),
+        'chart_specs_json': lambda: charts_to_json(build_chart_specs(series)),
+        'fig_to_html': lambda: fig_to_html(kd_spec, 'kd'),
+        'calculate_total_stats': lambda: calculate_total_stats(series),
+        'calculate_total_stats_db': lambda: calculate_total_stats(stats),
+        'monthly_stat_form': lambda: MonthlyStatForm(form_data, player=player).is_valid(),
+        'profile_view': lambda: view(profile_url),
+        'charts_json_view': charts_json_cold,
+    }
+
+
+def git_revision():
+    """(commit, есть ли незакоммиченные изменения) или (None, None) вне git."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=settings.BASE_DIR,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+class Command(BaseCommand):
+    """
+    Набор микробенчмарков: графики профиля, итоги, форма месячной статистики
+    и страница профиля целиком (через тестовый клиент со всеми middleware)
+    для игроков с разным числом месяцев. Данные для замеров создаются
+    во временной транзакции и откатываются. Результаты пишутся в JSON
+    с коммитом git, чтобы сравнивать их между коммитами (--compare).
+    """
+    help = 'Run micro-benchmarks at several data sizes and write results to JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='12,60,240', help='Comma separated month counts')
+        parser.add_argument('--repeat', type=int, default=5, help='Timing repeats per benchmark')
+        parser.add_argument('--only', help='Comma separated benchmark names to run')
+        parser.add_argument('--output', help='Result file (default: benchmarks/<commit>[-dirty].json)')
+        parser.add_argument('--compare', help='Previous result file to compare with')
+        parser.add_argument('--threshold', type=float, default=0.10,
+                            help='Slowdown (0.10 = 10%%) reported as a regression')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Exit with an error if any benchmark regressed')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(value) for value in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError("--sizes must be comma separated integers")
+        only = set(options['only'].split(',')) if options['only'] else None
+        baseline = self._load(options['compare']) if options['compare'] else None
+
+        commit, dirty = git_revision()
+        results = []
+        # Метрики выключены, чтобы замеры не попали в общий /metrics
+        with override_settings(METRICS_ENABLED=False), transaction.atomic():
+            client = Client(SERVER_NAME='localhost')
+            for size in sizes:
+                player_id, = generate_players(1, size, seed=size, skip_inactive=False)
+                player = Player.objects.get(pk=player_id)
+                for name, func in benchmarks(player, client).items():
+                    if only and name not in only:
+                        continue
+                    results.append(self._measure(name, size, func, options['repeat']))
+            transaction.set_rollback(True)
+
+        report = {
+            'meta': {
+                'commit': commit,
+                'dirty': dirty,
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'platform': platform.platform(),
+                'database': connection.vendor,
+                'sizes': sizes,
+                'repeat': options['repeat'],
+            },
+            'results': results,
+        }
+        name = f"{commit[:12]}{'-dirty' if dirty else ''}" if commit else 'local'
+        path = Path(options['output'] or settings.BASE_DIR / 'benchmarks' / f"{name}.json")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, indent=2) + '\n', encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f"Results written to {path}"))
+
+        if baseline is not None:
+            self._compare(baseline, results, options)
+
+    def _measure(self, name, size, func, repeat):
+        """Лучшее и медианное время одного вызова (число вызовов подбирается на ~0.2 с)."""
+        timer = timeit.Timer(func)
+        number, _ = timer.autorange()
+        timings = [total / number * 1000 for total in timer.repeat(repeat=max(1, repeat), number=number)]
+        result = {
+            'name': name, 'size': size, 'number': number,
+            'best_ms': round(min(timings), 4), 'median_ms': round(statistics.median(timings), 4),
+        }
+        self.stdout.write(f"{name:>26} {size:>5} months {result['best_ms']:>10.3f} ms "
+                          f"(median {result['median_ms']:.3f}, {number} loops)")
+        return result
+
+    @staticmethod
+    def _load(path):
+        try:
+            with open(path, encoding='utf-8') as stream:
+                return json.load(stream)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+
+    def _compare(self, baseline, results, options):
+        """Сравнивает лучшее время с прежним запуском по (название, размер)."""
+        previous = {(row['name'], row['size']): row['best_ms'] for row in baseline.get('results', [])}
+        self.stdout.write(f"\nCompared with {baseline.get('meta', {}).get('commit') or 'baseline'}:")
+        regressions = 0
+        for row in results:
+            before = previous.get((row['name'], row['size']))
+            if not before:
+                continue
+            change = row['best_ms'] / before - 1
+            line = f"{row['name']:>26} {row['size']:>5} {before:>10.3f} -> {row['best_ms']:>10.3f} ms {change:>+8.1%}"
+            if change > options['threshold']:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(line + '  REGRESSION'))
+            else:
+                self.stdout.write(line)
+
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f"{regressions} benchmark(s) slower by more than {options['threshold']:.0%}")
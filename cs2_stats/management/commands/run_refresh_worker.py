@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cs2_stats.models import SteamRefreshJob
+
+
+class Command(BaseCommand):
+    """
+    Воркер очереди обновлений из Steam (SteamRefreshJob).
+    Запускается отдельным процессом рядом с веб-сервером:
+        python manage.py run_refresh_worker
+    """
+    help = 'Process queued Steam refresh jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Process all jobs that are ready now and exit',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=2.0,
+            help='Seconds to wait when the queue is empty',
+        )
+        parser.add_argument(
+            '--stale-timeout', type=int, default=300,
+            help='Requeue jobs stuck in "running" for longer than this many seconds',
+        )
+
+    def handle(self, *args, **options):
+        processed = failed = 0
+
+        try:
+            while True:
+                requeued = SteamRefreshJob.requeue_stale(options['stale_timeout'])
+                if requeued:
+                    self.stdout.write(f"Requeued {requeued} stale jobs")
+
+                job = SteamRefreshJob.claim_next()
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+
+                try:
+                    ok = job.run()
+                except Exception as e:
+                    job.mark_failed(str(e))
+                    ok = False
+
+                processed += 1
+                if ok:
+                    self.stdout.write(f"Refreshed {job.steam_id}")
+                else:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(
+                        f"Failed {job.steam_id} (attempt {job.attempts}, now {job.status}): {job.last_error}"
+                    ))
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping worker")
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} jobs, {failed} failed"))
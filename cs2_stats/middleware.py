@@ -0,0 +1,83 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .utils.metrics import REQUEST_SECONDS, REQUESTS
+from .utils.timing import finish_request, start_request
+
+logger = logging.getLogger('cs2_stats.timing')
+
+# Остальные методы попадают в метрики как "other" (ограничение числа рядов)
+HTTP_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class MetricsMiddleware:
+    """
+    Время и число запросов по представлениям (имя из urls.py) для /metrics.
+    Запросы, не попавшие ни в один URL, считаются как view="unmatched".
+    При METRICS_ENABLED=False middleware отключается.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        method = request.method if request.method in HTTP_METHODS else 'other'
+        REQUEST_SECONDS.observe(elapsed, view=view, method=method)
+        REQUESTS.inc(view=view, method=method, status=str(response.status_code))
+        return response
+
+
+class ServerTimingMiddleware:
+    """
+    Замеры каждого запроса: число и время SQL-запросов, вызовов Steam API,
+    этапов построения графиков и рендеринга шаблонов. Итог отдается
+    в заголовке Server-Timing (виден во вкладке Network браузера),
+    запросы дольше REQUEST_TIMING_BUDGET_MS пишутся в лог одной JSON-строкой.
+    При REQUEST_TIMING=False middleware отключается целиком.
+    Стоит в начале MIDDLEWARE, чтобы учесть запросы остальных middleware.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.budget = settings.REQUEST_TIMING_BUDGET_MS / 1000
+
+    def __call__(self, request):
+        timings, token = start_request()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings.measure_query))
+                response = self.get_response(request)
+        finally:
+            finish_request(token)
+        total = time.perf_counter() - started
+
+        response['Server-Timing'] = timings.header(total)
+        if total > self.budget:
+            logger.warning(json.dumps({
+                'event': 'slow_request',
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 2),
+                'budget_ms': settings.REQUEST_TIMING_BUDGET_MS,
+                'stages': timings.as_dict(),
+            }))
+        return response
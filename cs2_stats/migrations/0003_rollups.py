@@ -0,0 +1,83 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:07
+
+import cs2_stats.models
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_rollups(apps, schema_editor):
+    """Заполняет YearStat и итоги игроков по уже существующей статистике."""
+    MonthlyStat = apps.get_model('cs2_stats', 'MonthlyStat')
+    YearStat = apps.get_model('cs2_stats', 'YearStat')
+    Player = apps.get_model('cs2_stats', 'Player')
+
+    counters = ('matches_played', 'kills', 'deaths', 'wins')
+    grouped = MonthlyStat.objects.order_by().values('player_id', 'year').annotate(
+        months=Count('id'), **{f'sum_{field}': Sum(field) for field in counters}
+    )
+    YearStat.objects.bulk_create([
+        YearStat(player_id=row['player_id'], year=row['year'], months=row['months'],
+                 **{field: row[f'sum_{field}'] for field in counters})
+        for row in grouped
+    ], batch_size=500)
+
+    totals = MonthlyStat.objects.order_by().values('player_id').annotate(
+        **{f'sum_{field}': Sum(field) for field in counters}
+    )
+    for row in totals:
+        Player.objects.filter(pk=row['player_id']).update(
+            total_matches=row['sum_matches_played'],
+            total_kills=row['sum_kills'],
+            total_deaths=row['sum_deaths'],
+            total_wins=row['sum_wins'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs2_stats', '0002_steamrefreshjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='player',
+            name='total_deaths',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='total_kills',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='total_matches',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='total_wins',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='YearStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('months', models.IntegerField(default=0)),
+                ('matches_played', models.IntegerField(default=0)),
+                ('kills', models.IntegerField(default=0)),
+                ('deaths', models.IntegerField(default=0)),
+                ('wins', models.IntegerField(default=0)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='year_stats', to='cs2_stats.player')),
+            ],
+            options={
+                'ordering': ['-year'],
+                'unique_together': {('player', 'year')},
+            },
+            bases=(cs2_stats.models.StatMetricsMixin, models.Model),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
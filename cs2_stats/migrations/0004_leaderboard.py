@@ -0,0 +1,65 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:10
+
+import cs2_stats.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_leaderboard(apps, schema_editor):
+    """Заполняет рейтинг из уже посчитанных итогов (YearStat и поля Player)."""
+    LeaderboardEntry = apps.get_model('cs2_stats', 'LeaderboardEntry')
+    Player = apps.get_model('cs2_stats', 'Player')
+    YearStat = apps.get_model('cs2_stats', 'YearStat')
+
+    def entry(player_id, year, country, matches, kills, deaths, wins):
+        return LeaderboardEntry(
+            player_id=player_id, year=year, country=country,
+            matches_played=matches, kills=kills, deaths=deaths, wins=wins,
+            kd=kills / deaths if deaths > 0 else 0.0,
+            win_pct=wins / matches * 100 if matches > 0 else 0.0,
+            kpm=kills / matches if matches > 0 else 0.0,
+        )
+
+    countries = {}
+    entries = []
+    for player in Player.objects.all():
+        countries[player.pk] = player.country
+        if player.total_matches > 0:
+            entries.append(entry(player.pk, 0, player.country, player.total_matches,
+                                 player.total_kills, player.total_deaths, player.total_wins))
+    for year_stat in YearStat.objects.filter(matches_played__gt=0):
+        entries.append(entry(year_stat.player_id, year_stat.year, countries.get(year_stat.player_id, ''),
+                             year_stat.matches_played, year_stat.kills, year_stat.deaths, year_stat.wins))
+    LeaderboardEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs2_stats', '0003_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('country', models.CharField(blank=True, max_length=10)),
+                ('matches_played', models.IntegerField(default=0)),
+                ('kills', models.IntegerField(default=0)),
+                ('deaths', models.IntegerField(default=0)),
+                ('wins', models.IntegerField(default=0)),
+                ('kd', models.FloatField(default=0)),
+                ('win_pct', models.FloatField(default=0)),
+                ('kpm', models.FloatField(default=0)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='cs2_stats.player')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['year', '-kd', 'player'], name='lb_kd_idx'), models.Index(fields=['year', '-win_pct', 'player'], name='lb_win_pct_idx'), models.Index(fields=['year', '-kpm', 'player'], name='lb_kpm_idx'), models.Index(fields=['year', 'country', '-kd', 'player'], name='lb_country_kd_idx'), models.Index(fields=['year', 'country', '-win_pct', 'player'], name='lb_country_win_pct_idx'), models.Index(fields=['year', 'country', '-kpm', 'player'], name='lb_country_kpm_idx')],
+                'unique_together': {('player', 'year')},
+            },
+            bases=(cs2_stats.models.StatMetricsMixin, models.Model),
+        ),
+        migrations.RunPython(populate_leaderboard, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs2_stats', '0004_leaderboard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PercentileSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('metric', models.CharField(choices=[('kd', 'K/D Ratio'), ('win_pct', 'Win Rate'), ('kpm', 'Kills per Match')], max_length=10)),
+                ('population', models.IntegerField()),
+                ('values', models.BinaryField()),
+                ('built_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('year', 'month', 'metric')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs2_stats', '0005_percentilesketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerTrend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('months', models.IntegerField(default=0)),
+                ('kd_slope', models.FloatField(default=0)),
+                ('win_rate_slope', models.FloatField(default=0)),
+                ('kd_delta', models.FloatField(blank=True, null=True)),
+                ('win_rate_delta', models.FloatField(blank=True, null=True)),
+                ('series', models.JSONField(default=dict)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('player', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='trend', to='cs2_stats.player')),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs2_stats', '0006_playertrend'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monthlystat',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs2_stats', '0007_monthlystat_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='monthlystat',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='player',
+            name='last_updated',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:26
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+SEARCH_TABLE = 'cs2_stats_player_search'
+
+
+def create_search_table(apps, schema_editor):
+    """Полнотекстовый trigram-индекс игроков (только SQLite FTS5) и его заполнение."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+        f"USING fts5(nickname, steam_id, tokenize='trigram')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {SEARCH_TABLE} (rowid, nickname, steam_id) "
+        f"SELECT id, nickname, steam_id FROM cs2_stats_player"
+    )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs2_stats', '0008_export_watermark_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(django.db.models.functions.text.Lower('nickname'), models.F('id'), name='player_nickname_idx'),
+        ),
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cs2_stats', '0009_player_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Match',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('played_at', models.DateTimeField()),
+                ('map_name', models.CharField(max_length=32)),
+                ('kills', models.IntegerField(default=0)),
+                ('deaths', models.IntegerField(default=0)),
+                ('result', models.CharField(choices=[('win', 'Win'), ('loss', 'Loss'), ('draw', 'Draw')], max_length=4)),
+                ('external_id', models.CharField(blank=True, max_length=64)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='cs2_stats.player')),
+            ],
+            options={
+                'ordering': ['-played_at'],
+                'indexes': [models.Index(fields=['player', 'played_at'], name='match_player_played_idx'), models.Index(fields=['player', 'map_name', 'played_at'], name='match_player_map_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('external_id', ''), _negated=True), fields=('player', 'external_id'), name='match_external_id_uniq')],
+            },
+        ),
+    ]
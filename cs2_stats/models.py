@@ -1,7 +1,15 @@
 # cs2_stats/models.py
-from django.db import models
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, F, Q, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Lower
 from django.utils import timezone
 
+logger = logging.getLogger(__name__)
+
 
 class Player(models.Model):
     """
@@ -13,49 +21,252 @@ class Player(models.Model):
     avatar = models.URLField(max_length=500, blank=True)     # URL аватара
     country = models.CharField(max_length=10, blank=True)    # Код страны (RU, US, etc.)
     cs2_hours = models.FloatField(default=0)                 # Часы в CS2
-    last_updated = models.DateTimeField(auto_now=True)       # Время последнего обновления
+    last_updated = models.DateTimeField(auto_now=True, db_index=True)  # Время последнего обновления
+
+    # Итоги за все время. Поддерживаются инкрементально при каждом изменении
+    # MonthlyStat (см. utils/rollups.py), пересчитываются командой rebuild_rollups
+    total_matches = models.IntegerField(default=0)
+    total_kills = models.IntegerField(default=0)
+    total_deaths = models.IntegerField(default=0)
+    total_wins = models.IntegerField(default=0)
+    # Время последнего изменения любого поля, включая итоги (водяной знак выгрузки игроков).
+    # last_updated меняется только при обновлении из Steam
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        # Поиск по началу ника и каталог игроков в алфавитном порядке
+        # (см. utils/player_search.py)
+        indexes = [models.Index(Lower('nickname'), 'id', name='player_nickname_idx')]
 
     def __str__(self):
         return f"{self.nickname} ({self.steam_id})"
 
-    def update_from_steam(self):
+    def total_stats(self):
+        """
+        Итоговая статистика за все время из полей игрока (без запросов к MonthlyStat).
+
+        Returns:
+            dict: matches, kills, deaths, wins, kd, win_rate
+        """
+        return build_totals(self.total_matches, self.total_kills, self.total_deaths, self.total_wins)
+
+    def apply_steam_summary(self, player_data):
+        """
+        Переносит данные из ответа GetPlayerSummaries в поля игрока.
+        Не сохраняет объект в базу.
+
+        Args:
+            player_data (dict): Данные игрока из Steam API
+
+        Returns:
+            list: Названия полей, значения которых изменились
+        """
+        new_values = {
+            'nickname': player_data.get('personaname', self.nickname),
+            'avatar': player_data.get('avatarfull', self.avatar),
+            # Страна может быть не указана в Steam профиле - тогда пустая строка
+            'country': player_data.get('loccountrycode') or '',
+        }
+
+        changed = []
+        for field, value in new_values.items():
+            if getattr(self, field) != value:
+                setattr(self, field, value)
+                changed.append(field)
+        return changed
+
+    def apply_steam_profile(self, profile):
+        """
+        Переносит профиль и время игры (результат SteamAPI.get_player_profile)
+        в поля игрока. Не сохраняет объект в базу.
+
+        Returns:
+            list: Названия полей, значения которых изменились
+        """
+        changed = []
+        if profile['summary']:
+            changed = self.apply_steam_summary(profile['summary'])
+
+        # Время игры обновляем только если Steam его вернул (профиль не приватный)
+        playtime = profile['playtime']
+        if playtime > 0 and playtime != self.cs2_hours:
+            self.cs2_hours = playtime
+            changed.append('cs2_hours')
+        return changed
+
+    def is_steam_data_fresh(self):
+        """
+        Проверяет, обновлялись ли данные из Steam недавно
+        (не раньше чем STEAM_REFRESH_INTERVAL секунд назад).
+        """
+        if not self.last_updated:
+            return False
+        age = timezone.now() - self.last_updated
+        return age.total_seconds() < settings.STEAM_REFRESH_INTERVAL
+
+    def update_from_steam(self, force=False):
         """
         Обновляет данные игрока из Steam API.
-        Возвращает True при успехе, False при ошибке.
+        Если данные еще свежие, запрос к Steam не выполняется.
+
+        Args:
+            force (bool): Обновить даже если данные свежие, минуя кэш Steam
+                          (новый игрок, ручное обновление из админки)
+
+        Returns:
+            bool: True при успехе, False если Steam не вернул профиль или при ошибке
         """
+        if not force and self.is_steam_data_fresh():
+            return True
+
         try:
-            from .utils.steam_api import SteamAPI
-            steam_api = SteamAPI()
+            from .utils.singleflight import single_flight
+            from .utils.steam_client import get_client
 
-            # Получаем базовую информацию об игроке
-            player_data = steam_api.get_player_summary(self.steam_id)
+            # Одновременные обновления одного игрока (из разных потоков и процессов)
+            # объединяются: к Steam уходит один запрос, остальные ждут его результат.
+            # Блокировка живет дольше худшего случая обновления - профиль и время игры
+            # (при занятом пуле - друг за другом) со всеми повторами
+            updated, shared = single_flight(
+                f"steam-refresh:{self.steam_id}",
+                lambda: self._fetch_from_steam(force),
+                lock_timeout=2 * get_client().max_duration(),
+            )
+            if updated and shared:
+                # Данные сохранил другой запрос - перечитываем их из базы
+                self.refresh_from_db()
+            return updated
 
-            if player_data:
-                self.nickname = player_data.get('personaname', self.nickname)
-                self.avatar = player_data.get('avatarfull', self.avatar)
+        except Exception:
+            logger.exception("Error updating player %s from Steam", self.steam_id)
+            return False
 
-                # Страна может быть не указана в Steam профиле
-                country_code = player_data.get('loccountrycode')
-                if country_code:
-                    self.country = country_code
-                else:
-                    self.country = ''  # Пустая строка если нет страны
+    def _fetch_from_steam(self, force):
+        """Запрашивает профиль из Steam и сохраняет его. Возвращает True при успехе."""
+        try:
+            from .utils.steam_api import get_steam_api
+            steam_api = get_steam_api()
 
-            # Получаем время игры в CS2
-            playtime = steam_api.get_cs2_playtime(self.steam_id)
-            if playtime > 0:
-                self.cs2_hours = playtime
+            # Профиль и время игры в CS2 запрашиваются параллельно
+            profile = steam_api.get_player_profile(self.steam_id, use_cache=not force)
+            if profile['summary'] is None:
+                # Steam не вернул профиль: неизвестный Steam ID или ошибка запроса
+                return False
+            changed = self.apply_steam_profile(profile)
 
             self.last_updated = timezone.now()
-            self.save()
+            # Сохраняем только поля Steam, чтобы не затереть итоги,
+            # которые обновляются параллельно через F() выражения
+            self.save(update_fields=['nickname', 'avatar', 'country', 'cs2_hours', 'last_updated', 'updated_at'])
+            if 'country' in changed:
+                from .utils.leaderboard import sync_player_countries
+                sync_player_countries([self])
             return True
 
-        except Exception as e:
-            print(f"Error updating from Steam: {e}")
+        except Exception:
+            logger.exception("Error updating player %s from Steam", self.steam_id)
             return False
 
 
-class MonthlyStat(models.Model):
+def safe_divide(numerator, denominator, multiplier=1):
+    """
+    Выражение БД для деления с защитой от деления на ноль.
+    Возвращает numerator / denominator * multiplier (float) или 0,
+    если знаменатель равен нулю.
+    """
+    return Case(
+        When(**{f"{denominator}__gt": 0},
+             then=Cast(numerator, models.FloatField()) * multiplier / F(denominator)),
+        default=Value(0.0),
+        output_field=models.FloatField(),
+    )
+
+
+class MonthlyStatQuerySet(models.QuerySet):
+    """
+    QuerySet месячной статистики с расчетом показателей на стороне БД.
+    Аннотации можно использовать для сортировки и фильтрации.
+    """
+
+    def with_metrics(self):
+        """
+        Добавляет к строкам показатели, рассчитанные в SQL (без округления):
+        - kd: убийства / смерти
+        - win_pct: победы / матчи * 100
+        - kpm: убийства / матчи
+        """
+        return self.annotate(
+            kd=safe_divide('kills', 'deaths'),
+            win_pct=safe_divide('wins', 'matches_played', 100),
+            kpm=safe_divide('kills', 'matches_played'),
+        )
+
+    def totals(self):
+        """
+        Суммарная статистика одним запросом aggregate(Sum(...)).
+
+        Returns:
+            dict: matches, kills, deaths, wins, kd, win_rate
+                  (тот же формат, что у calculate_total_stats)
+        """
+        sums = self.aggregate(
+            matches=Coalesce(Sum('matches_played'), 0),
+            kills=Coalesce(Sum('kills'), 0),
+            deaths=Coalesce(Sum('deaths'), 0),
+            wins=Coalesce(Sum('wins'), 0),
+        )
+        return build_totals(sums['matches'], sums['kills'], sums['deaths'], sums['wins'])
+
+
+def build_totals(matches, kills, deaths, wins):
+    """
+    Формирует словарь итоговой статистики по суммам счетчиков.
+    K/D и win rate считаются по суммам (избегаем деления на 0).
+    """
+    total = {
+        'matches': matches,
+        'kills': kills,
+        'deaths': deaths,
+        'wins': wins,
+        'kd': 0,
+        'win_rate': 0,
+    }
+    if deaths > 0:
+        total['kd'] = round(kills / deaths, 2)
+    if matches > 0:
+        total['win_rate'] = round((wins / matches) * 100, 1)
+    return total
+
+
+class StatMetricsMixin:
+    """
+    Производные показатели для моделей со счетчиками
+    matches_played, kills, deaths, wins.
+    """
+
+    @property
+    def kd_ratio(self):
+        """Расчет K/D ratio (убийства/смерти)."""
+        if self.deaths > 0:
+            return round(self.kills / self.deaths, 2)
+        return 0.0
+
+    @property
+    def win_rate(self):
+        """Расчет процента побед (победы/матчи * 100%)."""
+        if self.matches_played > 0:
+            return round((self.wins / self.matches_played) * 100, 1)
+        return 0.0
+
+    @property
+    def kills_per_match(self):
+        """Среднее количество убийств за матч."""
+        if self.matches_played > 0:
+            return round(self.kills / self.matches_played, 1)
+        return 0.0
+
+
+class MonthlyStat(StatMetricsMixin, models.Model):
     """
     Модель месячной статистики игрока.
     Один игрок (Player) может иметь много записей MonthlyStat.
@@ -76,6 +287,9 @@ class MonthlyStat(models.Model):
     kills = models.IntegerField(default=0)          # Убийства
     deaths = models.IntegerField(default=0)         # Смерти
     wins = models.IntegerField(default=0)           # Победы
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # Время последнего изменения
+
+    objects = MonthlyStatQuerySet.as_manager()
 
     class Meta:
         unique_together = ['player', 'year', 'month']  # Одна запись на месяц для игрока
@@ -84,16 +298,373 @@ class MonthlyStat(models.Model):
     def __str__(self):
         return f"{self.player.nickname} - {self.year}/{self.month}"
 
-    @property
-    def kd_ratio(self):
-        """Расчет K/D ratio (убийства/смерти)."""
-        if self.deaths > 0:
-            return round(self.kills / self.deaths, 2)
-        return 0.0
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет статистику и в той же транзакции обновляет
+        годовые итоги (YearStat) и итоги игрока за все время.
+        """
+        from .utils.rollups import record_change
 
-    @property
-    def win_rate(self):
-        """Расчет процента побед (победы/матчи * 100%)."""
-        if self.matches_played > 0:
-            return round((self.wins / self.matches_played) * 100, 1)
-        return 0.0
\ No newline at end of file
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                # Старые значения нужны, чтобы применить к итогам только разницу
+                previous = (MonthlyStat.objects.select_for_update()
+                            .filter(pk=self.pk)
+                            .values('player_id', 'year', 'matches_played', 'kills', 'deaths', 'wins')
+                            .first())
+            super().save(*args, **kwargs)
+            record_change(previous, self)
+
+
+class MatchQuerySet(models.QuerySet):
+    """QuerySet матчей с пакетным вычитанием удаленных матчей из месячной статистики."""
+
+    def delete(self):
+        """
+        Удаляет матчи и вычитает их из месячной статистики одним rollup_matches
+        на весь набор (а не upsert и пересчетом итогов на каждый матч).
+        Удаленные объекты собирает сигнал post_delete (см. signals.py).
+        """
+        from .utils.matches import rollup_matches
+
+        self._deleted_matches = []
+        with transaction.atomic(using=self.db):
+            result = super().delete()
+            rollup_matches(self._deleted_matches, sign=-1)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class Match(models.Model):
+    """
+    Один сыгранный матч игрока.
+    Матчи суммируются в MonthlyStat при записи (см. utils/matches.py),
+    поэтому страница профиля по-прежнему читает месячные строки,
+    а не перебирает все матчи.
+    """
+    WIN = 'win'
+    LOSS = 'loss'
+    DRAW = 'draw'
+    RESULT_CHOICES = [(WIN, 'Win'), (LOSS, 'Loss'), (DRAW, 'Draw')]
+
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='matches')
+    played_at = models.DateTimeField()                   # Время начала матча
+    map_name = models.CharField(max_length=32)           # Карта (de_mirage, de_inferno, ...)
+    kills = models.IntegerField(default=0)
+    deaths = models.IntegerField(default=0)
+    result = models.CharField(max_length=4, choices=RESULT_CHOICES)
+    # ID матча во внешнем источнике: повторная загрузка того же матча пропускается
+    external_id = models.CharField(max_length=64, blank=True)
+
+    objects = MatchQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-played_at']
+        indexes = [
+            # История игрока за период и статистика по картам за период
+            models.Index(fields=['player', 'played_at'], name='match_player_played_idx'),
+            models.Index(fields=['player', 'map_name', 'played_at'], name='match_player_map_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['player', 'external_id'], condition=~Q(external_id=''),
+                                    name='match_external_id_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.player.nickname} - {self.map_name} {self.played_at:%Y-%m-%d} ({self.result})"
+
+
+class YearStat(StatMetricsMixin, models.Model):
+    """
+    Годовые итоги игрока - сумма его MonthlyStat за год.
+    Обновляется инкрементально вместе с MonthlyStat,
+    поэтому годовые показатели читаются одной строкой.
+    """
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='year_stats')
+    year = models.IntegerField()
+
+    months = models.IntegerField(default=0)          # Количество месяцев со статистикой
+    matches_played = models.IntegerField(default=0)
+    kills = models.IntegerField(default=0)
+    deaths = models.IntegerField(default=0)
+    wins = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['player', 'year']  # Одна запись на год для игрока
+        ordering = ['-year']
+
+    def __str__(self):
+        return f"{self.player.nickname} - {self.year}"
+
+
+class LeaderboardEntry(StatMetricsMixin, models.Model):
+    """
+    Строка рейтинга игрока за год или за все время (year = ALL_TIME).
+    Показатели хранятся готовыми и проиндексированы, поэтому страница
+    рейтинга читается по индексу без агрегации MonthlyStat.
+    Обновляется вместе с итогами (см. utils/leaderboard.py).
+    """
+    ALL_TIME = 0  # Значение year для рейтинга за все время
+
+    # Показатели, по которым строятся рейтинги
+    METRICS = {
+        'kd': 'K/D Ratio',
+        'win_pct': 'Win Rate',
+        'kpm': 'Kills per Match',
+    }
+
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    year = models.IntegerField()
+    country = models.CharField(max_length=10, blank=True)  # Копия Player.country для фильтра по стране
+
+    matches_played = models.IntegerField(default=0)
+    kills = models.IntegerField(default=0)
+    deaths = models.IntegerField(default=0)
+    wins = models.IntegerField(default=0)
+
+    # Показатели без округления (для точной сортировки)
+    kd = models.FloatField(default=0)
+    win_pct = models.FloatField(default=0)
+    kpm = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ['player', 'year']
+        # Индексы под сортировку рейтинга: общий и по стране для каждого показателя
+        indexes = [
+            models.Index(fields=['year', f'-{metric}', 'player'], name=f'lb_{metric}_idx')
+            for metric in ('kd', 'win_pct', 'kpm')
+        ] + [
+            models.Index(fields=['year', 'country', f'-{metric}', 'player'], name=f'lb_country_{metric}_idx')
+            for metric in ('kd', 'win_pct', 'kpm')
+        ]
+
+    def __str__(self):
+        return f"{self.player.nickname} - {self.year or 'all time'}"
+
+
+class PercentileSketch(models.Model):
+    """
+    Распределение показателя по всем игрокам за месяц.
+    Хранит отсортированный массив значений (float64) или, для большой
+    популяции, его квантили - по нему процентиль игрока находится
+    бинарным поиском в памяти, без COUNT по MonthlyStat.
+    Строится командой build_percentiles (см. utils/percentiles.py).
+    """
+    METRICS = LeaderboardEntry.METRICS
+
+    year = models.IntegerField()
+    month = models.IntegerField()
+    metric = models.CharField(max_length=10, choices=list(METRICS.items()))
+
+    population = models.IntegerField()  # Сколько записей MonthlyStat вошло в расчет
+    values = models.BinaryField()       # Отсортированные значения (numpy float64)
+    built_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['year', 'month', 'metric']
+
+    def __str__(self):
+        return f"{self.year}/{self.month} {self.metric} ({self.population})"
+
+
+class PlayerTrend(models.Model):
+    """
+    Тренды месячной статистики игрока: скользящие средние за 3 месяца,
+    изменения к прошлому месяцу, наклон линейной регрессии и аномальные месяцы.
+    Считается пакетно для всех игроков командой compute_trends
+    (см. utils/trends.py), страница профиля только читает готовый результат.
+    """
+    player = models.OneToOneField(Player, on_delete=models.CASCADE, related_name='trend')
+    months = models.IntegerField(default=0)  # Месяцев с матчами в расчете
+
+    # Наклон линии тренда (изменение показателя за месяц с матчами)
+    kd_slope = models.FloatField(default=0)
+    win_rate_slope = models.FloatField(default=0)
+
+    # Изменение последнего месяца относительно предыдущего месяца с матчами
+    kd_delta = models.FloatField(null=True, blank=True)
+    win_rate_delta = models.FloatField(null=True, blank=True)
+
+    # Помесячные ряды для графиков:
+    # {'labels': [...], 'kd_avg': [...], 'win_rate_avg': [...],
+    #  'kd_delta': [...], 'win_rate_delta': [...], 'anomalies': [{'label', 'metric', 'z'}]}
+    series = models.JSONField(default=dict)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Trend of {self.player_id}"
+
+    def rolling_average(self, metric, labels):
+        """
+        Скользящее среднее показателя для заданных месяцев графика.
+
+        Args:
+            metric (str): 'kd' или 'win_rate'
+            labels (list): Подписи месяцев графика ("2025-01")
+
+        Returns:
+            tuple: (x, y) - только месяцы, для которых есть значение
+        """
+        values = dict(zip(self.series.get('labels', []), self.series.get(f'{metric}_avg', [])))
+        x = [label for label in labels if label in values]
+        return x, [values[label] for label in x]
+
+
+class SteamRefreshJob(models.Model):
+    """
+    Задача фонового обновления игрока из Steam API.
+    Очередь хранится в базе данных и обрабатывается командой
+    run_refresh_worker, поэтому запросы к Steam не блокируют веб-запросы.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    ACTIVE_STATUSES = (PENDING, RUNNING)  # Статусы незавершенных задач
+
+    MAX_ATTEMPTS = 5          # Попыток до перевода задачи в failed
+    RETRY_BASE_DELAY = 30     # Задержка перед первым повтором (секунды), далее x2
+
+    steam_id = models.CharField(max_length=20, db_index=True)   # Steam ID игрока
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.IntegerField(default=0)                   # Сделанные попытки
+    run_after = models.DateTimeField(default=timezone.now)      # Не запускать раньше этого времени
+    last_error = models.TextField(blank=True)                   # Причина последней неудачи
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='refresh_job_queue_idx'),
+        ]
+        constraints = [
+            # Не больше одной незавершенной задачи на Steam ID (дедупликация)
+            models.UniqueConstraint(
+                fields=['steam_id'],
+                condition=Q(status__in=['pending', 'running']),
+                name='unique_active_refresh_job',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.steam_id} [{self.status}]"
+
+    @classmethod
+    def enqueue(cls, steam_id):
+        """
+        Ставит обновление игрока в очередь.
+        Если для Steam ID уже есть незавершенная задача - возвращает ее.
+
+        Returns:
+            tuple: (задача, создана ли новая задача)
+        """
+        active = cls.objects.filter(steam_id=steam_id, status__in=cls.ACTIVE_STATUSES)
+        job = active.first()
+        if job:
+            return job, False
+
+        try:
+            with transaction.atomic():
+                return cls.objects.create(steam_id=steam_id), True
+        except IntegrityError:
+            # Параллельный запрос успел создать задачу раньше нас
+            return active.first(), False
+
+    @classmethod
+    def claim_next(cls):
+        """
+        Забирает следующую готовую к запуску задачу и переводит ее в running.
+        Захват выполняется условным UPDATE, поэтому несколько воркеров
+        не получат одну и ту же задачу.
+
+        Returns:
+            SteamRefreshJob: Задача или None если очередь пуста
+        """
+        while True:
+            job = (cls.objects
+                   .filter(status=cls.PENDING, run_after__lte=timezone.now())
+                   .order_by('run_after', 'pk')
+                   .first())
+            if job is None:
+                return None
+
+            claimed = cls.objects.filter(pk=job.pk, status=cls.PENDING).update(
+                status=cls.RUNNING,
+                attempts=F('attempts') + 1,
+                updated_at=timezone.now(),
+            )
+            if claimed:
+                job.refresh_from_db()
+                return job
+            # Задачу забрал другой воркер - пробуем следующую
+
+    @classmethod
+    def requeue_stale(cls, timeout):
+        """
+        Возвращает в очередь задачи, зависшие в running дольше timeout секунд
+        (например, если воркер был остановлен посреди обработки).
+
+        Returns:
+            int: Количество возвращенных задач
+        """
+        cutoff = timezone.now() - timedelta(seconds=timeout)
+        return cls.objects.filter(status=cls.RUNNING, updated_at__lt=cutoff).update(
+            status=cls.PENDING, updated_at=timezone.now()
+        )
+
+    def run(self):
+        """
+        Выполняет задачу: обновляет игрока из Steam и сохраняет результат.
+
+        Returns:
+            bool: True если обновление прошло успешно
+        """
+        player = Player.objects.filter(steam_id=self.steam_id).first()
+        if player is None:
+            # Игрока удалили, пока задача ждала в очереди
+            self.mark_done()
+            return True
+
+        if player.update_from_steam(force=True):
+            self.mark_done()
+            return True
+
+        self.mark_failed("Steam did not return the profile")
+        return False
+
+    def mark_done(self):
+        self.status = self.DONE
+        self.last_error = ''
+        self.save(update_fields=['status', 'last_error', 'updated_at'])
+
+    def mark_failed(self, error):
+        """
+        Фиксирует неудачную попытку.
+        Пока попытки не исчерпаны, задача возвращается в очередь
+        с экспоненциально растущей задержкой.
+        """
+        self.last_error = error
+        if self.attempts < self.MAX_ATTEMPTS:
+            self.status = self.PENDING
+            delay = self.RETRY_BASE_DELAY * 2 ** max(0, self.attempts - 1)
+            self.run_after = timezone.now() + timedelta(seconds=delay)
+        else:
+            self.status = self.FAILED
+        self.save(update_fields=['status', 'last_error', 'run_after', 'updated_at'])
+
+    def retry(self):
+        """Перезапускает задачу вручную (действие в админке)."""
+        self.status = self.PENDING
+        self.attempts = 0
+        self.run_after = timezone.now()
+        self.save(update_fields=['status', 'attempts', 'run_after', 'updated_at'])
@@ -0,0 +1,74 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Match, MatchQuerySet, MonthlyStat, Player
+from .utils.chart_cache import bump_stats_version
+from .utils.matches import rollup_matches
+from .utils.player_search import index_players, remove_players
+from .utils.rollups import record_delete
+
+
+@receiver(post_save, sender=MonthlyStat)
+@receiver(post_delete, sender=MonthlyStat)
+def invalidate_player_charts(sender, instance, **kwargs):
+    """
+    Меняет версию статистики игрока при добавлении, изменении или удалении
+    месячной статистики. Версия меняется после коммита транзакции, чтобы
+    параллельный запрос не закэшировал графики по еще не сохраненным данным.
+    """
+    player_id = instance.player_id
+    transaction.on_commit(lambda: bump_stats_version(player_id))
+
+
+def deleted_with_player(origin):
+    """Удаление началось с игрока (каскад) - его итоги удаляются вместе с ним."""
+    return isinstance(origin, Player) or (isinstance(origin, QuerySet) and origin.model is Player)
+
+
+@receiver(post_delete, sender=MonthlyStat)
+def subtract_deleted_stat(sender, instance, origin=None, **kwargs):
+    """
+    Вычитает удаленную запись из годовых итогов и итогов игрока.
+    Сигнал отправляется внутри транзакции удаления, поэтому итоги
+    обновляются атомарно вместе с ней (в том числе при queryset.delete()).
+    При удалении игрока ничего не вычитается - YearStat и строки рейтинга
+    удаляются каскадом. Добавление и изменение обрабатываются в MonthlyStat.save().
+    """
+    if deleted_with_player(origin):
+        return
+    record_delete(instance)
+
+
+@receiver(post_save, sender=Player)
+def index_player(sender, instance, update_fields=None, **kwargs):
+    """
+    Обновляет игрока в поисковом индексе, если изменились ник или Steam ID.
+    Индекс - таблица той же базы, поэтому запись идет в той же транзакции.
+    """
+    if update_fields is None or {'nickname', 'steam_id'} & set(update_fields):
+        index_players([(instance.pk, instance.nickname, instance.steam_id)])
+
+
+@receiver(post_delete, sender=Player)
+def unindex_player(sender, instance, **kwargs):
+    """Удаляет игрока из поискового индекса."""
+    remove_players([instance.pk])
+
+
+@receiver(post_delete, sender=Match)
+def subtract_deleted_match(sender, instance, origin=None, **kwargs):
+    """
+    Вычитает удаленный матч из месячной статистики и итогов.
+    При удалении игрока матчи не вычитаются - его месячная статистика
+    удаляется вместе с ним. При queryset.delete() матчи собираются
+    и вычитаются одним пакетом (MatchQuerySet.delete).
+    Добавление матчей обрабатывается при загрузке (utils/matches.py).
+    """
+    if deleted_with_player(origin):
+        return
+    if isinstance(origin, MatchQuerySet):
+        origin._deleted_matches.append(instance)
+        return
+    rollup_matches([instance], sign=-1)
@@ -1,3 +1,915 @@
-from django.test import TestCase
+import json
+import random
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .forms import MonthlyStatForm
+from .models import (
+    LeaderboardEntry, Match, MonthlyStat, PercentileSketch, Player, PlayerTrend, SteamRefreshJob, YearStat,
+)
+from .utils import chart_utils, matches
+from .utils.exporter import export_chunks
+from .utils.fake_steam import FakeSteamServer, fake_summary, parse_latency
+from .utils.importer import import_stats
+from .utils.leaderboard import leaderboard_queryset
+from .utils.metrics import REGISTRY, Counter, Histogram, MetricsRegistry
+from .utils.percentiles import build_percentiles, player_percentiles
+from .utils.player_search import search_players
+from .utils.rollups import rebuild_rollups
+from .utils.singleflight import single_flight
+from .utils.steam_api import SteamAPI
+from .utils.steam_client import SteamHTTPClient
+from .utils.trends import compute_trends
+
+TESTDATA_DIR = Path(__file__).resolve().parent / 'testdata'
+
+# Кэш в памяти процесса: ответы Steam кэшируются и из потоков пула,
+# которым не видна тестовая транзакция базы
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'steam-tests'}}
+
+
+class ChartGoldenTests(SimpleTestCase):
+    """
+    Графики профиля должны совпадать с эталоном, снятым с прежней
+    реализации на go.Figure (Plotly 6.5.1).
+    """
+
+    def setUp(self):
+        golden = json.loads((TESTDATA_DIR / 'chart_golden.json').read_text(encoding='utf-8'))
+        self.expected_charts = golden['charts']
+        self.stats = [
+            MonthlyStat(year=year, month=month, matches_played=matches,
+                        kills=kills, deaths=deaths, wins=wins)
+            for year, month, matches, kills, deaths, wins in golden['rows']
+        ]
+
+    def test_prepare_all_charts_matches_golden(self):
+        # Фиксируем uuid, чтобы id контейнеров графиков были предсказуемыми
+        with mock.patch.object(chart_utils.uuid, 'uuid4', return_value=uuid.UUID(int=0)):
+            charts = chart_utils.prepare_all_charts(self.stats)
+
+        self.assertEqual(len(charts), len(self.expected_charts))
+        for chart, expected in zip(charts, self.expected_charts):
+            self.assertEqual(str(chart), expected)
+
+
+class APIQueryCountTests(TestCase):
+    """
+    JSON API отвечает фиксированным числом запросов к БД:
+    одна-две SQL-инструкции независимо от размера страницы.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Player.objects.bulk_create([
+            Player(steam_id=f"7656119800000{index:04d}", nickname=f"player{index}", country='RU')
+            for index in range(30)
+        ])
+        cls.player = Player.objects.get(steam_id='76561198000000000')
+        for month in range(1, 13):
+            MonthlyStat.objects.create(player=cls.player, year=2024, month=month,
+                                       matches_played=10, kills=20 + month, deaths=10, wins=5)
+
+    def get_json(self, url, queries, **params):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_players_one_query_per_page(self):
+        url = reverse('api_players')
+        for limit in (5, 25):
+            data = self.get_json(url, 1, limit=limit)
+            self.assertEqual(len(data['results']), limit)
+
+        # Следующая страница по курсору - тоже один запрос, без повторов
+        first = self.get_json(url, 1, limit=20)
+        second = self.get_json(url, 1, limit=20, cursor=first['next_cursor'])
+        self.assertEqual(len(second['results']), 10)
+        self.assertIsNone(second['next_cursor'])
+        steam_ids = [row['steam_id'] for row in first['results'] + second['results']]
+        self.assertEqual(steam_ids, sorted(set(steam_ids)))
+
+    def test_players_batch_lookup_and_fields(self):
+        data = self.get_json(reverse('api_players'), 1,
+                             steam_ids='76561198000000001,76561198000000002,unknown',
+                             fields='steam_id,totals')
+        self.assertEqual([set(row) for row in data['results']], [{'steam_id', 'totals'}] * 2)
+        self.assertEqual(data['missing'], ['unknown'])
+
+        response = self.client.get(reverse('api_players'), {'fields': 'steam_id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_player_stats_two_queries(self):
+        url = reverse('api_player_stats', args=[self.player.steam_id])
+        for limit in (3, 12):
+            data = self.get_json(url, 2, limit=limit, fields='year,month,kd_ratio')
+            self.assertEqual(len(data['results']), limit)
+        self.assertEqual(data['results'][0], {'year': 2024, 'month': 12, 'kd_ratio': 3.2})
+
+        page = self.get_json(url, 2, limit=5, cursor=self.get_json(url, 2, limit=5)['next_cursor'])
+        self.assertEqual([row['month'] for row in page['results']], [7, 6, 5, 4, 3])
+
+    def test_player_totals_two_queries(self):
+        data = self.get_json(reverse('api_player_totals', args=[self.player.steam_id]), 2)
+        self.assertEqual(data['all_time']['matches'], 120)
+        self.assertEqual(data['years'][0]['year'], 2024)
+        self.assertEqual(data['years'][0]['months'], 12)
+
+    def test_unknown_player_404(self):
+        response = self.client.get(reverse('api_player_stats', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('error', response.json())
+
+
+class ProfileConditionalGetTests(TestCase):
+    """ETag профиля меняется вместе со всем, что показывает страница."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.player = Player.objects.create(steam_id='76561198000000001', nickname='player')
+        MonthlyStat.objects.create(player=cls.player, year=2024, month=1,
+                                   matches_played=10, kills=20, deaths=10, wins=5)
+
+    def test_percentile_rebuild_changes_etag(self):
+        build_percentiles()
+        url = reverse('player_profile', args=[self.player.steam_id])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        build_percentiles(force=True)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_page_uses_percentiles_of_its_etag(self):
+        url = reverse('player_profile', args=[self.player.steam_id])
+        build_percentiles()
+        self.assertEqual(self.client.get(url).context['percentiles']['kd'], 0)
+
+        # Игрок с худшим K/D: после перестройки страница сразу показывает
+        # новые процентили, а не загруженные в память процесса раньше
+        other = Player.objects.create(steam_id='76561198000000002', nickname='other')
+        MonthlyStat.objects.create(player=other, year=2024, month=1,
+                                   matches_played=10, kills=5, deaths=10, wins=5)
+        build_percentiles(force=True)
+        self.assertEqual(self.client.get(url).context['percentiles']['kd'], 50)
+
+
+def rollups_snapshot():
+    """YearStat, итоги игроков и строки рейтинга для сравнения."""
+    years = list(YearStat.objects.order_by('player_id', 'year')
+                 .values_list('player_id', 'year', 'months', 'matches_played', 'kills', 'deaths', 'wins'))
+    totals = list(Player.objects.order_by('pk')
+                  .values_list('total_matches', 'total_kills', 'total_deaths', 'total_wins'))
+    entries = list(LeaderboardEntry.objects.order_by('player_id', 'year').values_list(
+        'player_id', 'year', 'country', 'matches_played', 'kills', 'deaths', 'wins', 'kd', 'win_pct', 'kpm'))
+    return years, totals, entries
+
+
+def assert_rollups_match_rebuild(test):
+    """Полный пересчет не находит расхождений и не меняет ни одной строки."""
+    incremental = rollups_snapshot()
+    test.assertEqual(set(rebuild_rollups().values()), {0})
+    test.assertEqual(rollups_snapshot(), incremental)
+
+
+class PercentileTests(TestCase):
+    """Процентили из распределений совпадают с точным подсчетом по всем игрокам."""
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(7)
+        players = Player.objects.bulk_create([
+            Player(steam_id=f"7656119800000{index:04d}", nickname=f"player{index}") for index in range(200)
+        ])
+        MonthlyStat.objects.bulk_create([
+            MonthlyStat(player=player, year=2024, month=3, matches_played=rng.randint(1, 40),
+                        kills=rng.randint(0, 600), deaths=rng.randint(0, 400), wins=0)
+            for player in players
+        ])
+        for stat in MonthlyStat.objects.all():
+            stat.wins = stat.matches_played * rng.randint(0, 10) // 10
+        MonthlyStat.objects.bulk_update(MonthlyStat.objects.all(), ['wins'])
+
+    def assert_percentiles_within(self, tolerance):
+        stats = list(MonthlyStat.objects.filter(year=2024, month=3).with_metrics()
+                     .values('matches_played', 'kills', 'deaths', 'wins', 'kd', 'win_pct', 'kpm'))
+        for stat in stats:
+            result = player_percentiles(2024, 3, stat['matches_played'], stat['kills'], stat['deaths'], stat['wins'])
+            for metric in PercentileSketch.METRICS:
+                exact = sum(other[metric] < stat[metric] for other in stats) * 100 // len(stats)
+                self.assertLessEqual(abs(result[metric] - exact), tolerance, (metric, stat))
+
+    def test_exact_when_population_fits(self):
+        build_percentiles()
+        self.assert_percentiles_within(0)
+
+    @override_settings(PERCENTILE_MAX_POINTS=21)
+    def test_quantile_sketch_error_bounded(self):
+        build_percentiles()
+        # Между соседними квантилями 5% популяции
+        self.assert_percentiles_within(100 // 20 + 1)
+
+    def test_rebuilds_month_changed_since_build(self):
+        self.assertEqual(build_percentiles()['months_built'], 1)
+        self.assertEqual(build_percentiles()['months_built'], 0)
+
+        # Число записей не изменилось, но одна запись изменена после перестройки
+        stat = MonthlyStat.objects.first()
+        stat.kills += 1000
+        stat.save()
+        self.assertEqual(build_percentiles()['months_built'], 1)
+        self.assert_percentiles_within(0)
+
+
+class TrendTests(TestCase):
+    """Тренды считаются по месяцам с матчами: пропущенные месяцы не растягивают ось."""
+
+    def test_known_series_with_gap(self):
+        player = Player.objects.create(steam_id='76561198000000001', nickname='player')
+        # K/D 1.0, 1.1, 1.2, 1.3 с паузой между февралем и июнем; месяц без матчей не входит в ряд
+        for month, kills in ((1, 100), (2, 110), (4, 0), (6, 120), (7, 130)):
+            MonthlyStat.objects.create(player=player, year=2024, month=month, matches_played=10 if kills else 0,
+                                       kills=kills, deaths=100 if kills else 0, wins=month)
+
+        self.assertEqual(compute_trends(), {'players': 1, 'deleted': 0, 'rows': 4})
+        trend = PlayerTrend.objects.get(player=player)
+        self.assertEqual(trend.months, 4)
+        self.assertEqual(trend.series['labels'], ['2024-01', '2024-02', '2024-06', '2024-07'])
+        self.assertEqual(trend.series['kd_avg'], [1.0, 1.05, 1.1, 1.2])
+        self.assertEqual(trend.series['kd_delta'], [None, 0.1, 0.1, 0.1])
+        # Ровный рост на 0.1 за месяц с матчами; win rate 10, 20, 60, 70%
+        self.assertAlmostEqual(trend.kd_slope, 0.1)
+        self.assertAlmostEqual(trend.win_rate_slope, 22.0)
+
+
+class RollupTests(TestCase):
+    """Инкрементальные итоги совпадают с полным пересчетом (rebuild_rollups)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.player = Player.objects.create(steam_id='76561198000000001', nickname='player', country='RU')
+        cls.other = Player.objects.create(steam_id='76561198000000002', nickname='other')
+
+    def test_create_update_delete(self):
+        stats = [
+            MonthlyStat.objects.create(player=self.player, year=year, month=month,
+                                       matches_played=10 + month, kills=17 * month, deaths=9 + month, wins=month)
+            for year in (2023, 2024) for month in (1, 2, 3)
+        ]
+        MonthlyStat.objects.create(player=self.player, year=2024, month=4)  # Месяц без матчей
+        assert_rollups_match_rebuild(self)
+
+        stats[0].kills += 7
+        stats[0].save()
+        assert_rollups_match_rebuild(self)
+
+        # Перенос записи в другой год и другому игроку
+        stats[1].year = 2022
+        stats[1].save()
+        stats[2].player = self.other
+        stats[2].save()
+        assert_rollups_match_rebuild(self)
+
+        # Удаление последнего месяца с матчами за год убирает год из рейтинга
+        MonthlyStat.objects.filter(player=self.player, year=2022).delete()
+        stats[3].delete()
+        self.assertFalse(LeaderboardEntry.objects.filter(player=self.player, year=2022).exists())
+        assert_rollups_match_rebuild(self)
+
+        stats[4].matches_played = 0
+        stats[4].save()
+        assert_rollups_match_rebuild(self)
+
+    def test_player_delete_skips_rollups(self):
+        for month in (1, 2, 3):
+            MonthlyStat.objects.create(player=self.player, year=2024, month=month,
+                                       matches_played=10, kills=20, deaths=10, wins=5)
+        # Выборка связанных строк, каскадные DELETE и поисковый индекс - без вычитания итогов
+        with self.assertNumQueries(8):
+            self.player.delete()
+        self.assertFalse(YearStat.objects.exists())
+        self.assertFalse(LeaderboardEntry.objects.exists())
+
+
+class ImportStatsTests(TestCase):
+    """Импорт пачками: проверка строк, повторы, границы пачек и итоги после каждой пачки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.player = Player.objects.create(steam_id='76561198000000001', nickname='player')
+        MonthlyStat.objects.create(player=cls.player, year=2024, month=1,
+                                   matches_played=5, kills=5, deaths=5, wins=1)
+
+    @staticmethod
+    def row(month, kills=20, steam_id='76561198000000001', **values):
+        row = {'steam_id': steam_id, 'year': '2024', 'month': str(month),
+               'matches_played': '10', 'kills': str(kills), 'deaths': '10', 'wins': '5'}
+        row.update(values)
+        return row
+
+    def test_valid_invalid_and_duplicate_rows_across_chunks(self):
+        rows = list(enumerate([
+            self.row(1, kills=30),              # Обновление существующего месяца
+            self.row(2),
+            self.row(3, kills=-1),              # Отрицательное значение
+            self.row(13),                       # Нет такого месяца
+            self.row(2, kills=40),              # Повтор месяца в следующей пачке - побеждает последний
+            self.row(4, steam_id='unknown'),
+            self.row(5, wins='11'),             # Побед больше, чем матчей
+            'Invalid JSON: Expecting value',    # Ошибка разбора строки
+            self.row(6),
+        ], start=2))
+        report = import_stats(rows, chunk_size=2)
+
+        self.assertEqual((report.rows, report.imported, report.rejected, report.chunks), (9, 4, 5, 5))
+        self.assertEqual([line for line, _ in report.errors], [4, 5, 7, 8, 9])
+        self.assertIn('kills', report.errors[0][1])
+        self.assertIn('Unknown player', report.errors[2][1])
+        stats = dict(self.player.monthly_stats.values_list('month', 'kills'))
+        self.assertEqual(stats, {1: 30, 2: 40, 6: 20})
+        assert_rollups_match_rebuild(self)
+
+    def test_interrupted_import_keeps_written_chunks_consistent(self):
+        def stop(report):
+            raise RuntimeError("Import interrupted")
+
+        with self.assertRaises(RuntimeError):
+            import_stats(enumerate([self.row(2), self.row(3), self.row(4)]), chunk_size=2, progress=stop)
+        self.assertEqual(self.player.monthly_stats.count(), 3)
+        self.assertEqual(self.player.year_stats.get(year=2024).months, 3)
+        assert_rollups_match_rebuild(self)
+
+    def test_csv_upload_and_non_utf8_file(self):
+        url = reverse('import_monthly_stats', args=[self.player.steam_id])
+        upload = SimpleUploadedFile('stats.csv', b'\xef\xbb\xbfyear,month,matches_played,kills,deaths,wins\n'
+                                                 b'2024,7,10,20,10,5\n')
+        response = self.client.post(url, {'file': upload})
+        self.assertEqual(response.context['report'].imported, 1)
+
+        upload = SimpleUploadedFile('stats.csv', 'year,month\n2024,ü\n'.encode('latin-1'))
+        response = self.client.post(url, {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('not UTF-8', response.context['form'].errors['file'][0])
+
+    def test_form_keeps_its_rules(self):
+        data = {'year': 2024, 'month': 8, 'matches_played': 10, 'kills': -1, 'deaths': 10, 'wins': 5}
+        self.assertTrue(MonthlyStatForm(data, player=self.player).is_valid())
+        form = MonthlyStatForm(dict(data, wins=11), player=self.player)
+        self.assertEqual(form.errors['wins'], ["Wins cannot be greater than matches played!"])
+
+
+class IncrementalExportTests(TestCase):
+    """Инкрементальная выгрузка игроков видит изменения итогов."""
+
+    def export_steam_ids(self, since):
+        lines = ''.join(export_chunks('players', 'jsonl', since)).splitlines()
+        return [json.loads(line)['steam_id'] for line in lines]
+
+    def test_stat_change_exports_player(self):
+        player = Player.objects.create(steam_id='76561198000000001', nickname='player')
+        Player.objects.create(steam_id='76561198000000002', nickname='other')
+        stat = MonthlyStat.objects.create(player=player, year=2024, month=1,
+                                          matches_played=10, kills=20, deaths=10, wins=5)
+        watermark = timezone.now()
+        last_updated = Player.objects.get(pk=player.pk).last_updated
+        self.assertEqual(self.export_steam_ids(watermark), [])
+
+        stat.kills = 25
+        stat.save()
+        self.assertEqual(self.export_steam_ids(watermark), [player.steam_id])
+        # Время обновления из Steam не меняется
+        self.assertEqual(Player.objects.get(pk=player.pk).last_updated, last_updated)
+
+        watermark = timezone.now()
+        # Расхождение итогов, исправленное rebuild_rollups
+        Player.objects.filter(pk=player.pk).update(total_kills=0)
+        rebuild_rollups()
+        self.assertEqual(self.export_steam_ids(watermark), [player.steam_id])
+
+
+class LeaderboardTests(TestCase):
+    """Рейтинг: порядок по показателю, равные значения по player_id, страницы по курсору без пропусков."""
+
+    # (страна, матчи, убийства, смерти, победы) за 2024 год; у четырех игроков K/D = 1.5
+    ROWS = [
+        ('RU', 10, 150, 100, 5), ('DE', 20, 300, 200, 12), ('RU', 10, 200, 100, 4),
+        ('RU', 5, 30, 20, 1), ('DE', 10, 90, 100, 9), ('RU', 30, 450, 300, 15),
+        ('US', 8, 80, 40, 8),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.players = []
+        for index, (country, matches, kills, deaths, wins) in enumerate(cls.ROWS):
+            player = Player.objects.create(steam_id=f"7656119800000{index:04d}", nickname=f"player{index}",
+                                           country=country)
+            MonthlyStat.objects.create(player=player, year=2024, month=1, matches_played=matches,
+                                       kills=kills, deaths=deaths, wins=wins)
+            cls.players.append(player)
+        # Матчи 2023 года входят только в рейтинг за все время
+        MonthlyStat.objects.create(player=cls.players[4], year=2023, month=6, matches_played=10,
+                                   kills=510, deaths=100, wins=10)
+
+    def expected(self, key, country=None, min_matches=0):
+        """Steam ID в ожидаемом порядке: показатель по убыванию, затем player_id."""
+        rows = [(player, row) for player, row in zip(self.players, self.ROWS)
+                if (country is None or row[0] == country) and row[1] >= min_matches]
+        rows.sort(key=lambda pair: (-key(pair[1]), pair[0].pk))
+        return [player.steam_id for player, _ in rows]
+
+    @staticmethod
+    def kd(row):
+        return row[2] / row[3]
+
+    def test_ranking_order_and_ties(self):
+        ranking = leaderboard_queryset('kd', year=2024)
+        self.assertEqual([entry.player.steam_id for entry in ranking], self.expected(self.kd))
+        # Равные K/D (2.0 и 1.5) идут по возрастанию player_id
+        self.assertEqual([entry.player_id for entry in ranking if entry.kd == 1.5],
+                         [self.players[index].pk for index in (0, 1, 3, 5)])
+        self.assertEqual([entry.player_id for entry in ranking if entry.kd == 2.0],
+                         [self.players[index].pk for index in (2, 6)])
+
+        filtered = leaderboard_queryset('kd', year=2024, country='RU', min_matches=10)
+        self.assertEqual([entry.player.steam_id for entry in filtered],
+                         self.expected(self.kd, country='RU', min_matches=10))
+        self.assertEqual([entry.player.steam_id for entry in leaderboard_queryset('win_pct', year=2024)],
+                         self.expected(lambda row: row[4] / row[1]))
+        # За все время игрок с сильным 2023 годом выходит на первое место
+        self.assertEqual(leaderboard_queryset('kd').first().player, self.players[4])
+
+    @override_settings(LEADERBOARD_PAGE_SIZE=2)
+    def test_keyset_pages_cover_ranking_once(self):
+        url = reverse('leaderboard')
+        params = {'metric': 'kd', 'year': 2024, 'min_matches': 0}
+        seen, starts = [], []
+        response = self.client.get(url, params)
+        while True:
+            entries = response.context['entries']
+            starts.append(entries[0][0])
+            seen += [entry.player.steam_id for _, entry in entries]
+            if not response.context['next_cursor']:
+                break
+            response = self.client.get(url, {**params, 'cursor': response.context['next_cursor']})
+
+        # Страницы режут группу равных K/D, но строки не теряются и не повторяются
+        self.assertEqual(seen, self.expected(self.kd))
+        self.assertEqual(starts, [1, 3, 5, 7])
+
+        # Поврежденный курсор - первая страница
+        response = self.client.get(url, {**params, 'cursor': 'broken'})
+        self.assertEqual([entry.player.steam_id for _, entry in response.context['entries']], seen[:2])
+
+
+class MatchDeleteTests(TestCase):
+    """Удаленные матчи вычитаются из месячной статистики одним пакетом."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.player = Player.objects.create(steam_id='76561198000000001', nickname='player')
+        rows = [
+            (line, {'played_at': f'2024-0{month}-1{line} 12:00', 'map_name': 'de_mirage',
+                    'kills': 20, 'deaths': 10, 'result': 'win'})
+            for line, month in enumerate((1, 1, 1, 2, 2))
+        ]
+        matches.ingest_matches(rows, player=cls.player)
+
+    def test_ingest_rolls_up_incrementally(self):
+        matches.ingest_matches([(0, {'played_at': '2023-12-31 12:00', 'map_name': 'de_nuke',
+                                     'kills': 5, 'deaths': 15, 'result': 'loss'})], player=self.player)
+        self.assertEqual(self.player.year_stats.get(year=2023).matches_played, 1)
+        assert_rollups_match_rebuild(self)
+
+    def test_queryset_delete_rolls_up_once(self):
+        with mock.patch.object(matches, 'rollup_matches', wraps=matches.rollup_matches) as rollup:
+            deleted, _ = self.player.matches.filter(played_at__month=1).delete()
+        self.assertEqual(deleted, 3)
+        rollup.assert_called_once()
+        self.assertEqual(len(rollup.call_args.args[0]), 3)
+        self.assertFalse(self.player.monthly_stats.get(month=1).matches_played)
+        self.assertEqual(self.player.monthly_stats.get(month=2).kills, 40)
+        assert_rollups_match_rebuild(self)
+
+    def test_single_delete_is_subtracted(self):
+        self.player.matches.filter(played_at__month=2).first().delete()
+        self.assertEqual(self.player.monthly_stats.get(month=2).matches_played, 1)
+        assert_rollups_match_rebuild(self)
+
+    def test_player_delete_skips_rollup(self):
+        with mock.patch.object(matches, 'rollup_matches') as rollup, \
+                mock.patch('cs2_stats.signals.rollup_matches') as signal_rollup:
+            self.player.delete()
+        rollup.assert_not_called()
+        signal_rollup.assert_not_called()
+        self.assertFalse(Match.objects.exists())
+
+
+class SteamRefreshJobTests(TestCase):
+    """Очередь обновлений из Steam: дедупликация, захват, повторы и ограниченный опрос страницы."""
+
+    steam_id = '76561198000000001'
+
+    def test_enqueue_deduplicates_active_jobs(self):
+        job, created = SteamRefreshJob.enqueue(self.steam_id)
+        self.assertTrue(created)
+        self.assertEqual(SteamRefreshJob.enqueue(self.steam_id), (job, False))
+
+        # Завершенная задача не мешает поставить новую
+        job.mark_done()
+        second, created = SteamRefreshJob.enqueue(self.steam_id)
+        self.assertTrue(created)
+        self.assertNotEqual(second.pk, job.pk)
+
+    def test_claim_next_takes_ready_job_once(self):
+        later, _ = SteamRefreshJob.enqueue('76561198000000002')
+        SteamRefreshJob.objects.filter(pk=later.pk).update(run_after=timezone.now() + timedelta(minutes=5))
+        job, _ = SteamRefreshJob.enqueue(self.steam_id)
+
+        claimed = SteamRefreshJob.claim_next()
+        self.assertEqual((claimed.pk, claimed.status, claimed.attempts), (job.pk, SteamRefreshJob.RUNNING, 1))
+        # Вторая задача еще не готова к запуску, первая уже захвачена
+        self.assertIsNone(SteamRefreshJob.claim_next())
+
+    def test_failures_back_off_then_fail(self):
+        SteamRefreshJob.enqueue(self.steam_id)
+        Player.objects.create(steam_id=self.steam_id)
+        delays = []
+        with mock.patch.object(Player, 'update_from_steam', return_value=False):
+            for _ in range(SteamRefreshJob.MAX_ATTEMPTS):
+                SteamRefreshJob.objects.update(run_after=timezone.now())
+                job = SteamRefreshJob.claim_next()
+                started = timezone.now()
+                self.assertFalse(job.run())
+                delays.append(round((job.run_after - started).total_seconds()))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.last_error),
+                         (SteamRefreshJob.FAILED, SteamRefreshJob.MAX_ATTEMPTS, 'Steam did not return the profile'))
+        self.assertEqual(delays[:-1], [30, 60, 120, 240])
+
+        job.retry()
+        claimed = SteamRefreshJob.claim_next()
+        self.assertEqual((claimed.pk, claimed.attempts), (job.pk, 1))
+        with mock.patch.object(Player, 'update_from_steam', return_value=True):
+            self.assertTrue(claimed.run())
+        claimed.refresh_from_db()
+        self.assertEqual((claimed.status, claimed.last_error), (SteamRefreshJob.DONE, ''))
+
+    def test_profile_polls_only_while_first_attempt_pending(self):
+        Player.objects.create(steam_id=self.steam_id, nickname='player')
+        url = reverse('player_profile', args=[self.steam_id])
+        job, _ = SteamRefreshJob.enqueue(self.steam_id)
+        response = self.client.get(url)
+        self.assertContains(response, 'window.location.reload()')
+        self.assertContains(response, 'MAX_RELOADS = 10')
+
+        # Попытка не удалась - повтор не скоро, страница перестает перезагружаться
+        job = SteamRefreshJob.claim_next()
+        job.mark_failed('timeout')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['steam_refresh_retrying'])
+        self.assertNotContains(response, 'window.location.reload()')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SteamRevalidationTests(SimpleTestCase):
+    """Фоновое обновление устаревших записей: одна блокировка на пачку, задача в общем пуле."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_batch_locked_once_and_connections_closed(self):
+        api = SteamAPI()
+        refreshed = []
+        batch = [f"7656119800000{index:04d}" for index in range(100)]
+        submitted = []
+        executor = mock.Mock(submit=submitted.append)
+        with mock.patch('cs2_stats.utils.steam_api.get_executor', return_value=executor), \
+                mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            api._revalidate_in_background('summary', batch, refreshed.append)
+            # Пока первая задача не выполнилась, та же пачка (в другом порядке) не ставится повторно
+            api._revalidate_in_background('summary', list(reversed(batch)), refreshed.append)
+
+        self.assertEqual(add.call_count, 2)
+        self.assertEqual(len(submitted), 1)
+
+        with mock.patch('cs2_stats.utils.steam_api.connections') as connections:
+            submitted[0]()
+        self.assertEqual(refreshed, [batch])
+        connections.close_all.assert_called_once_with()
+
+        # После завершения блокировка снята - пачку можно обновить снова
+        with mock.patch('cs2_stats.utils.steam_api.get_executor', return_value=executor):
+            api._revalidate_in_background('summary', batch, refreshed.append)
+        self.assertEqual(len(submitted), 2)
+
+
+class PlayerSearchTests(TestCase):
+    """Поиск по подстроке отдает самые короткие ники среди всех совпадений."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(30):
+            Player.objects.create(steam_id=f"7656119800000{index:04d}", nickname=f"player_zenith_{index:02d}")
+        Player.objects.create(steam_id='76561198000009999', nickname='the_zenith')
+
+    def test_substring_shortest_first_before_limit(self):
+        results = search_players('zenith', limit=5)
+        self.assertEqual(results[0]['nickname'], 'the_zenith')
+        self.assertEqual([row['nickname'] for row in results[1:]],
+                         [f"player_zenith_{index:02d}" for index in range(4)])
+
+    def test_substring_candidates_capped_before_sort(self):
+        with mock.patch('cs2_stats.utils.player_search.SUBSTRING_CANDIDATES', 5):
+            results = search_players('zenith', limit=3)
+        # Сортируются только первые 5 совпадений в порядке rowid - the_zenith (последний) в них не попал
+        self.assertEqual([row['nickname'] for row in results],
+                         [f"player_zenith_{index:02d}" for index in range(3)])
+
+    def test_nickname_query_redirects_to_directory(self):
+        response = self.client.post(reverse('player_search'), {'steam_id': 'zenith'})
+        self.assertRedirects(response, f"{reverse('player_directory')}?q=zenith")
+        self.assertFalse(Player.objects.filter(steam_id='zenith').exists())
+
+
+class MetricsTests(SimpleTestCase):
+    """Метрики складываются в общем хранилище и отдаются в формате Prometheus."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(METRICS_ENABLED=True, METRICS_DB=str(Path(directory.name) / 'metrics.sqlite3'),
+                                     METRICS_FLUSH_INTERVAL=3600, METRICS_TOKEN='secret')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # Запросы тестового клиента попадают в общий реестр - сбрасываем их во временный файл
+        self.addCleanup(REGISTRY.flush)
+
+    @staticmethod
+    def make_registry():
+        """Реестр отдельного процесса с теми же метриками."""
+        registry = MetricsRegistry()
+        registry.next_flush = float('inf')  # Сбрасываем только явно
+        counter = Counter('test_requests_total', 'Requests', ('view',), registry=registry)
+        histogram = Histogram('test_seconds', 'Duration', buckets=(0.1, 1), registry=registry)
+        return registry, counter, histogram
+
+    def test_aggregation_across_flushes_and_processes(self):
+        first, counter, histogram = self.make_registry()
+        counter.inc(view='home')
+        counter.inc(2, view='home')
+        histogram.observe(0.05)
+        first.flush()
+        counter.inc(view='profile')
+        histogram.observe(0.5)
+        first.flush()
+
+        second, counter, histogram = self.make_registry()
+        counter.inc(view='home')
+        histogram.observe(5)
+        second.flush()
+        second.flush()  # Пустой сброс ничего не меняет
+
+        self.assertEqual(second.render(), '\n'.join([
+            '# HELP test_requests_total Requests',
+            '# TYPE test_requests_total counter',
+            'test_requests_total{view="home"} 4',
+            'test_requests_total{view="profile"} 1',
+            '# HELP test_seconds Duration',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{le="0.1"} 1',
+            'test_seconds_bucket{le="1"} 2',
+            'test_seconds_bucket{le="+Inf"} 3',
+            'test_seconds_sum 5.55',
+            'test_seconds_count 3',
+        ]) + '\n')
+
+    def test_labels_are_checked_and_escaped(self):
+        registry, counter, _ = self.make_registry()
+        with self.assertRaises(ValueError):
+            counter.inc(status='200')
+        counter.inc(view='say "hi"\n')
+        registry.flush()
+        self.assertIn('test_requests_total{view="say \\"hi\\"\\n"} 1', registry.render())
+
+    def test_disabled_metrics_record_nothing(self):
+        registry, counter, histogram = self.make_registry()
+        with override_settings(METRICS_ENABLED=False):
+            counter.inc(view='home')
+            histogram.observe(1)
+        self.assertEqual(registry.pending, {})
+        self.assertFalse(registry.flush_at_exit)
+
+    def test_endpoint(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('# TYPE cs2_http_request_duration_seconds histogram', response.content.decode())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SingleFlightTests(SimpleTestCase):
+    """Одновременные вызовы с одним ключом выполняют функцию один раз."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_concurrent_callers_share_one_call(self):
+        calls = []
+        started = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return {'nickname': 'player'}
+
+        results = []
+
+        def call():
+            results.append(single_flight('test-key', fetch, lock_timeout=5))
+
+        threads = [threading.Thread(target=call) for _ in range(8)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([result for result, _ in results], [{'nickname': 'player'}] * 8)
+        self.assertEqual(sorted(shared for _, shared in results), [False] + [True] * 7)
+
+    def test_waits_for_another_process(self):
+        # Блокировку держит другой процесс; его результат приходит через кэш
+        cache.add('singleflight:test-key:lock', 'owner', timeout=5)
+
+        def finish():
+            time.sleep(0.2)
+            cache.set('singleflight:test-key:result', ('owner', 42), timeout=5)
+
+        threading.Thread(target=finish).start()
+        fetch = mock.Mock(return_value=0)
+        self.assertEqual(single_flight('test-key', fetch, lock_timeout=5), (42, True))
+        fetch.assert_not_called()
+
+    def test_failed_call_releases_lock(self):
+        with self.assertRaises(ValueError):
+            single_flight('test-key', mock.Mock(side_effect=ValueError('Steam is down')), lock_timeout=5)
+        # Блокировка снята - следующий вызов выполняется
+        self.assertEqual(single_flight('test-key', lambda: 1, lock_timeout=5), (1, False))
+
+    def test_lock_outlives_worst_case_steam_call(self):
+        client = SteamHTTPClient(timeout=(3.05, 10), max_retries=3, backoff_max=8.0)
+        self.assertAlmostEqual(client.max_duration(), 4 * 13.05 + 3 * 8.0)
+
+
+def block_network(test):
+    """Любая попытка обратиться к сети проваливает тест."""
+    patcher = mock.patch('requests.adapters.HTTPAdapter.send',
+                         side_effect=AssertionError("Network access in a hermetic test"))
+    patcher.start()
+    test.addCleanup(patcher.stop)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FakeSteamServerTests(SimpleTestCase):
+    """Локальная замена Steam API: детерминированные профили, сбои и запись ответов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeSteamServer(seed=0).start()
+        cls.addClassCleanup(cls.server.stop)
+
+    def start_server(self, **options):
+        server = FakeSteamServer(**options).start()
+        self.addCleanup(server.stop)
+        return server
+
+    @staticmethod
+    def steam_client(**options):
+        return SteamHTTPClient(backoff_base=0.001, backoff_max=0.01, rate=0, **options)
+
+    def test_profiles_are_deterministic(self):
+        client = self.steam_client()
+        url = f"{self.server.url}/ISteamUser/GetPlayerSummaries/v2/"
+        params = {'steamids': '76561198000000002,76561198000000006'}
+        data = client.get(url, params)
+
+        self.assertEqual(client.get(url, params), data)
+        # 006 - "неизвестный" Steam ID, его нет в ответе
+        self.assertEqual(data['response']['players'], [fake_summary('76561198000000002')])
+        self.assertEqual(data['response']['players'][0]['personaname'], 'Axlynro')
+
+    def test_injected_errors_are_retried(self):
+        server = self.start_server(error_rate=1.0)
+        client = self.steam_client(max_retries=2)
+        with self.assertRaises(requests.HTTPError) as error:
+            client.get(f"{server.url}/ISteamUser/GetPlayerSummaries/v2/", {'steamids': '1'})
+
+        self.assertIn(error.exception.response.status_code, (500, 502, 503))
+        self.assertEqual(client.metrics()['retries'], 2)
+        self.assertEqual(server.stats['errors'], 3)
+
+    def test_rate_limit_answers_429_with_retry_after(self):
+        server = self.start_server(rate_limit=1, private_rate=0)
+        client = self.steam_client(max_retries=0)
+        url = f"{server.url}/IPlayerService/GetOwnedGames/v1/"
+
+        self.assertEqual(client.get(url, {'steamid': '1'})['response']['games'][0]['appid'], 730)
+        with self.assertRaises(requests.HTTPError) as error:
+            client.get(url, {'steamid': '1'})
+        self.assertEqual(error.exception.response.status_code, 429)
+        self.assertEqual(error.exception.response.headers['Retry-After'], '1')
+
+    def test_latency_specs(self):
+        rng = mock.Mock(uniform=lambda low, high: (low + high) / 2)
+        self.assertEqual(parse_latency('none')(rng), 0)
+        self.assertEqual(parse_latency('fixed:50')(rng), 0.05)
+        self.assertEqual(parse_latency('uniform:20,40')(rng), 0.03)
+        for spec in ('fixed', 'uniform:1', 'pareto:1,2', 'fixed:abc'):
+            with self.assertRaises(ValueError):
+                parse_latency(spec)
+
+    def test_record_then_replay(self):
+        server = self.start_server(seed=7, missing_rate=0, private_rate=0)
+        with tempfile.TemporaryDirectory() as directory:
+            cassette = str(Path(directory) / 'cassette.json')
+            with override_settings(STEAM_API_BASE_URL=server.url, STEAM_API_CASSETTE=cassette,
+                                   STEAM_API_CASSETTE_MODE='record', STEAM_API_KEY='secret'):
+                recorded = SteamAPI().get_player_profile('76561198000000042', use_cache=False)
+            self.assertNotIn('secret', Path(cassette).read_text(encoding='utf-8'))
+
+            block_network(self)
+            with override_settings(STEAM_API_BASE_URL='https://api.steampowered.com',
+                                   STEAM_API_CASSETTE=cassette, STEAM_API_CASSETTE_MODE='replay'):
+                replayed = SteamAPI().get_player_profile('76561198000000042', use_cache=False)
+
+        self.assertEqual(replayed, recorded)
+        self.assertEqual(replayed['summary']['steamid'], '76561198000000042')
+        self.assertGreater(replayed['playtime'], 0)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    STEAM_API_CASSETTE=str(TESTDATA_DIR / 'steam_cassette.json'), STEAM_API_CASSETTE_MODE='replay',
+)
+class UpdateFromSteamReplayTests(TestCase):
+    """
+    update_from_steam на ответах, записанных с FakeSteamServer
+    (testdata/steam_cassette.json): без сети и ключа API.
+    """
+
+    def setUp(self):
+        cache.clear()
+        block_network(self)
+
+    def test_public_profile(self):
+        player = Player.objects.create(steam_id='76561198000000002')
+        created_at = player.updated_at
+        self.assertTrue(player.update_from_steam(force=True))
+
+        player.refresh_from_db()
+        self.assertEqual((player.nickname, player.country, player.cs2_hours), ('Axlynro', 'BR', 67.9))
+        self.assertTrue(player.avatar.endswith('_full.jpg'))
+        # Новый ник попадет в инкрементальную выгрузку игроков
+        self.assertGreater(player.updated_at, created_at)
+
+    def test_private_profile_keeps_playtime(self):
+        player = Player.objects.create(steam_id='76561198000000001', cs2_hours=12.5)
+        self.assertTrue(player.update_from_steam(force=True))
+
+        player.refresh_from_db()
+        self.assertEqual((player.nickname, player.country, player.cs2_hours), ('Zene649', 'UA', 12.5))
+
+    def test_unknown_player(self):
+        player = Player.objects.create(steam_id='76561198000000006')
+        self.assertFalse(player.update_from_steam(force=True))
+        player.refresh_from_db()
+        self.assertEqual(player.nickname, '')
+
+    def test_unrecorded_request_fails_without_network(self):
+        player = Player.objects.create(steam_id='76561198000000009')
+        with self.assertLogs('cs2_stats.utils.steam_api', 'WARNING') as logs:
+            self.assertFalse(player.update_from_steam(force=True))
+        self.assertIn('No recorded Steam response', logs.output[0])
@@ -1,11 +1,23 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.home, name='home'),
     path('search/', views.player_search, name='player_search'),
+    path('players/', views.player_directory, name='player_directory'),
+    path('leaderboard/', views.leaderboard, name='leaderboard'),
+    path('api/players/', api.players, name='api_players'),
+    path('api/players/search/', api.search_players, name='api_search_players'),
+    path('api/players/<str:steam_id>/', api.player_detail, name='api_player_detail'),
+    path('api/players/<str:steam_id>/stats/', api.player_stats, name='api_player_stats'),
+    path('api/players/<str:steam_id>/totals/', api.player_totals, name='api_player_totals'),
+    path('api/matches/', views.ingest_matches_api, name='api_ingest_matches'),
+    path('export/<str:dataset>.<str:fmt>', views.export_data, name='export_data'),
+    path('metrics', views.metrics, name='metrics'),
     path('player/<str:steam_id>/', views.player_profile, name='player_profile'),
+    path('player/<str:steam_id>/charts.json', views.player_charts_json, name='player_charts_json'),
     path('player/<str:steam_id>/add-stat/', views.add_monthly_stat, name='add_monthly_stat'),
+    path('player/<str:steam_id>/import/', views.import_monthly_stats, name='import_monthly_stats'),
     path('stat/edit/<int:stat_id>/', views.edit_monthly_stat, name='edit_monthly_stat'),
     path('stat/delete/<int:stat_id>/', views.delete_monthly_stat, name='delete_monthly_stat'),
 ]
\ No newline at end of file
@@ -0,0 +1,87 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+
+# Счетчики попаданий в кэш графиков (на процесс)
+_metrics = {'hits': 0, 'misses': 0, 'stored_bytes': 0}
+_metrics_lock = threading.Lock()
+
+
+def _version_key(player_id):
+    return f"charts:version:{player_id}"
+
+
+def get_stats_version(player_id):
+    """
+    Текущая версия статистики игрока.
+    Версия - метка времени в наносекундах: если ключ версии вытеснен
+    из кэша, новая версия все равно не совпадет ни с одной из прежних.
+    """
+    key = _version_key(player_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_stats_version(player_id):
+    """Делает недействительными закэшированные графики игрока."""
+    cache.set(_version_key(player_id), time.time_ns(), timeout=None)
+
+
+def get_cached_chart_json(player_id, build, variant=''):
+    """
+    Возвращает JSON графиков игрока из кэша или строит его заново.
+    Ключ кэша включает версию статистики, которая меняется при каждом
+    сохранении или удалении MonthlyStat (см. signals.py).
+
+    Args:
+        player_id (int): ID игрока
+        build (callable): Функция без аргументов, возвращающая JSON всех графиков
+        variant (str): Дополнительная часть ключа для данных, которые меняются
+                       отдельно от статистики (например, время расчета трендов)
+
+    Returns:
+        str: JSON графиков
+    """
+    key = f"charts:{player_id}:{get_stats_version(player_id)}"
+    if variant:
+        key = f"{key}:{variant}"
+    payload = cache.get(key)
+
+    if payload is not None:
+        _count('hits')
+        metrics.CACHE_REQUESTS.inc(cache='charts', result='hit')
+        return payload
+
+    _count('misses')
+    metrics.CACHE_REQUESTS.inc(cache='charts', result='miss')
+    payload = build()
+    cache.set(key, payload, timeout=settings.CHART_CACHE_TTL)
+    _count('stored_bytes', len(payload))
+    return payload
+
+
+def _count(name, value=1):
+    with _metrics_lock:
+        _metrics[name] += value
+
+
+def chart_cache_stats():
+    """
+    Статистика кэша графиков текущего процесса.
+
+    Returns:
+        dict: hits, misses, hit_ratio и stored_bytes (сколько байт JSON
+              записано в кэш - помогает оценить нужный размер кэша)
+    """
+    with _metrics_lock:
+        stats = dict(_metrics)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+    return stats
@@ -1,178 +1,282 @@
-import plotly.graph_objects as go
+from pathlib import Path
+from django.conf import settings
 from django.utils.safestring import mark_safe
+from django.db.models import QuerySet
 import json
 import uuid
 
+from .stat_series import as_series
+from .metrics import CHART_SECONDS
+from .timing import timed_function
 
-def prepare_all_charts(monthly_stats):
+# Шаблон оформления plotly_white в том виде, в каком его выдает Plotly 6.5
+# в fig.to_json(). Сериализуется один раз при импорте модуля и вставляется
+# в layout каждого графика без повторной сериализации.
+TEMPLATE_PATH = Path(__file__).with_name('plotly_white_template.json')
+TEMPLATE_JSON = json.dumps(json.loads(TEMPLATE_PATH.read_text(encoding='utf-8')))
+# Тот же шаблон без пробелов - для компактного JSON эндпоинта графиков
+TEMPLATE_JSON_COMPACT = json.dumps(json.loads(TEMPLATE_JSON), separators=(',', ':'))
+
+
+@timed_function('chart_html')
+@CHART_SECONDS.timed(stage='html')
+def prepare_all_charts(monthly_stats, trend=None):
     """
     Создает все графики для отображения на странице профиля игрока.
 
     Args:
-        monthly_stats (QuerySet): Набор объектов MonthlyStat для игрока
+        monthly_stats (StatSeries | QuerySet): Месячная статистика игрока
+        trend (PlayerTrend): Готовые тренды игрока - добавляют на графики
+                             K/D и Win Rate линию скользящего среднего
 
     Returns:
         list: Список HTML графиков для вставки в шаблон
               Возвращает пустой список если нет данных
     """
     charts = []
+    series = as_series(monthly_stats)
 
-    if not monthly_stats:
+    if not series:
         return charts
 
     # 1. График K/D Ratio (коэффициент убийств/смертей)
-    kd_chart = create_kd_chart(monthly_stats)
+    kd_chart = create_kd_chart(series, trend)
     if kd_chart:
         charts.append(kd_chart)
 
     # 2. График Win Rate (процент побед)
-    winrate_chart = create_winrate_chart(monthly_stats)
+    winrate_chart = create_winrate_chart(series, trend)
     if winrate_chart:
         charts.append(winrate_chart)
 
     # 3. График Kills per Match (убийств за матч)
-    kpm_chart = create_kills_per_match_chart(monthly_stats)
+    kpm_chart = create_kills_per_match_chart(series)
     if kpm_chart:
         charts.append(kpm_chart)
 
     return charts
 
 
-def create_kd_chart(monthly_stats):
+@timed_function('chart_specs')
+@CHART_SECONDS.timed(stage='specs')
+def build_chart_specs(monthly_stats, trend=None):
     """
-    Создает линейный график динамики K/D Ratio по месяцам.
+    Спецификации всех графиков профиля без HTML - для JSON эндпоинта.
 
     Args:
-        monthly_stats (QuerySet): Статистика по месяцам
+        monthly_stats (StatSeries | QuerySet): Месячная статистика игрока
+        trend (PlayerTrend): Готовые тренды игрока
 
     Returns:
-        str: HTML код графика или None если нет данных
+        dict: {'kd': spec, 'winrate': spec, 'kpm': spec} - только графики с данными
     """
-    months = []
-    kd_values = []
+    series = as_series(monthly_stats)
+    specs = {
+        'kd': kd_chart_spec(series, trend),
+        'winrate': winrate_chart_spec(series, trend),
+        'kpm': kills_per_match_chart_spec(series),
+    }
+    return {chart_type: spec for chart_type, spec in specs.items() if spec}
 
-    # Формируем данные для оси X (месяцы) и Y (значения K/D)
-    for stat in monthly_stats:
-        month_label = f"{stat.year}-{stat.month:02d}"  # Формат: "2025-01"
-        months.append(month_label)
-        kd_values.append(stat.kd_ratio)
 
-    if not months:
+@timed_function('chart_json')
+@CHART_SECONDS.timed(stage='json')
+def charts_to_json(specs):
+    """
+    Компактный JSON для Plotly.newPlot на клиенте.
+    Шаблон оформления передается один раз на все графики.
+
+    Returns:
+        str: {"template": {...}, "charts": {"kd": {"data": [...], "layout": {...}}, ...}}
+    """
+    return ('{"template":' + TEMPLATE_JSON_COMPACT
+            + ',"charts":' + json.dumps(specs, separators=(',', ':')) + '}')
+
+
+def kd_chart_spec(series, trend=None):
+    """
+    Спецификация линейного графика динамики K/D Ratio по месяцам.
+
+    Args:
+        series (StatSeries): Статистика по месяцам
+        trend (PlayerTrend): Тренды игрока для линии скользящего среднего
+
+    Returns:
+        dict: Спецификация графика или None если нет данных
+    """
+    if not series:
         return None
 
-    # Создаем линейный график Plotly
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=months,
-        y=kd_values,
-        mode='lines+markers',  # Линия + точки
-        name='K/D Ratio',
-        line=dict(color='blue', width=3),  # Синяя линия
-        marker=dict(size=8)  # Крупные точки
-    ))
-
-    fig.update_layout(
-        title='',  # Пустой заголовок (отображается в шаблоне)
-        xaxis_title='Month',
-        yaxis_title='K/D Ratio',
-        template='plotly_white',  # Чистая белая тема
-        height=400  # Фиксированная высота
-    )
-
-    return fig_to_html(fig, 'kd')
-
-
-def create_winrate_chart(monthly_stats):
+    # Линейный график: синяя линия с крупными точками
+    spec = build_line_chart(series.labels, series.kd.tolist(), 'K/D Ratio', 'blue', 'K/D Ratio')
+    if trend is not None:
+        add_trend_line(spec, *trend.rolling_average('kd', series.labels), 'navy')
+    return spec
+
+
+def winrate_chart_spec(series, trend=None):
     """
-    Создает столбчатую диаграмму процента побед по месяцам.
+    Спецификация столбчатой диаграммы процента побед по месяцам.
 
     Args:
-        monthly_stats (QuerySet): Статистика по месяцам
+        series (StatSeries): Статистика по месяцам
+        trend (PlayerTrend): Тренды игрока для линии скользящего среднего
 
     Returns:
-        str: HTML код графика или None если нет данных
+        dict: Спецификация графика или None если нет данных
+    """
+    if not series:
+        return None
+
+    # Столбчатая диаграмма с зелеными столбцами
+    spec = build_bar_chart(series.labels, series.win_rate.tolist(), 'Win Rate %', 'green', 'Win Rate (%)')
+    if trend is not None:
+        add_trend_line(spec, *trend.rolling_average('win_rate', series.labels), 'darkgreen')
+    return spec
+
+
+def kills_per_match_chart_spec(series):
     """
-    months = []
-    winrate_values = []
+    Спецификация графика среднего количества убийств за матч по месяцам.
+    Месяцы без матчей на график не попадают.
 
-    for stat in monthly_stats:
-        month_label = f"{stat.year}-{stat.month:02d}"
-        months.append(month_label)
-        winrate_values.append(stat.win_rate)
+    Args:
+        series (StatSeries): Статистика по месяцам
 
+    Returns:
+        dict: Спецификация графика или None если нет данных
+    """
+    months = [label for label, played in zip(series.labels, series.has_matches.tolist()) if played]
     if not months:
         return None
 
-    # Создаем столбчатую диаграмму
-    fig = go.Figure()
-    fig.add_trace(go.Bar(
-        x=months,
-        y=winrate_values,
-        name='Win Rate %',
-        marker_color='green'  # Зеленые столбцы
-    ))
+    kpm_values = series.kills_per_match[series.has_matches].tolist()
+
+    # Красная линия
+    return build_line_chart(months, kpm_values, 'Kills per Match', 'red', 'Kills per Match')
+
+
+def create_kd_chart(series, trend=None):
+    """Создает HTML графика K/D Ratio (None если нет данных)."""
+    spec = kd_chart_spec(series, trend)
+    return fig_to_html(spec, 'kd') if spec else None
 
-    fig.update_layout(
-        title='',
-        xaxis_title='Month',
-        yaxis_title='Win Rate (%)',
-        template='plotly_white',
-        height=400
-    )
 
-    return fig_to_html(fig, 'winrate')
+def create_winrate_chart(series, trend=None):
+    """Создает HTML диаграммы процента побед (None если нет данных)."""
+    spec = winrate_chart_spec(series, trend)
+    return fig_to_html(spec, 'winrate') if spec else None
 
 
-def create_kills_per_match_chart(monthly_stats):
+def create_kills_per_match_chart(series):
+    """Создает HTML графика убийств за матч (None если нет данных)."""
+    spec = kills_per_match_chart_spec(series)
+    return fig_to_html(spec, 'kpm') if spec else None
+
+
+def build_line_chart(x, y, name, color, yaxis_title):
     """
-    Создает график среднего количества убийств за матч по месяцам.
+    Собирает спецификацию линейного графика (линия + точки)
+    в формате Plotly JSON напрямую из списков, без go.Figure.
 
     Args:
-        monthly_stats (QuerySet): Статистика по месяцам
+        x (list): Подписи по оси X (месяцы)
+        y (list): Значения по оси Y
+        name (str): Название серии
+        color (str): Цвет линии
+        yaxis_title (str): Подпись оси Y
 
     Returns:
-        str: HTML код графика или None если нет данных
+        dict: {'data': [...], 'layout': {...}} - layout без шаблона оформления
     """
-    months = []
-    kpm_values = []
+    # Порядок ключей совпадает с выводом fig.to_json() Plotly
+    trace = {
+        'line': {'color': color, 'width': 3},
+        'marker': {'size': 8},
+        'mode': 'lines+markers',
+        'name': name,
+        'x': x,
+        'y': y,
+        'type': 'scatter',
+    }
+    return {'data': [trace], 'layout': _build_layout(yaxis_title)}
 
-    for stat in monthly_stats:
-        if stat.matches_played > 0:
-            month_label = f"{stat.year}-{stat.month:02d}"
-            months.append(month_label)
-            # Рассчитываем убийства за матч с округлением
-            kpm_values.append(round(stat.kills / stat.matches_played, 1))
 
-    if not months:
-        return None
+def build_bar_chart(x, y, name, color, yaxis_title):
+    """
+    Собирает спецификацию столбчатой диаграммы в формате Plotly JSON.
+
+    Args:
+        x (list): Подписи по оси X (месяцы)
+        y (list): Высоты столбцов
+        name (str): Название серии
+        color (str): Цвет столбцов
+        yaxis_title (str): Подпись оси Y
+
+    Returns:
+        dict: {'data': [...], 'layout': {...}} - layout без шаблона оформления
+    """
+    trace = {
+        'marker': {'color': color},
+        'name': name,
+        'x': x,
+        'y': y,
+        'type': 'bar',
+    }
+    return {'data': [trace], 'layout': _build_layout(yaxis_title)}
+
+
+def add_trend_line(spec, x, y, color):
+    """
+    Добавляет к графику пунктирную линию скользящего среднего.
 
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=months,
-        y=kpm_values,
-        mode='lines+markers',
-        name='Kills per Match',
-        line=dict(color='red', width=3),  # Красная линия
-        marker=dict(size=8)
-    ))
+    Args:
+        spec (dict): Спецификация графика
+        x (list): Месяцы, для которых посчитано среднее
+        y (list): Значения скользящего среднего
+        color (str): Цвет линии
+    """
+    if not x:
+        return
+    spec['data'].append({
+        'line': {'color': color, 'dash': 'dash', 'width': 2},
+        'mode': 'lines',
+        'name': f"{settings.TREND_WINDOW}-month avg",
+        'x': x,
+        'y': y,
+        'type': 'scatter',
+    })
+
+
+def _build_layout(yaxis_title):
+    """Общий layout графиков профиля (белая тема, высота 400px)."""
+    return {
+        'title': {'text': ''},  # Пустой заголовок (отображается в шаблоне)
+        'xaxis': {'title': {'text': 'Month'}},
+        'yaxis': {'title': {'text': yaxis_title}},
+        'height': 400,  # Фиксированная высота
+    }
 
-    fig.update_layout(
-        title='',
-        xaxis_title='Month',
-        yaxis_title='Kills per Match',
-        template='plotly_white',
-        height=400
-    )
 
-    return fig_to_html(fig, 'kpm')
+def spec_to_json(spec):
+    """
+    Сериализует спецификацию графика в JSON строки для Plotly.newPlot.
+    Шаблон plotly_white подставляется уже сериализованным.
+
+    Returns:
+        tuple: (data_json, layout_json)
+    """
+    layout_json = json.dumps(spec['layout'])
+    layout_json = '{"template": ' + TEMPLATE_JSON + ', ' + layout_json[1:]
+    return json.dumps(spec['data']), layout_json
 
 
-def fig_to_html(fig, chart_type):
+def fig_to_html(spec, chart_type):
     """
-    Конвертирует объект Plotly Figure в HTML с JavaScript для отложенной загрузки.
+    Конвертирует спецификацию графика в HTML с JavaScript для отложенной загрузки.
 
     Args:
-        fig (go.Figure): Объект графика Plotly
+        spec (dict): Спецификация графика из build_line_chart/build_bar_chart
         chart_type (str): Тип графика ('kd', 'winrate', 'kpm')
 
     Returns:
@@ -181,9 +285,8 @@ def fig_to_html(fig, chart_type):
     # Генерируем уникальный ID для div графика
     chart_id = f"{chart_type}_{uuid.uuid4().hex[:8]}"
 
-    # Конвертируем график в JSON для передачи в JavaScript
-    plot_json = fig.to_json()
-    plot_data = json.loads(plot_json)
+    # Сериализуем данные и layout одним проходом
+    data_json, layout_json = spec_to_json(spec)
 
     # Создаем HTML с встроенным JavaScript для инициализации графика
     html = f'''
@@ -195,8 +298,8 @@ def fig_to_html(fig, chart_type):
             // Инициализируем график когда библиотека загружена
             Plotly.newPlot(
                 '{chart_id}',
-                {json.dumps(plot_data['data'])},      // Данные графика
-                {json.dumps(plot_data['layout'])},    // Настройки layout
+                {data_json},      // Данные графика
+                {layout_json},    // Настройки layout
                 {{"responsive": true}}                 // Адаптивность
             );
         }} else {{
@@ -222,7 +325,7 @@ def calculate_total_stats(monthly_stats):
     Рассчитывает агрегированную статистику по всем месяцам.
 
     Args:
-        monthly_stats (QuerySet): Статистика по месяцам
+        monthly_stats (StatSeries | QuerySet): Статистика по месяцам
 
     Returns:
         dict: Словарь с общей статистикой:
@@ -233,31 +336,7 @@ def calculate_total_stats(monthly_stats):
             - kd: общий K/D ratio
             - win_rate: общий процент побед
     """
-    total = {
-        'matches': 0,
-        'kills': 0,
-        'deaths': 0,
-        'wins': 0,
-        'kd': 0,
-        'win_rate': 0
-    }
-
-    if not monthly_stats:
-        return total
-
-    # Суммируем значения по всем месяцам
-    for stat in monthly_stats:
-        total['matches'] += stat.matches_played
-        total['kills'] += stat.kills
-        total['deaths'] += stat.deaths
-        total['wins'] += stat.wins
-
-    # Рассчитываем общий K/D (избегаем деления на 0)
-    if total['deaths'] > 0:
-        total['kd'] = round(total['kills'] / total['deaths'], 2)
-
-    # Рассчитываем общий процент побед
-    if total['matches'] > 0:
-        total['win_rate'] = round((total['wins'] / total['matches']) * 100, 1)
-
-    return total
\ No newline at end of file
+    # Для QuerySet суммы считает база данных одним aggregate запросом
+    if isinstance(monthly_stats, QuerySet):
+        return monthly_stats.totals()
+    return as_series(monthly_stats).totals()
@@ -0,0 +1,133 @@
+import csv
+import json
+import zlib
+from datetime import datetime
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import MonthlyStat, Player
+
+PLAYER_FIELDS = ('steam_id', 'nickname', 'avatar', 'country', 'cs2_hours',
+                 'total_matches', 'total_kills', 'total_deaths', 'total_wins', 'last_updated', 'updated_at')
+
+# Наборы данных для выгрузки: модель, колонки файла, поля модели
+# и поле времени изменения (водяной знак инкрементальной выгрузки).
+# Колонки статистики совпадают с форматом импорта (import_stats).
+# Удаленные строки в инкрементальную выгрузку не попадают (надгробий нет) -
+# чтобы увидеть удаления, нужна полная выгрузка.
+DATASETS = {
+    'players': {
+        'queryset': lambda: Player.objects.all(),
+        'columns': PLAYER_FIELDS,
+        'fields': PLAYER_FIELDS,
+        'updated_field': 'updated_at',
+    },
+    'stats': {
+        'queryset': lambda: MonthlyStat.objects.all(),
+        'columns': ('steam_id', 'year', 'month', 'matches_played', 'kills', 'deaths', 'wins', 'updated_at'),
+        'fields': ('player__steam_id', 'year', 'month', 'matches_played', 'kills', 'deaths', 'wins', 'updated_at'),
+        'updated_field': 'updated_at',
+    },
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+# Строк в одной порции выгрузки и размер порции чтения из БД
+CHUNK_ROWS = 2000
+
+
+def parse_watermark(value):
+    """
+    Разбирает водяной знак инкрементальной выгрузки (ISO 8601).
+    Время без часового пояса считается временем TIME_ZONE проекта.
+
+    Raises:
+        ValueError: Строка не является датой и временем
+    """
+    watermark = parse_datetime(value.strip())
+    if watermark is None:
+        raise ValueError(f"Invalid watermark: {value!r} (expected ISO 8601, e.g. 2025-01-31T00:00:00Z)")
+    if timezone.is_naive(watermark):
+        watermark = timezone.make_aware(watermark)
+    return watermark
+
+
+def export_chunks(dataset, fmt, since=None):
+    """
+    Строки выгрузки порциями текста. Данные читаются из БД курсором
+    (iterator + values_list), поэтому память не растет с размером таблицы.
+
+    Args:
+        dataset (str): Ключ из DATASETS
+        fmt (str): 'csv' или 'jsonl'
+        since (datetime): Только строки, измененные начиная с этого времени
+                          (удаленные строки не выгружаются)
+
+    Yields:
+        str: Порции CSV/JSONL (заголовок CSV - в первой порции)
+    """
+    spec = DATASETS[dataset]
+    queryset = spec['queryset']()
+    if since is not None:
+        queryset = queryset.filter(**{f"{spec['updated_field']}__gte": since})
+    rows = queryset.order_by('pk').values_list(*spec['fields']).iterator(chunk_size=CHUNK_ROWS)
+
+    if fmt == 'csv':
+        buffer = _LineBuffer()
+        writer = csv.writer(buffer)
+        writer.writerow(spec['columns'])
+        for count, row in enumerate(rows, start=1):
+            writer.writerow([value.isoformat() if isinstance(value, datetime) else value for value in row])
+            if count % CHUNK_ROWS == 0:
+                yield buffer.drain()
+        yield buffer.drain()
+    elif fmt == 'jsonl':
+        lines = []
+        for row in rows:
+            lines.append(json.dumps(dict(zip(spec['columns'], row)), default=_json_default))
+            if len(lines) == CHUNK_ROWS:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+
+def gzip_chunks(chunks, level=6):
+    """
+    Сжимает поток порций в gzip на лету, не накапливая весь файл.
+
+    Yields:
+        bytes: Части gzip-файла
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 - формат gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _json_default(value):
+    """Даты и время в JSONL - в формате ISO 8601."""
+    return value.isoformat()
+
+
+class _LineBuffer:
+    """Буфер для csv.writer: накапливает строки до следующей выдачи порции."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, value):
+        self.parts.append(value)
+
+    def drain(self):
+        data = ''.join(self.parts)
+        self.parts = []
+        return data
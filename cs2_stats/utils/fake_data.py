@@ -0,0 +1,163 @@
+import random
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ..models import Match, MonthlyStat, Player
+from .player_search import index_players
+from .rollups import rebuild_rollups
+
+# Синтетические игроки получают Steam ID ниже диапазона настоящих аккаунтов
+# (настоящие начинаются с 76561197960265728) - их легко найти и удалить
+FAKE_STEAM_ID_BASE = 76561190000000000
+FAKE_STEAM_ID_PREFIX = '765611900'
+
+SYLLABLES = ('ka', 'ze', 'ro', 'mi', 'ne', 'sh', 'dow', 'fal', 'ken', 'tor', 'vex', 'lyn', 'ax', 'qu', 'bo', 'ri')
+COUNTRIES = ('RU', 'UA', 'KZ', 'BY', 'PL', 'DE', 'SE', 'DK', 'FR', 'US', 'BR', 'CN', '')
+
+# Уровни активности: (доля игроков, среднее число матчей в месяц, вероятность пропустить месяц)
+ACTIVITY_TIERS = ((0.5, 15, 0.3), (0.35, 50, 0.1), (0.15, 120, 0.05))
+
+
+def fake_nickname(rng):
+    """Ник из 2-3 слогов, иногда с цифрами или заглавной буквой."""
+    nickname = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+    if rng.random() < 0.3:
+        nickname += str(rng.randint(1, 999))
+    if rng.random() < 0.4:
+        nickname = nickname.capitalize()
+    return nickname
+
+
+def last_months(count, end=None):
+    """
+    Последние count месяцев до end включительно, от старых к новым.
+
+    Args:
+        count (int): Число месяцев
+        end (tuple): (год, месяц) последнего месяца, по умолчанию текущий
+
+    Returns:
+        list: Пары (год, месяц)
+    """
+    if end is None:
+        today = timezone.localdate()
+        end = (today.year, today.month)
+    index = end[0] * 12 + end[1] - 1
+    return [(value // 12, value % 12 + 1) for value in range(index - count + 1, index + 1)]
+
+
+def fake_monthly_stats(rng, months, skip_inactive=True):
+    """
+    Правдоподобная статистика одного игрока по месяцам: у игрока есть
+    уровень игры (K/D около 1, медленно меняется от месяца к месяцу)
+    и уровень активности; доля побед и убийства за матч растут с уровнем.
+
+    Args:
+        rng (random.Random): Генератор случайных чисел
+        months (list): Пары (год, месяц)
+        skip_inactive (bool): Пропускать месяцы без игр (иначе - месяц с нулями)
+
+    Returns:
+        list: dict с полями year, month, matches_played, kills, deaths, wins
+    """
+    skill = rng.lognormvariate(0, 0.25)
+    roll = rng.random()
+    for share, activity, skip_chance in ACTIVITY_TIERS:
+        roll -= share
+        if roll <= 0:
+            break
+
+    stats = []
+    for year, month in months:
+        skill = min(3.0, max(0.3, skill * rng.gauss(1, 0.04)))
+        if rng.random() < skip_chance:
+            if skip_inactive:
+                continue
+            matches = 0
+        else:
+            matches = max(1, round(rng.gauss(activity, activity * 0.3)))
+        kills_per_match = min(40.0, max(4.0, rng.gauss(17 * skill ** 0.5, 2)))
+        kills = round(matches * kills_per_match)
+        deaths = round(kills / max(0.2, rng.gauss(skill, 0.1)))
+        win_chance = min(0.9, max(0.1, 0.5 + (skill - 1) * 0.25 + rng.gauss(0, 0.05)))
+        stats.append({
+            'year': year, 'month': month, 'matches_played': matches,
+            'kills': kills, 'deaths': deaths, 'wins': round(matches * win_chance),
+        })
+    return stats
+
+
+def generate_players(count, months, seed=None, end=None, skip_inactive=True, batch_size=500, progress=None):
+    """
+    Создает синтетических игроков с месячной статистикой.
+    Игроки и месяцы записываются пачками через bulk_create, после каждой
+    пачки пересчитываются итоги и рейтинг (rebuild_rollups)
+    и обновляется поисковый индекс.
+
+    Args:
+        count (int): Число игроков
+        months (int): Месяцев статистики на игрока (неактивные месяцы пропускаются)
+        seed (int): Зерно генератора - одинаковое зерно дает одинаковые данные
+        end (tuple): (год, месяц) последнего месяца, по умолчанию текущий
+        skip_inactive (bool): Пропускать месяцы без игр (False - ровно months месяцев у каждого)
+        batch_size (int): Игроков в одной транзакции
+        progress (callable): Вызывается с числом созданных игроков после каждой пачки
+
+    Returns:
+        list: ID созданных игроков
+    """
+    rng = random.Random(seed)
+    periods = last_months(months, end)
+    last = (Player.objects.filter(steam_id__startswith=FAKE_STEAM_ID_PREFIX)
+            .order_by('-steam_id').values_list('steam_id', flat=True).first())
+    next_steam_id = int(last) + 1 if last else FAKE_STEAM_ID_BASE
+    now = timezone.now()
+
+    created = []
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        with transaction.atomic():
+            players = Player.objects.bulk_create([
+                Player(
+                    steam_id=str(next_steam_id + start + offset), nickname=fake_nickname(rng),
+                    country=rng.choice(COUNTRIES), cs2_hours=round(rng.uniform(50, 5000), 1),
+                    last_updated=now,
+                )
+                for offset in range(size)
+            ])
+            MonthlyStat.objects.bulk_create(
+                [MonthlyStat(player=player, **values)
+                 for player in players for values in fake_monthly_stats(rng, periods, skip_inactive)],
+                batch_size=1000,
+            )
+            # bulk_create обходит MonthlyStat.save() и сигналы Player
+            player_ids = [player.pk for player in players]
+            rebuild_rollups(player_ids)
+            index_players((player.pk, player.nickname, player.steam_id) for player in players)
+        created += player_ids
+        if progress:
+            progress(len(created))
+    return created
+
+
+def delete_fake_players():
+    """
+    Удаляет всех синтетических игроков (их статистика удаляется каскадом).
+
+    Returns:
+        int: Число удаленных игроков
+    """
+    players = Player.objects.filter(steam_id__startswith=FAKE_STEAM_ID_PREFIX)
+    with transaction.atomic():
+        # Месяцы и матчи удаляем одним запросом: сигналы удаления вычитали бы
+        # каждую строку из итогов игроков, которые все равно удаляются
+        with connection.cursor() as cursor:
+            for model in (Match, MonthlyStat):
+                cursor.execute(
+                    f"DELETE FROM {model._meta.db_table} WHERE player_id IN "
+                    f"(SELECT id FROM {Player._meta.db_table} WHERE steam_id LIKE %s)",
+                    [FAKE_STEAM_ID_PREFIX + '%'],
+                )
+        _, deleted = players.delete()
+    return deleted.get(Player._meta.label, 0)
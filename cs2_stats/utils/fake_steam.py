@@ -0,0 +1,247 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from .fake_data import COUNTRIES, fake_nickname
+
+CS2_APP_ID = 730
+
+# Коды ответа при имитации сбоев Steam
+ERROR_STATUSES = (500, 502, 503)
+
+
+def parse_latency(spec):
+    """
+    Распределение задержки ответа из строки.
+
+    Форматы (значения в миллисекундах):
+        none            - без задержки
+        fixed:50        - всегда 50 мс
+        uniform:20,200  - равномерно от 20 до 200 мс
+        normal:100,30   - нормальное: среднее 100, отклонение 30 (не меньше 0)
+        lognormal:80,0.5 - логнормальное: медиана 80, sigma 0.5 (длинный хвост)
+
+    Returns:
+        callable: Функция (random.Random) -> задержка в секундах
+
+    Raises:
+        ValueError: Неизвестный формат
+    """
+    kind, _, args = (spec or 'none').partition(':')
+    try:
+        values = [float(value) for value in args.split(',')] if args else []
+    except ValueError:
+        raise ValueError(f"Invalid latency spec: {spec}")
+
+    if kind == 'none' and not values:
+        return lambda rng: 0.0
+    if kind == 'fixed' and len(values) == 1:
+        return lambda rng: values[0] / 1000
+    if kind == 'uniform' and len(values) == 2:
+        return lambda rng: rng.uniform(*values) / 1000
+    if kind == 'normal' and len(values) == 2:
+        return lambda rng: max(0.0, rng.gauss(*values)) / 1000
+    if kind == 'lognormal' and len(values) == 2 and values[0] > 0:
+        median, sigma = values
+        return lambda rng: median * rng.lognormvariate(0, sigma) / 1000
+    raise ValueError(f"Invalid latency spec: {spec}")
+
+
+def _profile_rng(seed, steam_id):
+    """Генератор, зависящий только от зерна и Steam ID - профиль не меняется между запусками."""
+    digest = hashlib.sha256(f"{seed}:{steam_id}".encode()).digest()
+    return random.Random(int.from_bytes(digest[:8], 'big'))
+
+
+def fake_summary(steam_id, seed=0, missing_rate=0.0):
+    """
+    Профиль игрока в формате GetPlayerSummaries.
+
+    Returns:
+        dict: Данные игрока или None, если такой Steam ID "не существует"
+    """
+    rng = _profile_rng(seed, steam_id)
+    if rng.random() < missing_rate:
+        return None
+    avatar = f"https://avatars.fake-steam.local/{hashlib.md5(steam_id.encode()).hexdigest()}"
+    summary = {
+        'steamid': steam_id,
+        'communityvisibilitystate': 3,
+        'profilestate': 1,
+        'personaname': fake_nickname(rng),
+        'profileurl': f"https://steamcommunity.com/profiles/{steam_id}/",
+        'avatar': f"{avatar}.jpg",
+        'avatarmedium': f"{avatar}_medium.jpg",
+        'avatarfull': f"{avatar}_full.jpg",
+        'personastate': rng.randint(0, 1),
+    }
+    country = rng.choice(COUNTRIES)
+    if country:
+        summary['loccountrycode'] = country
+    return summary
+
+
+def fake_playtime_minutes(steam_id, seed=0, private_rate=0.0):
+    """Минуты в CS2 для GetOwnedGames или None для приватного профиля."""
+    rng = _profile_rng(seed, f"games:{steam_id}")
+    if rng.random() < private_rate:
+        return None
+    return rng.randint(60, 300000)
+
+
+class FakeSteamServer(ThreadingHTTPServer):
+    """
+    Локальная замена Steam Web API для нагрузочных тестов без сети и ключа.
+    Реализует GetPlayerSummaries и GetOwnedGames с детерминированными
+    профилями (одинаковыми при одинаковом seed), задержкой ответа
+    по заданному распределению, ограничением частоты (429 с Retry-After)
+    и случайными 429/5xx. Счетчики ответов - GET /__stats__.
+
+    Пример:
+        server = FakeSteamServer(latency='lognormal:80,0.5', error_rate=0.05).start()
+        ... STEAM_API_BASE_URL=server.url ...
+        server.stop()
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency='none', error_rate=0.0, throttle_rate=0.0,
+                 rate_limit=0.0, missing_rate=0.05, private_rate=0.1, seed=0, api_key=''):
+        """
+        Args:
+            address (tuple): (хост, порт), порт 0 - любой свободный
+            latency (str): Распределение задержки, см. parse_latency
+            error_rate (float): Доля ответов 500/502/503
+            throttle_rate (float): Доля случайных ответов 429
+            rate_limit (float): Запросов в секунду, сверх которых отвечаем 429 (0 - без ограничения)
+            missing_rate (float): Доля Steam ID, которых "нет" в Steam
+            private_rate (float): Доля приватных профилей (без списка игр)
+            seed (int): Зерно профилей и случайных сбоев
+            api_key (str): Требуемый ключ (пустой - любой)
+        """
+        super().__init__(address, FakeSteamHandler)
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rate_limit = rate_limit
+        self.missing_rate = missing_rate
+        self.private_rate = private_rate
+        self.seed = seed
+        self.api_key = api_key
+
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.tokens = max(1.0, rate_limit)
+        self.tokens_updated = time.monotonic()
+        self.stats = {'requests': 0, 'ok': 0, 'throttled': 0, 'errors': 0, 'not_found': 0, 'forbidden': 0}
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Запускает сервер в фоновом потоке (для тестов)."""
+        # Короткий интервал опроса - stop() не ждет по полсекунды
+        self._thread = threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def random(self):
+        with self.lock:
+            return self.rng.random()
+
+    def sample_latency(self):
+        with self.lock:
+            return self.latency(self.rng)
+
+    def take_token(self):
+        """Token bucket на весь сервер: False - лимит частоты превышен."""
+        if self.rate_limit <= 0:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(max(1.0, self.rate_limit), self.tokens + (now - self.tokens_updated) * self.rate_limit)
+            self.tokens_updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class FakeSteamHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов FakeSteamServer."""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive, как у настоящего Steam
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split('/') if part]
+        method = parts[1] if len(parts) == 3 else None
+
+        if url.path == '/__stats__':
+            with server.lock:
+                stats = dict(server.stats)
+            return self._send(200, stats)
+
+        server.count('requests')
+        if method not in ('GetPlayerSummaries', 'GetOwnedGames'):
+            server.count('not_found')
+            return self._send(404, {'error': 'Not Found'})
+        if server.api_key and params.get('key') != server.api_key:
+            server.count('forbidden')
+            return self._send(403, {'error': 'Forbidden'})
+
+        delay = server.sample_latency()
+        if delay:
+            time.sleep(delay)
+
+        if not server.take_token() or server.random() < server.throttle_rate:
+            server.count('throttled')
+            return self._send(429, {'error': 'Too Many Requests'}, headers={'Retry-After': '1'})
+        if server.random() < server.error_rate:
+            server.count('errors')
+            with server.lock:
+                status = server.rng.choice(ERROR_STATUSES)
+            return self._send(status, {'error': 'Service Unavailable'})
+
+        server.count('ok')
+        if method == 'GetPlayerSummaries':
+            steam_ids = [steam_id for steam_id in params.get('steamids', '').split(',') if steam_id][:100]
+            players = [fake_summary(steam_id, server.seed, server.missing_rate) for steam_id in steam_ids]
+            return self._send(200, {'response': {'players': [player for player in players if player]}})
+
+        minutes = fake_playtime_minutes(params.get('steamid', ''), server.seed, server.private_rate)
+        if minutes is None:
+            return self._send(200, {'response': {}})
+        games = [{'appid': CS2_APP_ID, 'playtime_forever': minutes, 'playtime_2weeks': minutes % 900}]
+        return self._send(200, {'response': {'game_count': len(games), 'games': games}})
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Журнал каждого запроса мешает нагрузочным тестам
+        pass
@@ -0,0 +1,235 @@
+import csv
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from ..forms import MonthlyStatForm, validate_stat_counters
+from ..models import MonthlyStat, Player, SteamRefreshJob
+from .chart_cache import bump_stats_version
+from .player_search import index_players
+from .rollups import COUNTERS, apply_deltas
+
+# Поля статистики в файле импорта (плюс steam_id, если игрок не задан)
+STAT_FIELDS = tuple(MonthlyStatForm.Meta.fields)
+
+# Сколько отклоненных строк сохраняется в отчете (остальные только считаются)
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportReport:
+    """Итоги импорта: счетчики строк и первые отклоненные строки с причинами."""
+
+    def __init__(self):
+        self.rows = 0        # Прочитано строк данных
+        self.imported = 0    # Записано (создано или обновлено) записей
+        self.rejected = 0    # Отклонено строк
+        self.skipped = 0     # Пропущено уже загруженных строк (матчи с известным external_id)
+        self.chunks = 0      # Записано пачек
+        self.players = set()  # ID игроков, чья статистика изменилась
+        self.errors = []     # [(номер строки, сообщение)], не больше MAX_REPORTED_ERRORS
+
+    def reject(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def iter_rows(stream, fmt):
+    """
+    Потоково читает строки файла импорта, не загружая файл в память.
+
+    Args:
+        stream: Текстовый поток (файл, загруженный файл в TextIOWrapper)
+        fmt (str): 'csv' (первая строка - заголовок) или 'jsonl' (объект JSON на строку)
+
+    Yields:
+        tuple: (номер строки в файле, dict значений или строка ошибки разбора)
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, f"Invalid JSON: {e.msg}"
+                continue
+            yield line_number, row if isinstance(row, dict) else "Expected a JSON object"
+    else:
+        raise ValueError(f"Unknown import format: {fmt}")
+
+
+def detect_format(filename):
+    """Формат файла по расширению: .jsonl/.ndjson/.json - jsonl, иначе csv."""
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def clean_row(row):
+    """
+    Проверяет строку: поля MonthlyStatForm приводят значения к int
+    и проверяют месяц, validate_stat_counters проверяет счетчики
+    (кроме правила формы о победах - еще и отрицательные значения).
+    Уникальность месяца не проверяется - импорт обновляет существующие записи.
+
+    Returns:
+        tuple: (dict значений или None, сообщение об ошибке или None)
+    """
+    values = {}
+    errors = []
+    for name in STAT_FIELDS:
+        try:
+            values[name] = MonthlyStatForm.base_fields[name].clean(row.get(name))
+        except ValidationError as e:
+            errors.append(f"{name}: {' '.join(e.messages)}")
+    for name, message in validate_stat_counters(values).items():
+        errors.append(f"{name}: {message}")
+
+    if errors:
+        return None, '; '.join(errors)
+    return values, None
+
+
+def resolve_players(steam_ids, player=None, create_players=False):
+    """
+    ID игроков пачки одним запросом.
+
+    Args:
+        steam_ids (set): Steam ID из строк пачки
+        player (Player): Все строки относятся к этому игроку
+        create_players (bool): Создать неизвестных игроков
+                               (и поставить загрузку их профиля из Steam в очередь)
+
+    Returns:
+        dict: {steam_id: id игрока} (неизвестных игроков в нем нет)
+    """
+    if player:
+        return {player.steam_id: player.pk}
+
+    player_ids = dict(Player.objects.filter(steam_id__in=steam_ids).values_list('steam_id', 'pk'))
+    missing = steam_ids - set(player_ids)
+    if missing and create_players:
+        Player.objects.bulk_create([Player(steam_id=steam_id) for steam_id in missing],
+                                   ignore_conflicts=True)
+        created = list(Player.objects.filter(steam_id__in=missing).values_list('pk', 'nickname', 'steam_id'))
+        player_ids.update((steam_id, pk) for pk, _, steam_id in created)
+        # bulk_create не отправляет сигналы - добавляем новых игроков в поиск сами
+        index_players(created)
+        for steam_id in missing:
+            SteamRefreshJob.enqueue(steam_id)
+    return player_ids
+
+
+def import_stats(rows, player=None, chunk_size=1000, create_players=False, progress=None):
+    """
+    Импортирует месячную статистику пачками.
+    Каждая пачка проверяется целиком, игроки находятся одним запросом,
+    записи создаются или обновляются одним bulk_create(update_conflicts=True)
+    по (player, year, month) в отдельной транзакции. bulk_create обходит
+    MonthlyStat.save(), поэтому в той же транзакции разница со старыми
+    значениями прибавляется к итогам и рейтингу (rollups.apply_deltas),
+    а после ее коммита сбрасывается кэш графиков. Если импорт прервется,
+    уже записанные пачки остаются согласованными.
+
+    Args:
+        rows (iterable): Пары (номер строки, dict или сообщение об ошибке) из iter_rows
+        player (Player): Импортировать все строки этому игроку (колонка steam_id не нужна)
+        chunk_size (int): Строк в одной пачке
+        create_players (bool): Создавать игроков с неизвестным steam_id
+                               (и ставить загрузку их профиля из Steam в очередь)
+        progress (callable): Вызывается с ImportReport после каждой пачки
+
+    Returns:
+        ImportReport: Итоги импорта
+    """
+    report = ImportReport()
+    rows = iter(rows)
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        _import_chunk(chunk, player, create_players, report)
+        report.chunks += 1
+        if progress:
+            progress(report)
+    return report
+
+
+def _import_chunk(chunk, player, create_players, report):
+    """Проверяет и записывает одну пачку строк."""
+    valid = []
+    for line, row in chunk:
+        report.rows += 1
+        if isinstance(row, str):
+            report.reject(line, row)
+            continue
+        values, error = clean_row(row)
+        steam_id = player.steam_id if player else str(row.get('steam_id') or '').strip()
+        if error is None and not steam_id:
+            error = "steam_id: This field is required."
+        if error:
+            report.reject(line, error)
+            continue
+        valid.append((line, steam_id, values))
+
+    player_ids = resolve_players({steam_id for _, steam_id, _ in valid}, player, create_players)
+
+    # Повтор месяца внутри пачки - побеждает последняя строка
+    stats = {}
+    for line, steam_id, values in valid:
+        if steam_id not in player_ids:
+            report.reject(line, f"steam_id: Unknown player {steam_id}")
+            continue
+        stat = MonthlyStat(player_id=player_ids[steam_id], **values)
+        stats[(stat.player_id, stat.year, stat.month)] = stat
+
+    if stats:
+        with transaction.atomic():
+            _write_chunk(stats)
+        report.imported += len(stats)
+        report.players.update(player_id for player_id, _, _ in stats)
+
+
+def _write_chunk(stats):
+    """
+    Записывает пачку одним upsert и применяет разницу к итогам.
+    Существующие месяцы читаются одним запросом с блокировкой строк
+    (как в MonthlyStat.save()). Вызывается внутри транзакции пачки.
+
+    Args:
+        stats (dict): {(player_id, year, month): MonthlyStat}
+    """
+    player_ids = {player_id for player_id, _, _ in stats}
+    existing = {
+        (row['player_id'], row['year'], row['month']): row
+        for row in MonthlyStat.objects.select_for_update().filter(
+            player_id__in=player_ids, year__in={year for _, year, _ in stats}
+        ).values('player_id', 'year', 'month', *COUNTERS)
+    }
+
+    deltas = defaultdict(lambda: dict.fromkeys(('months',) + COUNTERS, 0))
+    for key, stat in stats.items():
+        delta = deltas[key[:2]]
+        previous = existing.get(key)
+        if previous is None:
+            delta['months'] += 1
+        for field in COUNTERS:
+            delta[field] += getattr(stat, field) - (previous[field] if previous else 0)
+
+    MonthlyStat.objects.bulk_create(
+        list(stats.values()), update_conflicts=True,
+        unique_fields=['player', 'year', 'month'],
+        update_fields=list(COUNTERS) + ['updated_at'],
+    )
+    apply_deltas(deltas)
+
+    # Графики строятся из месячной статистики - сбрасываем их кэш после коммита
+    for player_id in player_ids:
+        transaction.on_commit(lambda player_id=player_id: bump_stats_version(player_id))
@@ -0,0 +1,227 @@
+from collections import defaultdict
+
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Cast
+from django.db.models.lookups import GreaterThan
+
+from ..models import LeaderboardEntry, Player, YearStat
+
+# Поля строки рейтинга, которые перезаписываются при обновлении
+ENTRY_FIELDS = ('country', 'matches_played', 'kills', 'deaths', 'wins', 'kd', 'win_pct', 'kpm')
+
+# Счетчики строки рейтинга (совпадают с rollups.COUNTERS)
+ENTRY_COUNTERS = ('matches_played', 'kills', 'deaths', 'wins')
+
+
+def build_entry(player_id, year, country, matches, kills, deaths, wins):
+    """
+    Создает (не сохраняет) строку рейтинга по суммам счетчиков.
+    Показатели считаются без округления, как MonthlyStatQuerySet.with_metrics().
+    """
+    return LeaderboardEntry(
+        player_id=player_id, year=year, country=country,
+        matches_played=matches, kills=kills, deaths=deaths, wins=wins,
+        kd=kills / deaths if deaths > 0 else 0.0,
+        win_pct=wins / matches * 100 if matches > 0 else 0.0,
+        kpm=kills / matches if matches > 0 else 0.0,
+    )
+
+
+def refresh_player_entries(player_id, years):
+    """
+    Пересчитывает строки рейтинга игрока за указанные годы и за все время
+    из готовых итогов (YearStat и поля Player) - два коротких запроса
+    и один upsert. Используется, когда строки рейтинга еще нет
+    (см. apply_entry_deltas).
+
+    Args:
+        player_id (int): ID игрока
+        years (iterable): Годы, статистика которых изменилась
+    """
+    player = (Player.objects.filter(pk=player_id)
+              .values('country', 'total_matches', 'total_kills', 'total_deaths', 'total_wins')
+              .first())
+    if player is None:
+        return
+
+    years = set(years)
+    entries = []
+    # В рейтинг попадают только периоды, в которых были сыгранные матчи
+    if player['total_matches'] > 0:
+        entries.append(build_entry(
+            player_id, LeaderboardEntry.ALL_TIME, player['country'], player['total_matches'],
+            player['total_kills'], player['total_deaths'], player['total_wins'],
+        ))
+    for year_stat in YearStat.objects.filter(player_id=player_id, year__in=years, matches_played__gt=0):
+        entries.append(build_entry(
+            player_id, year_stat.year, player['country'], year_stat.matches_played,
+            year_stat.kills, year_stat.deaths, year_stat.wins,
+        ))
+
+    # Периоды без матчей из таблицы убираем
+    stale_years = (years | {LeaderboardEntry.ALL_TIME}) - {entry.year for entry in entries}
+    if stale_years:
+        LeaderboardEntry.objects.filter(player_id=player_id, year__in=stale_years).delete()
+    if entries:
+        LeaderboardEntry.objects.bulk_create(
+            entries, update_conflicts=True,
+            unique_fields=['player', 'year'], update_fields=ENTRY_FIELDS,
+        )
+
+
+def _ratio(numerator, denominator, multiplier=1):
+    """
+    numerator / denominator * multiplier в SQL, 0 при нулевом знаменателе.
+    Порядок операций как в build_entry, чтобы значения совпадали до бита.
+    """
+    return Case(
+        When(GreaterThan(denominator, 0),
+             then=Cast(numerator, models.FloatField()) / denominator * multiplier),
+        default=Value(0.0),
+        output_field=models.FloatField(),
+    )
+
+
+def _apply_entry_delta(player_id, years, delta):
+    """
+    Прибавляет одну и ту же разницу счетчиков к строкам рейтинга игрока
+    за годы years и пересчитывает показатели одним UPDATE
+    (правая часть SET видит значения до изменения).
+
+    Returns:
+        bool: False - какой-то строки нет (период только что получил матчи),
+              нужен refresh_player_entries
+    """
+    if not any(delta[field] for field in ENTRY_COUNTERS):
+        return True
+
+    def new(field):
+        return F(field) + delta[field]
+
+    entries = LeaderboardEntry.objects.filter(player_id=player_id, year__in=years)
+    updated = entries.update(
+        **{field: new(field) for field in ENTRY_COUNTERS},
+        kd=_ratio(new('kills'), new('deaths')),
+        win_pct=_ratio(new('wins'), new('matches_played'), 100),
+        kpm=_ratio(new('kills'), new('matches_played')),
+    )
+    if delta['matches_played'] < 0:
+        # Периоды без матчей в рейтинг не попадают
+        entries.filter(matches_played__lte=0).delete()
+    return updated == len(years)
+
+
+def apply_entry_deltas(year_deltas, player_deltas):
+    """
+    Применяет разницу итогов к строкам рейтинга UPDATE с F() выражениями,
+    без чтения итогов. Если у игрока изменился один год, его строка
+    и строка за все время обновляются одним запросом. Строки, которых
+    еще нет, создаются через refresh_player_entries. Вызывается
+    из rollups.apply_deltas после обновления YearStat и итогов игроков.
+
+    Args:
+        year_deltas (dict): {(player_id, year): разница счетчиков}
+        player_deltas (dict): {player_id: разница счетчиков за все время}
+    """
+    years = defaultdict(list)
+    for player_id, year in year_deltas:
+        years[player_id].append(year)
+
+    missing = set()
+    for player_id, delta in player_deltas.items():
+        player_years = years[player_id]
+        if len(player_years) == 1:
+            # Разница за год совпадает с разницей за все время
+            updates = [([player_years[0], LeaderboardEntry.ALL_TIME], delta)]
+        else:
+            updates = [([year], year_deltas[(player_id, year)]) for year in player_years]
+            updates.append(([LeaderboardEntry.ALL_TIME], delta))
+        for entry_years, entry_delta in updates:
+            if not _apply_entry_delta(player_id, entry_years, entry_delta):
+                missing.add(player_id)
+
+    for player_id in missing:
+        refresh_player_entries(player_id, years[player_id])
+
+
+def sync_player_countries(players):
+    """
+    Переносит изменившуюся страну игроков в их строки рейтинга.
+    Один UPDATE на каждую страну.
+
+    Args:
+        players (iterable): Объекты Player с актуальным полем country
+    """
+    by_country = defaultdict(list)
+    for player in players:
+        by_country[player.country].append(player.pk)
+    for country, player_ids in by_country.items():
+        LeaderboardEntry.objects.filter(player_id__in=player_ids).update(country=country)
+
+
+def rebuild_leaderboard(player_ids=None):
+    """
+    Полностью перестраивает таблицу рейтинга из YearStat и итогов игроков.
+
+    Args:
+        player_ids (iterable): Перестроить только этих игроков (None - всех)
+
+    Returns:
+        int: Количество записанных строк рейтинга
+    """
+    players = Player.objects.order_by().values_list(
+        'id', 'country', 'total_matches', 'total_kills', 'total_deaths', 'total_wins'
+    )
+    year_stats = YearStat.objects.filter(matches_played__gt=0).order_by().values_list(
+        'player_id', 'year', 'matches_played', 'kills', 'deaths', 'wins'
+    )
+    entries = LeaderboardEntry.objects.all()
+    if player_ids is not None:
+        player_ids = list(player_ids)
+        players = players.filter(pk__in=player_ids)
+        year_stats = year_stats.filter(player_id__in=player_ids)
+        entries = entries.filter(player_id__in=player_ids)
+
+    countries = {}
+    to_create = []
+    for player_id, country, matches, kills, deaths, wins in players.iterator():
+        countries[player_id] = country
+        if matches > 0:
+            to_create.append(build_entry(player_id, LeaderboardEntry.ALL_TIME, country,
+                                         matches, kills, deaths, wins))
+    for player_id, year, matches, kills, deaths, wins in year_stats.iterator():
+        to_create.append(build_entry(player_id, year, countries.get(player_id, ''),
+                                     matches, kills, deaths, wins))
+
+    with transaction.atomic():
+        entries.delete()
+        LeaderboardEntry.objects.bulk_create(to_create, batch_size=500)
+    return len(to_create)
+
+
+def leaderboard_queryset(metric, year=LeaderboardEntry.ALL_TIME, country=None, min_matches=0):
+    """
+    Строки рейтинга по показателю в порядке убывания.
+    Порядок (-metric, player_id) совпадает с индексами LeaderboardEntry.
+
+    Args:
+        metric (str): Ключ из LeaderboardEntry.METRICS
+        year (int): Год или LeaderboardEntry.ALL_TIME
+        country (str): Код страны (None - все страны)
+        min_matches (int): Минимальное количество матчей
+
+    Returns:
+        QuerySet: Строки рейтинга с подгруженным игроком
+    """
+    if metric not in LeaderboardEntry.METRICS:
+        raise ValueError(f"Unknown leaderboard metric: {metric}")
+
+    queryset = LeaderboardEntry.objects.filter(year=year)
+    if country:
+        queryset = queryset.filter(country=country)
+    if min_matches:
+        queryset = queryset.filter(matches_played__gte=min_matches)
+    return (queryset.select_related('player')
+            .only('player__steam_id', 'player__nickname', 'player__avatar', *ENTRY_FIELDS, 'year')
+            .order_by(f'-{metric}', 'player_id'))
@@ -0,0 +1,191 @@
+from collections import defaultdict
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from ..forms import MatchForm
+from ..models import Match, MonthlyStat
+from .chart_cache import bump_stats_version
+from .importer import ImportReport, resolve_players
+from .rollups import COUNTERS, apply_deltas
+
+# Поля матча в файле загрузки и в теле POST /api/matches/ (плюс steam_id)
+MATCH_FIELDS = tuple(MatchForm.Meta.fields)
+
+# Короткие названия колонок, которые тоже принимаются
+FIELD_ALIASES = {'map': 'map_name'}
+
+
+def clean_match(row):
+    """
+    Проверяет строку матча: поля MatchForm приводят значения к нужным типам,
+    убийства и смерти не могут быть отрицательными.
+
+    Returns:
+        tuple: (dict значений или None, сообщение об ошибке или None)
+    """
+    row = dict(row)
+    for alias, name in FIELD_ALIASES.items():
+        if alias in row and name not in row:
+            row[name] = row[alias]
+    if isinstance(row.get('result'), str):
+        row['result'] = row['result'].strip().lower()
+
+    values = {}
+    errors = []
+    for name in MATCH_FIELDS:
+        try:
+            values[name] = MatchForm.base_fields[name].clean(row.get(name))
+        except ValidationError as e:
+            errors.append(f"{name}: {' '.join(e.messages)}")
+    for name in ('kills', 'deaths'):
+        if values.get(name) is not None and values[name] < 0:
+            errors.append(f"{name}: Value cannot be negative!")
+
+    if errors:
+        return None, '; '.join(errors)
+    if timezone.is_naive(values['played_at']):
+        values['played_at'] = timezone.make_aware(values['played_at'])
+    return values, None
+
+
+def rollup_matches(matches, sign=1):
+    """
+    Прибавляет матчи к месячной статистике (sign=-1 - вычитает удаленные)
+    в той же транзакции, что и запись матчей. Затронутые месяцы читаются
+    одним запросом с блокировкой строк (как в MonthlyStat.save()),
+    записываются одним upsert, затем та же разница, сложенная по годам,
+    прибавляется к YearStat, итогам игроков и рейтингу (rollups.apply_deltas).
+    Месяц матча определяется по времени TIME_ZONE проекта.
+
+    Args:
+        matches (iterable): Сохраненные объекты Match
+        sign (int): 1 - добавить матчи, -1 - вычесть
+    """
+    months = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for match in matches:
+        played_at = timezone.localtime(match.played_at)
+        delta = months[(match.player_id, played_at.year, played_at.month)]
+        delta['matches_played'] += sign
+        delta['kills'] += sign * match.kills
+        delta['deaths'] += sign * match.deaths
+        delta['wins'] += sign * (match.result == Match.WIN)
+    if not months:
+        return
+
+    player_ids = sorted({player_id for player_id, _, _ in months})
+    with transaction.atomic():
+        stats = {
+            (stat.player_id, stat.year, stat.month): stat
+            for stat in MonthlyStat.objects.select_for_update().filter(
+                player_id__in=player_ids, year__in={year for _, year, _ in months}
+            )
+        }
+        rows = []
+        year_deltas = defaultdict(lambda: dict.fromkeys(('months',) + COUNTERS, 0))
+        for (player_id, year, month), delta in months.items():
+            stat = stats.get((player_id, year, month))
+            year_delta = year_deltas[(player_id, year)]
+            if stat is None:
+                if sign < 0:
+                    continue  # Месяц удалили вручную - вычитать не из чего
+                stat = MonthlyStat(player_id=player_id, year=year, month=month)
+                year_delta['months'] += 1
+            for field, value in delta.items():
+                setattr(stat, field, getattr(stat, field) + value)
+                year_delta[field] += value
+            rows.append(stat)
+
+        # Новые и измененные месяцы - одним upsert по (player, year, month);
+        # строки заблокированы, поэтому записываем уже посчитанные суммы
+        MonthlyStat.objects.bulk_create(
+            rows, batch_size=500, update_conflicts=True, unique_fields=['player', 'year', 'month'],
+            update_fields=list(COUNTERS) + ['updated_at'],
+        )
+        # bulk-операции обходят MonthlyStat.save() - разницу к итогам прибавляем сами
+        apply_deltas(year_deltas)
+
+        # Графики профиля строятся из месячной статистики - сбрасываем их кэш
+        for player_id in player_ids:
+            transaction.on_commit(lambda player_id=player_id: bump_stats_version(player_id))
+
+
+def ingest_matches(rows, player=None, chunk_size=1000, create_players=False, progress=None):
+    """
+    Загружает матчи пачками. Каждая пачка проверяется целиком,
+    игроки и уже загруженные external_id находятся одним запросом,
+    матчи записываются одним bulk_create и в той же транзакции
+    суммируются в MonthlyStat (rollup_matches).
+
+    Args:
+        rows (iterable): Пары (номер строки, dict или сообщение об ошибке) из importer.iter_rows
+        player (Player): Загружать все матчи этому игроку (колонка steam_id не нужна)
+        chunk_size (int): Матчей в одной пачке (транзакции)
+        create_players (bool): Создавать игроков с неизвестным steam_id
+        progress (callable): Вызывается с ImportReport после каждой пачки
+
+    Returns:
+        ImportReport: Итоги загрузки (imported - записано матчей,
+                      skipped - матчи с уже известным external_id)
+    """
+    report = ImportReport()
+    rows = iter(rows)
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        _ingest_chunk(chunk, player, create_players, report)
+        report.chunks += 1
+        if progress:
+            progress(report)
+    return report
+
+
+def _ingest_chunk(chunk, player, create_players, report):
+    """Проверяет и записывает одну пачку матчей."""
+    valid = []
+    for line, row in chunk:
+        report.rows += 1
+        if isinstance(row, str):
+            report.reject(line, row)
+            continue
+        values, error = clean_match(row)
+        steam_id = player.steam_id if player else str(row.get('steam_id') or '').strip()
+        if error is None and not steam_id:
+            error = "steam_id: This field is required."
+        if error:
+            report.reject(line, error)
+            continue
+        valid.append((line, steam_id, values))
+
+    player_ids = resolve_players({steam_id for _, steam_id, _ in valid}, player, create_players)
+
+    # Матчи, загруженные раньше (или повторенные в этой же пачке), пропускаем
+    external_ids = {values['external_id'] for _, _, values in valid if values['external_id']}
+    seen = set()
+    if external_ids:
+        seen = set(Match.objects.filter(player_id__in=set(player_ids.values()), external_id__in=external_ids)
+                   .values_list('player_id', 'external_id'))
+
+    matches = []
+    for line, steam_id, values in valid:
+        if steam_id not in player_ids:
+            report.reject(line, f"steam_id: Unknown player {steam_id}")
+            continue
+        key = (player_ids[steam_id], values['external_id'])
+        if values['external_id']:
+            if key in seen:
+                report.skipped += 1
+                continue
+            seen.add(key)
+        matches.append(Match(player_id=player_ids[steam_id], **values))
+
+    if matches:
+        with transaction.atomic():
+            Match.objects.bulk_create(matches, batch_size=500)
+            rollup_matches(matches)
+        report.imported += len(matches)
+        report.players.update(match.player_id for match in matches)
@@ -0,0 +1,273 @@
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from functools import wraps
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Границы гистограмм времени по умолчанию (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Таблица общего хранилища: каждый процесс прибавляет к значениям свои приращения
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS metrics (
+        name TEXT NOT NULL,
+        labels TEXT NOT NULL,
+        le TEXT NOT NULL,
+        value REAL NOT NULL,
+        PRIMARY KEY (name, labels, le)
+    )
+"""
+UPSERT = """
+    INSERT INTO metrics (name, labels, le, value) VALUES (?, ?, ?, ?)
+    ON CONFLICT (name, labels, le) DO UPDATE SET value = value + excluded.value
+"""
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик процесса. Счетчики и гистограммы копят приращения в памяти,
+    раз в METRICS_FLUSH_INTERVAL секунд (и при выходе процесса) приращения
+    прибавляются к общему файлу SQLite METRICS_DB. Все WSGI-процессы пишут
+    в один файл, поэтому /metrics отдает сумму по всем процессам,
+    а значения не обнуляются при перезапуске процессов.
+    """
+
+    def __init__(self):
+        self.metrics = {}  # имя -> Counter/Histogram, в порядке объявления
+        self.pending = {}  # (имя ряда, метки, le) -> приращение
+        self.lock = threading.Lock()
+        self.next_flush = 0.0
+        self.flush_at_exit = False
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    @property
+    def enabled(self):
+        return settings.METRICS_ENABLED
+
+    def add(self, increments):
+        """
+        Прибавляет приращения к рядам; при необходимости сбрасывает их в хранилище.
+
+        Args:
+            increments (list): Пары ((имя ряда, метки, le), приращение)
+        """
+        with self.lock:
+            for key, value in increments:
+                self.pending[key] = self.pending.get(key, 0) + value
+            if not self.flush_at_exit:
+                # Процесс, который ничего не записал, при выходе хранилище не трогает
+                self.flush_at_exit = True
+                atexit.register(self.flush)
+        if time.monotonic() >= self.next_flush:
+            self.flush()
+
+    def flush(self):
+        """Прибавляет накопленные приращения к общему хранилищу."""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.next_flush = time.monotonic() + settings.METRICS_FLUSH_INTERVAL
+        if not pending:
+            return
+        try:
+            with closing(self._connect()) as db, db:
+                db.executemany(UPSERT, [(*key, value) for key, value in pending.items()])
+        except sqlite3.Error as e:
+            # Хранилище недоступно - приращения не теряем, попробуем в следующий раз
+            logger.warning("Metrics flush failed: %s", e)
+            with self.lock:
+                for key, value in pending.items():
+                    self.pending[key] = self.pending.get(key, 0) + value
+
+    def read(self):
+        """
+        Значения всех рядов из общего хранилища.
+
+        Returns:
+            dict: {(имя ряда, метки, le): значение}
+        """
+        with closing(self._connect()) as db:
+            return {(name, labels, le): value
+                    for name, labels, le, value in db.execute("SELECT name, labels, le, value FROM metrics")}
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus."""
+        values = self.read()
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples(values))
+        return '\n'.join(lines) + '\n'
+
+    def _connect(self):
+        db = sqlite3.connect(settings.METRICS_DB, timeout=5)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(CREATE_TABLE)
+        return db
+
+    def _reset_after_fork(self):
+        # Дочерний процесс (gunicorn --preload) не должен повторно
+        # отправить приращения, накопленные родителем до fork
+        self.lock = threading.Lock()
+        self.pending = {}
+
+
+REGISTRY = MetricsRegistry()
+os.register_at_fork(after_in_child=REGISTRY._reset_after_fork)
+
+
+def _format_labels(labelnames, labels):
+    """Метки в виде Prometheus: view="home",method="GET"."""
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {tuple(labels)}")
+    return ','.join(
+        f'{name}="{_escape(labels[name])}"' for name in labelnames
+    )
+
+
+class _Metric:
+    """Общая часть счетчика и гистограммы: имя, описание и метки."""
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.registry = registry
+        self._labels = {}  # Уже отформатированные наборы меток
+        registry.register(self)
+
+    def format_labels(self, labels):
+        key = tuple(labels.items())
+        text = self._labels.get(key)
+        if text is None:
+            text = self._labels[key] = _format_labels(self.labelnames, labels)
+        return text
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _sample(name, labels, value, extra=''):
+    labels = ','.join(part for part in (labels, extra) if part)
+    return f"{name}{{{labels}}} {_format_value(value)}" if labels else f"{name} {_format_value(value)}"
+
+
+class Counter(_Metric):
+    """Счетчик, который только растет (запросы, ошибки, попадания в кэш)."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if self.registry.enabled:
+            self.registry.add([((self.name, self.format_labels(labels), ''), amount)])
+
+    def samples(self, values):
+        rows = sorted(labels for name, labels, _ in values if name == self.name)
+        return [_sample(self.name, labels, values[(self.name, labels, '')]) for labels in rows]
+
+
+class Histogram(_Metric):
+    """
+    Гистограмма (время запросов, вызовов Steam, построения графиков):
+    ряды <имя>_bucket с кумулятивными корзинами le, <имя>_sum и <имя>_count.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+        self.bounds = [_format_value(bound) for bound in self.buckets]  # Значения метки le
+
+    def observe(self, value, **labels):
+        if not self.registry.enabled:
+            return
+        labels = self.format_labels(labels)
+        bucket = f"{self.name}_bucket"
+        increments = [((bucket, labels, le), 1) for bound, le in zip(self.buckets, self.bounds) if value <= bound]
+        increments += [
+            ((bucket, labels, '+Inf'), 1),
+            ((f"{self.name}_sum", labels, ''), value),
+            ((f"{self.name}_count", labels, ''), 1),
+        ]
+        self.registry.add(increments)
+
+    @contextmanager
+    def time(self, **labels):
+        """Замеряет время блока with."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def timed(self, **labels):
+        """Декоратор: замеряет время каждого вызова функции."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def samples(self, values):
+        lines = []
+        bucket, total, count = f"{self.name}_bucket", f"{self.name}_sum", f"{self.name}_count"
+        for labels in sorted({labels for name, labels, _ in values if name == count}):
+            for bound in self.bounds + ['+Inf']:
+                lines.append(_sample(bucket, labels, values.get((bucket, labels, bound), 0), f'le="{bound}"'))
+            lines.append(_sample(total, labels, values.get((total, labels, ''), 0)))
+            lines.append(_sample(count, labels, values[(count, labels, '')]))
+        return lines
+
+
+# ----------------------------------------------------------------------
+# Метрики проекта
+# ----------------------------------------------------------------------
+
+REQUEST_SECONDS = Histogram(
+    'cs2_http_request_duration_seconds', 'Время обработки запроса по представлениям',
+    ('view', 'method'),
+)
+REQUESTS = Counter(
+    'cs2_http_requests_total', 'Запросы по представлениям и статусам ответа',
+    ('view', 'method', 'status'),
+)
+STEAM_REQUESTS = Counter(
+    'cs2_steam_requests_total', 'HTTP запросы к Steam API (включая повторы) по методам и статусам',
+    ('endpoint', 'status'),
+)
+STEAM_SECONDS = Histogram(
+    'cs2_steam_request_duration_seconds', 'Время одного HTTP запроса к Steam API',
+    ('endpoint',),
+)
+STEAM_ERRORS = Counter(
+    'cs2_steam_errors_total', 'Запросы к Steam API, не удавшиеся после всех повторов',
+    ('endpoint', 'reason'),
+)
+STEAM_RATE_LIMIT_WAIT = Counter(
+    'cs2_steam_rate_limit_wait_seconds_total', 'Ожидание лимитера частоты запросов к Steam',
+)
+CACHE_REQUESTS = Counter(
+    'cs2_cache_requests_total', 'Обращения к кэшам графиков и ответов Steam',
+    ('cache', 'result'),
+)
+CHART_SECONDS = Histogram(
+    'cs2_chart_build_seconds', 'Время построения графиков профиля по этапам',
+    ('stage',), buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
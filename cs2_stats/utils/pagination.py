@@ -0,0 +1,86 @@
+import base64
+import json
+from collections import namedtuple
+
+from django.db.models import Q
+
+# Страница keyset-пагинации:
+# items - строки страницы, next_cursor - курсор следующей страницы (None на последней),
+# start - номер первой строки страницы (с 1)
+KeysetPage = namedtuple('KeysetPage', ['items', 'next_cursor', 'start'])
+
+
+def encode_cursor(values, position):
+    """Кодирует ключ последней строки и ее номер в строку для URL."""
+    payload = json.dumps({'k': values, 'n': position}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Декодирует курсор из URL.
+
+    Returns:
+        tuple: (значения ключа, номер строки)
+
+    Raises:
+        ValueError: Курсор поврежден
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return list(payload['k']), int(payload['n'])
+    except (TypeError, KeyError, ValueError) as e:  # ValueError включает ошибки base64 и JSON
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def _after(ordering, values):
+    """
+    Условие "строка идет после ключа values" для сортировки ordering.
+    Для ('-kd', 'player_id') это: kd < v1 OR (kd = v1 AND player_id > v2).
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def keyset_paginate(queryset, ordering, cursor=None, per_page=50):
+    """
+    Keyset-пагинация: следующая страница выбирается условием по ключу
+    последней строки, а не OFFSET. Стоимость не растет с номером страницы,
+    если для ordering есть индекс.
+
+    Args:
+        queryset (QuerySet): Строки без сортировки (модели или словари values(),
+                             в которые входят поля ordering)
+        ordering (tuple): Поля сортировки, последнее должно быть уникальным (например, id)
+        cursor (str): Курсор из предыдущей страницы (None - первая страница)
+        per_page (int): Строк на странице
+
+    Returns:
+        KeysetPage: Строки страницы и курсор следующей
+
+    Raises:
+        ValueError: Курсор поврежден
+    """
+    position = 0
+    if cursor:
+        values, position = decode_cursor(cursor)
+        if len(values) != len(ordering):
+            raise ValueError(f"Invalid cursor: {cursor!r}")
+        queryset = queryset.filter(_after(ordering, values))
+
+    # Одна лишняя строка показывает, есть ли следующая страница
+    items = list(queryset.order_by(*ordering)[:per_page + 1])
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        key = last.__getitem__ if isinstance(last, dict) else lambda name: getattr(last, name)
+        next_cursor = encode_cursor([key(field.lstrip('-')) for field in ordering], position + per_page)
+    return KeysetPage(items, next_cursor, position + 1)
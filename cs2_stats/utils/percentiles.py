@@ -0,0 +1,169 @@
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max
+
+from ..models import MonthlyStat, PercentileSketch
+
+# Загруженные распределения: (год, месяц) -> (версия, {показатель: массив}),
+# версия - время последней перестройки распределений (PercentileSketch.built_at)
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def encode_values(values):
+    """
+    Упаковывает отсортированный массив в байты для PercentileSketch.values.
+    Если значений больше PERCENTILE_MAX_POINTS, сохраняются равномерно
+    расположенные квантили (точность процентиля ~ 100 / PERCENTILE_MAX_POINTS).
+    """
+    max_points = settings.PERCENTILE_MAX_POINTS
+    if len(values) > max_points:
+        values = np.quantile(values, np.linspace(0, 1, max_points))
+    return np.ascontiguousarray(values, dtype='<f8').tobytes()
+
+
+def decode_values(data):
+    """Распаковывает массив значений из PercentileSketch.values."""
+    return np.frombuffer(bytes(data), dtype='<f8')
+
+
+def percentile_of(sorted_values, value):
+    """
+    Доля значений распределения, которые строго меньше value (в процентах).
+    Бинарный поиск - O(log n).
+    """
+    if not len(sorted_values):
+        return None
+    return int(np.searchsorted(sorted_values, value, side='left') * 100 // len(sorted_values))
+
+
+def build_percentiles(force=False):
+    """
+    Строит распределения показателей по всем игрокам за каждый месяц.
+    Месяц пересобирается, если его еще нет, изменилось число записей
+    (записи удалены) или какая-то запись месяца изменена после
+    последней перестройки (MonthlyStat.updated_at > built_at).
+
+    Args:
+        force (bool): Пересобрать все месяцы
+
+    Returns:
+        dict: months_built, months_skipped, months_deleted
+    """
+    # В распределение входят только месяцы с сыгранными матчами
+    stats = MonthlyStat.objects.filter(matches_played__gt=0).order_by()
+    months = {
+        (row['year'], row['month']): (row['population'], row['changed_at'])
+        for row in stats.values('year', 'month').annotate(population=Count('id'), changed_at=Max('updated_at'))
+    }
+    built = {
+        (row['year'], row['month']): (row['population'], row['built_at'])
+        for row in PercentileSketch.objects.filter(metric='kd').values('year', 'month', 'population', 'built_at')
+    }
+
+    stale = {
+        key for key, (population, changed_at) in months.items()
+        if force or key not in built
+        or population != built[key][0] or changed_at > built[key][1]
+    }
+    removed = set(built) - set(months)
+    if removed:
+        for year, month in removed:
+            PercentileSketch.objects.filter(year=year, month=month).delete()
+
+    sketches = []
+    if stale:
+        rows = np.array(
+            list(stats.filter(year__in={year for year, _ in stale})
+                 .with_metrics().values_list('year', 'month', 'kd', 'win_pct', 'kpm')),
+            dtype=np.float64,
+        ).reshape(-1, 5)
+        # Группируем строки по (год, месяц) одной сортировкой
+        rows = rows[np.lexsort((rows[:, 1], rows[:, 0]))]
+        keys = rows[:, 0].astype(np.int64) * 100 + rows[:, 1].astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        for group in np.split(rows, starts[1:]):
+            key = (int(group[0, 0]), int(group[0, 1]))
+            if key not in stale:
+                continue
+            for column, metric in enumerate(PercentileSketch.METRICS, start=2):
+                sketches.append(PercentileSketch(
+                    year=key[0], month=key[1], metric=metric,
+                    population=len(group), values=encode_values(np.sort(group[:, column])),
+                ))
+        PercentileSketch.objects.bulk_create(
+            sketches, batch_size=100, update_conflicts=True,
+            unique_fields=['year', 'month', 'metric'], update_fields=['population', 'values', 'built_at'],
+        )
+
+    return {
+        'months_built': len(stale),
+        'months_skipped': len(months) - len(stale),
+        'months_deleted': len(removed),
+    }
+
+
+def latest_built_at():
+    """Время последней перестройки распределений (None, если их нет) - версия процентилей."""
+    return PercentileSketch.objects.aggregate(latest=Max('built_at'))['latest']
+
+
+def get_distributions(year, month, version=None):
+    """
+    Распределения показателей за месяц.
+    Загружаются из базы одним запросом и держатся в памяти процесса,
+    пока не изменится версия - время последней перестройки распределений.
+    Страница профиля передает версию из запроса своего ETag, поэтому
+    ETag и процентили на странице всегда соответствуют одним распределениям.
+
+    Args:
+        year (int): Год
+        month (int): Месяц
+        version (datetime): Известное вызывающему latest_built_at() (None - запросить)
+
+    Returns:
+        dict: {показатель: отсортированный массив} (пустой, если месяц еще не посчитан)
+    """
+    if version is None:
+        version = latest_built_at()
+    key = (year, month)
+    with _loaded_lock:
+        cached = _loaded.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    distributions = {
+        metric: decode_values(values)
+        for metric, values in PercentileSketch.objects.filter(year=year, month=month)
+        .values_list('metric', 'values')
+    }
+    with _loaded_lock:
+        _loaded[key] = (version, distributions)
+    return distributions
+
+
+def player_percentiles(year, month, matches, kills, deaths, wins, version=None):
+    """
+    Процентили месячной статистики игрока среди всех игроков за этот месяц.
+    Показатели считаются так же, как MonthlyStatQuerySet.with_metrics().
+    version - версия распределений (см. get_distributions).
+
+    Returns:
+        dict: {показатель: процент игроков, у которых значение меньше}
+              или None, если распределение за месяц еще не построено
+    """
+    distributions = get_distributions(year, month, version)
+    if not distributions or matches <= 0:
+        return None
+
+    values = {
+        'kd': kills * 1.0 / deaths if deaths > 0 else 0.0,
+        'win_pct': wins * 1.0 * 100 / matches,
+        'kpm': kills * 1.0 / matches,
+    }
+    return {
+        metric: percentile_of(distributions[metric], value)
+        for metric, value in values.items() if metric in distributions
+    }
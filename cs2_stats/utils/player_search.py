@@ -0,0 +1,186 @@
+from django.db import connection
+from django.db.models.functions import Lower
+
+from ..models import Player
+
+# Полнотекстовый индекс ников и Steam ID (SQLite FTS5 с токенизатором trigram).
+# Создается миграцией 0009_player_search, поддерживается сигналами Player.
+SEARCH_TABLE = 'cs2_stats_player_search'
+
+# Поля игрока в результатах поиска
+RESULT_FIELDS = ('id', 'steam_id', 'nickname', 'avatar', 'country')
+
+# Trigram-индекс ищет подстроки от 3 символов; короче - только поиск по префиксу
+MIN_SUBSTRING_LENGTH = 3
+
+# Поиск по подстроке: сколько совпадений (в порядке rowid) сортируется по длине ника.
+# Частая триграмма встречается у десятков тысяч игроков - без ограничения
+# сортировка всех совпадений стоит дороже самого поиска по индексу
+SUBSTRING_CANDIDATES = 1000
+
+# Нечеткий поиск: сколько кандидатов оценивается и минимальное сходство триграмм
+FUZZY_CANDIDATES = 200
+FUZZY_THRESHOLD = 0.3
+
+
+def is_available():
+    """Полнотекстовый индекс есть только в SQLite (FTS5)."""
+    return connection.vendor == 'sqlite'
+
+
+def index_players(rows):
+    """
+    Добавляет или обновляет игроков в поисковом индексе.
+
+    Args:
+        rows (iterable): Кортежи (id, nickname, steam_id)
+    """
+    rows = list(rows)
+    if not rows or not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, nickname, steam_id) VALUES (%s, %s, %s)", rows
+        )
+
+
+def remove_players(player_ids):
+    """Удаляет игроков из поискового индекса."""
+    player_ids = list(player_ids)
+    if not player_ids or not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [(pk,) for pk in player_ids])
+
+
+def rebuild_search_index():
+    """
+    Заново заполняет поисковый индекс из таблицы игроков
+    (после массовых изменений в обход сигналов).
+
+    Returns:
+        int: Игроков в индексе
+    """
+    if not is_available():
+        return 0
+    player_table = Player._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, nickname, steam_id) "
+            f"SELECT id, nickname, steam_id FROM {player_table}"
+        )
+        # Слияние сегментов индекса - быстрее последующие запросы
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+    return Player.objects.count()
+
+
+def trigrams(text):
+    """Множество триграмм строки без учета регистра."""
+    text = text.lower()
+    return {text[index:index + 3] for index in range(len(text) - 2)}
+
+
+def similarity(first, second):
+    """Сходство строк по триграммам (коэффициент Жаккара, 0..1)."""
+    first, second = trigrams(first), trigrams(second)
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def _fts_phrase(text):
+    """Строка как фраза запроса FTS5 (кавычки внутри удваиваются)."""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _fts_rows(match, limit, shortest_first=False):
+    """
+    Игроки, найденные в индексе запросом MATCH.
+
+    Args:
+        match (str): Запрос FTS5
+        limit (int): Максимум строк
+        shortest_first (bool): Сортировать в SQL до LIMIT по длине ника, затем по нику.
+                               Сортируются только первые SUBSTRING_CANDIDATES совпадений;
+                               иначе порядок rowid, без ранжирования
+    """
+    columns = ', '.join(f'p.{field}' for field in RESULT_FIELDS)
+    if shortest_first:
+        source = f"(SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s LIMIT %s)"
+        params = [match, max(limit, SUBSTRING_CANDIDATES), limit]
+        where = ""
+        order = "ORDER BY length(p.nickname), lower(p.nickname), p.id "
+    else:
+        source = SEARCH_TABLE
+        params = [match, limit]
+        where = f"WHERE {SEARCH_TABLE} MATCH %s "
+        order = ""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {columns} FROM {source} s "
+            f"JOIN {Player._meta.db_table} p ON p.id = s.rowid "
+            f"{where}{order}LIMIT %s",
+            params,
+        )
+        return [dict(zip(RESULT_FIELDS, row)) for row in cursor.fetchall()]
+
+
+def search_players(query, limit=20):
+    """
+    Поиск игроков по нику или Steam ID для подсказок при вводе.
+    Результаты идут группами, каждая группа - один запрос с LIMIT
+    по индексу, поэтому время не зависит от числа игроков:
+    1. Ник (или Steam ID, если запрос из цифр) начинается с запроса -
+       по индексу LOWER(nickname) / steam_id, в алфавитном порядке.
+    2. Запрос встречается внутри ника или Steam ID - по trigram-индексу FTS5,
+       сначала более короткие ники (среди первых SUBSTRING_CANDIDATES совпадений).
+    3. Нечеткие совпадения (опечатки), если точных не хватило: кандидаты,
+       содержащие первую или вторую половину запроса, сортируются
+       по сходству триграмм.
+
+    Args:
+        query (str): Строка поиска
+        limit (int): Максимум результатов
+
+    Returns:
+        list: dict с полями RESULT_FIELDS
+    """
+    query = query.strip()
+    if not query:
+        return []
+
+    # 1. Префикс. SQLite LOWER() приводит к нижнему регистру только латиницу -
+    # ники на кириллице с заглавной буквы найдет поиск по подстроке
+    if query.isdigit():
+        prefix = Player.objects.filter(steam_id__gte=query, steam_id__lt=query + '\uffff').order_by('steam_id')
+    else:
+        lowered = query.lower()
+        prefix = (Player.objects.annotate(nickname_lower=Lower('nickname'))
+                  .filter(nickname_lower__gte=lowered, nickname_lower__lt=lowered + '\uffff')
+                  .order_by('nickname_lower', 'id'))
+    results = list(prefix.values(*RESULT_FIELDS)[:limit])
+    if len(results) >= limit or len(query) < MIN_SUBSTRING_LENGTH or not is_available():
+        return results
+    found = {row['id'] for row in results}
+
+    # 2. Подстрока
+    rows = [row for row in _fts_rows(_fts_phrase(query), limit + len(found), shortest_first=True)
+            if row['id'] not in found]
+    results += rows[:limit - len(results)]
+    if len(results) >= limit or query.isdigit() or len(query) <= MIN_SUBSTRING_LENGTH:
+        return results
+    found.update(row['id'] for row in rows)
+
+    # 3. Нечеткий поиск: при одной опечатке одна из половин запроса совпадает точно
+    middle = len(query) // 2
+    halves = {query[:max(middle, MIN_SUBSTRING_LENGTH)], query[min(middle, len(query) - MIN_SUBSTRING_LENGTH):]}
+    candidates = []
+    for row in _fts_rows(' OR '.join(_fts_phrase(half) for half in sorted(halves)), FUZZY_CANDIDATES):
+        score = similarity(query, row['nickname'])
+        if row['id'] not in found and score >= FUZZY_THRESHOLD:
+            candidates.append((score, row))
+    candidates.sort(key=lambda candidate: -candidate[0])
+    results += [row for _, row in candidates[:limit - len(results)]]
+    return results
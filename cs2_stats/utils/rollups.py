@@ -0,0 +1,197 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from ..models import MonthlyStat, Player, YearStat
+from .leaderboard import apply_entry_deltas, rebuild_leaderboard
+
+# Счетчики, которые суммируются в годовые итоги и итоги игрока
+COUNTERS = ('matches_played', 'kills', 'deaths', 'wins')
+
+# Соответствие счетчиков MonthlyStat полям итогов Player
+PLAYER_TOTAL_FIELDS = {
+    'matches_played': 'total_matches',
+    'kills': 'total_kills',
+    'deaths': 'total_deaths',
+    'wins': 'total_wins',
+}
+
+
+def _empty_delta():
+    return dict.fromkeys(('months',) + COUNTERS, 0)
+
+
+def record_change(previous, stat):
+    """
+    Применяет к итогам изменение одной записи MonthlyStat.
+    Вызывается из MonthlyStat.save() внутри его транзакции.
+
+    Args:
+        previous (dict): Значения записи до сохранения (None для новой записи)
+        stat (MonthlyStat): Сохраненная запись
+    """
+    deltas = defaultdict(_empty_delta)
+
+    if previous is not None:
+        delta = deltas[(previous['player_id'], previous['year'])]
+        delta['months'] -= 1
+        for field in COUNTERS:
+            delta[field] -= previous[field]
+
+    delta = deltas[(stat.player_id, stat.year)]
+    delta['months'] += 1
+    for field in COUNTERS:
+        delta[field] += getattr(stat, field)
+
+    apply_deltas(deltas)
+
+
+def record_delete(stat):
+    """Вычитает удаленную запись MonthlyStat из итогов."""
+    delta = {'months': -1}
+    delta.update({field: -getattr(stat, field) for field in COUNTERS})
+    apply_delta(stat.player_id, stat.year, delta)
+
+
+def apply_delta(player_id, year, delta):
+    """
+    Прибавляет разницу к YearStat и итогам игрока (см. apply_deltas).
+
+    Args:
+        player_id (int): ID игрока
+        year (int): Год
+        delta (dict): Изменения months и счетчиков COUNTERS
+    """
+    apply_deltas({(player_id, year): delta})
+
+
+def apply_deltas(deltas):
+    """
+    Прибавляет разницы к YearStat, итогам игроков и строкам рейтинга
+    через F() выражения, чтобы параллельные изменения не затирали друг друга.
+    Один UPDATE на каждый затронутый год, игрока и строку рейтинга -
+    без чтения текущих значений.
+
+    Args:
+        deltas (dict): {(player_id, year): изменения months и счетчиков COUNTERS}
+    """
+    deltas = {key: delta for key, delta in deltas.items() if any(delta.values())}
+    if not deltas:
+        return
+
+    player_deltas = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    with transaction.atomic():
+        for (player_id, year), delta in deltas.items():
+            _apply_year_delta(player_id, year, delta)
+            for field in COUNTERS:
+                player_deltas[player_id][field] += delta[field]
+
+        for player_id, delta in player_deltas.items():
+            player_updates = {
+                PLAYER_TOTAL_FIELDS[field]: F(PLAYER_TOTAL_FIELDS[field]) + delta[field]
+                for field in COUNTERS if delta[field]
+            }
+            if player_updates:
+                # update() обходит auto_now - время изменения для выгрузки ставим сами
+                Player.objects.filter(pk=player_id).update(**player_updates, updated_at=timezone.now())
+
+        apply_entry_deltas(deltas, player_deltas)
+
+
+def _apply_year_delta(player_id, year, delta):
+    """Прибавляет разницу к строке YearStat (создает или удаляет ее при необходимости)."""
+    year_stats = YearStat.objects.filter(player_id=player_id, year=year)
+    updates = {field: F(field) + value for field, value in delta.items() if value}
+    updated = year_stats.update(**updates)
+
+    if not updated and delta['months'] > 0:
+        try:
+            with transaction.atomic():
+                YearStat.objects.create(player_id=player_id, year=year, **delta)
+        except IntegrityError:
+            # Запись года успела создать параллельная транзакция
+            year_stats.update(**updates)
+    elif updated and delta['months'] < 0:
+        # Удалили последний месяц года - строка года больше не нужна
+        year_stats.filter(months__lte=0).delete()
+
+
+def rebuild_rollups(player_ids=None, dry_run=False):
+    """
+    Пересчитывает YearStat, итоги игроков и таблицу рейтинга из MonthlyStat.
+    Используется командой rebuild_rollups и после массовых операций,
+    которые обходят MonthlyStat.save() (bulk_create, update).
+
+    Args:
+        player_ids (iterable): Пересчитать только этих игроков (None - всех)
+        dry_run (bool): Только найти расхождения, ничего не записывать
+
+    Returns:
+        dict: Количество расхождений: years_created, years_updated,
+              years_deleted, players_updated
+    """
+    stats = MonthlyStat.objects.order_by()
+    year_rows = YearStat.objects.all()
+    players = Player.objects.only('id', 'updated_at', *PLAYER_TOTAL_FIELDS.values())
+    if player_ids is not None:
+        player_ids = list(player_ids)
+        stats = stats.filter(player_id__in=player_ids)
+        year_rows = year_rows.filter(player_id__in=player_ids)
+        players = players.filter(pk__in=player_ids)
+
+    # Ожидаемые годовые итоги - один GROUP BY запрос
+    expected_years = {}
+    expected_players = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    grouped = stats.values('player_id', 'year').annotate(
+        months=Count('id'), **{f"sum_{field}": Sum(field) for field in COUNTERS}
+    )
+    for row in grouped.iterator():
+        values = {'months': row['months']}
+        values.update({field: row[f"sum_{field}"] for field in COUNTERS})
+        expected_years[(row['player_id'], row['year'])] = values
+        for field in COUNTERS:
+            expected_players[row['player_id']][field] += values[field]
+
+    to_create, to_update, to_delete = [], [], []
+    for year_stat in year_rows.iterator():
+        expected = expected_years.pop((year_stat.player_id, year_stat.year), None)
+        if expected is None:
+            to_delete.append(year_stat.pk)
+        elif any(getattr(year_stat, field) != value for field, value in expected.items()):
+            for field, value in expected.items():
+                setattr(year_stat, field, value)
+            to_update.append(year_stat)
+    for (player_id, year), values in expected_years.items():
+        to_create.append(YearStat(player_id=player_id, year=year, **values))
+
+    players_to_update = []
+    now = timezone.now()
+    for player in players.iterator():
+        expected = expected_players.get(player.pk, dict.fromkeys(COUNTERS, 0))
+        changed = False
+        for field, total_field in PLAYER_TOTAL_FIELDS.items():
+            if getattr(player, total_field) != expected[field]:
+                setattr(player, total_field, expected[field])
+                changed = True
+        if changed:
+            player.updated_at = now
+            players_to_update.append(player)
+
+    if not dry_run:
+        with transaction.atomic():
+            YearStat.objects.filter(pk__in=to_delete).delete()
+            YearStat.objects.bulk_update(to_update, ('months',) + COUNTERS, batch_size=500)
+            YearStat.objects.bulk_create(to_create, batch_size=500)
+            Player.objects.bulk_update(players_to_update, [*PLAYER_TOTAL_FIELDS.values(), 'updated_at'],
+                                       batch_size=500)
+            # Рейтинг строится из итогов - перестраиваем его вместе с ними
+            rebuild_leaderboard(player_ids)
+
+    return {
+        'years_created': len(to_create),
+        'years_updated': len(to_update),
+        'years_deleted': len(to_delete),
+        'players_updated': len(players_to_update),
+    }
@@ -0,0 +1,101 @@
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+
+# Интервал опроса кэша, пока запрос выполняет другой процесс (секунды)
+POLL_INTERVAL = 0.1
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class _Call:
+    """Выполняющийся в текущем процессе вызов и его результат."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def single_flight(key, fn, lock_timeout=30):
+    """
+    Объединяет одновременные вызовы с одинаковым ключом (single-flight).
+    Функция выполняется один раз, остальные вызовы ждут и получают
+    тот же результат:
+    - потоки одного процесса ждут через threading.Event
+    - другие процессы ждут через блокировку в общем кэше (cache.add),
+      результат лидера передается им через кэш
+
+    Args:
+        key (str): Ключ объединения (например, Steam ID)
+        fn (callable): Функция без аргументов, результат должен сериализоваться pickle
+        lock_timeout (float): Максимальное время выполнения fn и ожидания (секунды).
+                              Должно быть больше худшего времени fn, иначе блокировка
+                              истечет и fn выполнит второй вызов
+
+    Returns:
+        tuple: (результат, shared) - shared=True если результат получен
+               от вызова, выполненного другим запросом
+    """
+    with _inflight_lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+
+    if not leader:
+        if not call.done.wait(lock_timeout):
+            # Лидер завис - не ждем бесконечно, выполняем сами
+            return fn(), False
+        if call.error is not None:
+            raise call.error
+        return call.result, True
+
+    try:
+        call.result, shared = _run_across_processes(key, fn, lock_timeout)
+        return call.result, shared
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        call.done.set()
+
+
+def _run_across_processes(key, fn, lock_timeout):
+    """
+    Выполняет fn под блокировкой в общем кэше.
+    Если блокировку держит другой процесс - ждет его результат.
+    """
+    lock_key = f"singleflight:{key}:lock"
+    result_key = f"singleflight:{key}:result"
+    deadline = time.monotonic() + lock_timeout
+
+    while True:
+        token = uuid.uuid4().hex
+        if cache.add(lock_key, token, timeout=lock_timeout):
+            try:
+                result = fn()
+                # Результат помечен токеном, чтобы ожидающие не взяли ответ прошлого вызова
+                cache.set(result_key, (token, result), timeout=lock_timeout)
+                return result, False
+            finally:
+                if cache.get(lock_key) == token:
+                    cache.delete(lock_key)
+
+        owner = cache.get(lock_key)
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            stored = cache.get(result_key)
+            if owner is not None and stored is not None and stored[0] == owner:
+                return stored[1], True
+            if cache.get(lock_key) != owner:
+                # Лидер завершился без результата (ошибка) - пробуем стать лидером сами
+                break
+        else:
+            # Не дождались другого процесса - выполняем сами
+            return fn(), False
@@ -0,0 +1,130 @@
+from collections import namedtuple
+
+import numpy as np
+from django.db.models import QuerySet
+
+from ..models import build_totals
+
+# Колонки, которые загружаются из MonthlyStat одним values_list запросом
+COLUMNS = ('id', 'year', 'month', 'matches_played', 'kills', 'deaths', 'wins')
+
+# Легкая строка месячной статистики для шаблонов (вместо модели MonthlyStat)
+StatRow = namedtuple('StatRow', COLUMNS + ('kd_ratio', 'win_rate'))
+
+
+def round_like_python(values, ndigits):
+    """
+    Векторное округление, совпадающее со встроенным round().
+    np.round умножает на 10^n и может ошибаться рядом с половиной,
+    такие редкие значения пересчитываются обычным round().
+
+    Args:
+        values (np.ndarray): Массив float
+        ndigits (int): Число знаков после запятой
+
+    Returns:
+        np.ndarray: Округленные значения
+    """
+    rounded = np.round(values, ndigits)
+    scaled = values * 10 ** ndigits
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_half.any():
+        index = np.flatnonzero(near_half)
+        rounded[index] = [round(value, ndigits) for value in values[index].tolist()]
+    return rounded
+
+
+class StatSeries:
+    """
+    Колоночное представление месячной статистики игрока.
+    Загружается одним запросом values_list и хранит данные в массивах NumPy.
+    Производные показатели (K/D, win rate, убийства за матч) считаются
+    векторно один раз и используются графиками, итогами и таблицами.
+    """
+
+    def __init__(self, rows):
+        """
+        Args:
+            rows (list): Кортежи значений в порядке COLUMNS,
+                         отсортированные по году и месяцу
+        """
+        data = np.array(rows, dtype=np.int64).reshape(-1, len(COLUMNS))
+        (self.ids, self.years, self.months, self.matches,
+         self.kills, self.deaths, self.wins) = data.T
+
+        # Подписи месяцев в формате "2025-01"
+        self.labels = [f"{year}-{month:02d}" for year, month in zip(self.years.tolist(), self.months.tolist())]
+
+        # K/D = убийства / смерти (0 если смертей нет)
+        has_deaths = self.deaths > 0
+        self.kd = np.zeros(len(data))
+        self.kd[has_deaths] = round_like_python(self.kills[has_deaths] / self.deaths[has_deaths], 2)
+
+        # Win rate = победы / матчи * 100% и убийства за матч (0 если матчей нет)
+        self.has_matches = self.matches > 0
+        self.win_rate = np.zeros(len(data))
+        self.win_rate[self.has_matches] = round_like_python(
+            (self.wins[self.has_matches] / self.matches[self.has_matches]) * 100, 1
+        )
+        self.kills_per_match = np.zeros(len(data))
+        self.kills_per_match[self.has_matches] = round_like_python(
+            self.kills[self.has_matches] / self.matches[self.has_matches], 1
+        )
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        """Строит серию из QuerySet MonthlyStat одним запросом values_list."""
+        return cls(list(queryset.order_by('year', 'month').values_list(*COLUMNS)))
+
+    @classmethod
+    def from_stats(cls, monthly_stats):
+        """
+        Строит серию из уже загруженных объектов MonthlyStat (в их порядке).
+        У несохраненных объектов id заменяется на 0.
+        """
+        return cls([tuple(getattr(stat, column) or 0 for column in COLUMNS) for stat in monthly_stats])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def rows(self):
+        """
+        Строки для таблиц в шаблоне.
+
+        Returns:
+            list: Список StatRow с полями модели и рассчитанными kd_ratio, win_rate
+        """
+        return [
+            StatRow(*values)
+            for values in zip(self.ids.tolist(), self.years.tolist(), self.months.tolist(),
+                              self.matches.tolist(), self.kills.tolist(), self.deaths.tolist(),
+                              self.wins.tolist(), self.kd.tolist(), self.win_rate.tolist())
+        ]
+
+    def totals(self):
+        """
+        Суммарная статистика по всем месяцам.
+
+        Returns:
+            dict: matches, kills, deaths, wins, kd, win_rate
+                  (тот же формат, что у calculate_total_stats)
+        """
+        return build_totals(
+            int(self.matches.sum()), int(self.kills.sum()),
+            int(self.deaths.sum()), int(self.wins.sum()),
+        )
+
+
+def as_series(monthly_stats):
+    """
+    Приводит статистику к StatSeries.
+    Принимает StatSeries, QuerySet MonthlyStat или список объектов MonthlyStat.
+    """
+    if isinstance(monthly_stats, StatSeries):
+        return monthly_stats
+    if isinstance(monthly_stats, QuerySet):
+        return StatSeries.from_queryset(monthly_stats)
+    return StatSeries.from_stats(monthly_stats)
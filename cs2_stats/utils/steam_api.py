@@ -1,6 +1,24 @@
-import os
-import requests
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from . import metrics
+from .steam_client import get_client
+from .timing import bind_context
+
+logger = logging.getLogger(__name__)
+
+# Steam принимает не больше 100 steamids в одном запросе GetPlayerSummaries
+MAX_STEAMIDS_PER_REQUEST = 100
+
+# Префикс ключей кэша ответов Steam
+CACHE_PREFIX = 'steam'
 
 
 class SteamAPI:
@@ -8,57 +26,150 @@ class SteamAPI:
     Класс для взаимодействия с Steam Web API.
     Предоставляет методы для получения данных игроков и времени игры.
     Требуется Steam API ключ в настройках Django.
+
+    Ответы кэшируются через Django cache framework:
+    - свежие записи отдаются без запроса к Steam
+    - устаревшие записи отдаются сразу, а обновление идет в фоне
+      (stale-while-revalidate)
+    - неизвестные и приватные профили кэшируются на короткое время
+      (negative cache)
     """
 
     def __init__(self):
         """Инициализация с ключом API из настроек Django."""
         self.api_key = settings.STEAM_API_KEY  # Ключ из .env файла
-        self.base_url = "https://api.steampowered.com"  # Базовый URL Steam API
+        self.client = get_client()  # Общий для процесса HTTP клиент с пулом соединений
 
-    def get_player_summary(self, steam_id):
+    @property
+    def base_url(self):
+        """Базовый URL Steam API (STEAM_API_BASE_URL - например, локальный fake_steam_server)."""
+        return settings.STEAM_API_BASE_URL.rstrip('/')
+
+    def get_player_summary(self, steam_id, use_cache=True):
         """
         Получает основную информацию об игроке из Steam.
 
         Args:
             steam_id (str): Уникальный Steam ID игрока
+            use_cache (bool): Разрешить ответ из кэша
 
         Returns:
             dict: Данные игрока или None при ошибке
             Содержит: nickname, avatar, country, profileurl и др.
         """
+        summaries = self.get_player_summaries([steam_id], use_cache=use_cache)
+        return summaries.get(str(steam_id))
+
+    def get_player_summaries(self, steam_ids, use_cache=True):
+        """
+        Получает информацию сразу о нескольких игроках.
+        Steam ID разбиваются на пачки по 100 штук - по одному
+        HTTP запросу GetPlayerSummaries на пачку.
+
+        Args:
+            steam_ids (iterable): Steam ID игроков
+            use_cache (bool): Разрешить ответы из кэша. При False все
+                              игроки запрашиваются у Steam, кэш обновляется
+
+        Returns:
+            dict: Словарь {steam_id: данные игрока}
+                  Игроки, которых Steam не вернул, в словарь не попадают
+        """
+        # Убираем дубликаты, сохраняя порядок
+        ids = list(dict.fromkeys(str(steam_id) for steam_id in steam_ids))
+        summaries = {}
+
+        missing = ids
+        if use_cache:
+            cached, stale, missing = self._cache_lookup('summary', ids)
+            summaries.update({steam_id: data for steam_id, data in cached.items() if data})
+            if stale:
+                self._revalidate_in_background('summary', stale, self._fetch_summaries)
+
+        if missing:
+            summaries.update(self._fetch_summaries(missing))
+
+        return summaries
+
+    def _fetch_summaries(self, steam_ids):
+        """
+        Запрашивает профили у Steam пачками и сохраняет их в кэш.
+        Игроки, которых Steam не вернул, попадают в negative cache.
+        Пачки, запрос которых завершился ошибкой, не кэшируются.
+
+        Returns:
+            dict: Словарь {steam_id: данные игрока}
+        """
+        summaries = {}
+
+        for start in range(0, len(steam_ids), MAX_STEAMIDS_PER_REQUEST):
+            chunk = steam_ids[start:start + MAX_STEAMIDS_PER_REQUEST]
+            try:
+                found = self._fetch_summaries_chunk(chunk)
+            except Exception as e:
+                # Логируем ошибку, но не прерываем выполнение
+                logger.warning("Steam API error: %s", e)
+                continue
+
+            summaries.update(found)
+            self._cache_store('summary', {steam_id: found.get(steam_id) for steam_id in chunk})
+
+        return summaries
+
+    def _fetch_summaries_chunk(self, steam_ids):
+        """
+        Один запрос GetPlayerSummaries для пачки (до 100) Steam ID.
+
+        Returns:
+            dict: Словарь {steam_id: данные игрока}
+
+        Raises:
+            requests.RequestException: При ошибке запроса к Steam
+        """
         url = f"{self.base_url}/ISteamUser/GetPlayerSummaries/v2/"
         params = {
             'key': self.api_key,  # API ключ для аутентификации
-            'steamids': steam_id  # Steam ID для поиска
+            'steamids': ','.join(steam_ids)  # Steam ID через запятую
         }
 
-        try:
-            # Отправляем GET запрос к Steam API
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()  # Проверяем статус ответа
-            data = response.json()  # Парсим JSON ответ
-
-            # Извлекаем данные первого игрока из массива players
-            if data.get('response', {}).get('players'):
-                player_data = data['response']['players'][0]
-                return player_data
-        except Exception as e:
-            # Логируем ошибку, но не прерываем выполнение
-            print(f"Steam API error: {e}")
+        # Отправляем GET запрос к Steam API (с повторами при 429/5xx)
+        data = self.client.get(url, params=params)
 
-        return None  # Возвращаем None при ошибке или отсутствии данных
+        # Steam возвращает игроков в произвольном порядке
+        players = data.get('response', {}).get('players', [])
+        return {player['steamid']: player for player in players if 'steamid' in player}
 
-    def get_cs2_playtime(self, steam_id):
+    def get_cs2_playtime(self, steam_id, use_cache=True):
         """
         Получает время игры в Counter-Strike 2 для указанного игрока.
 
         Args:
             steam_id (str): Steam ID игрока
+            use_cache (bool): Разрешить ответ из кэша
 
         Returns:
             float: Количество часов в CS2, округленное до 1 десятичного знака
                    Возвращает 0 если игра не найдена или при ошибке
         """
+        steam_id = str(steam_id)
+
+        if use_cache:
+            cached, stale, missing = self._cache_lookup('playtime', [steam_id])
+            if stale:
+                self._revalidate_in_background('playtime', stale, lambda ids: self._fetch_playtime(ids[0]))
+            if not missing:
+                return cached[steam_id] or 0
+
+        return self._fetch_playtime(steam_id) or 0
+
+    def _fetch_playtime(self, steam_id):
+        """
+        Запрашивает время игры в CS2 у Steam и сохраняет его в кэш.
+        Приватный профиль или отсутствие CS2 попадают в negative cache.
+
+        Returns:
+            float: Часы в CS2 или None если данных нет или при ошибке
+        """
         url = f"{self.base_url}/IPlayerService/GetOwnedGames/v1/"
         params = {
             'key': self.api_key,
@@ -69,17 +180,190 @@ class SteamAPI:
         }
 
         try:
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-
-            # Ищем CS2 в списке игр игрока
-            games = data.get('response', {}).get('games', [])
-            for game in games:
-                if game.get('appid') == 730:  # CS2 App ID
-                    # playtime_forever в минутах, конвертируем в часы
-                    return round(game.get('playtime_forever', 0) / 60, 1)
+            data = self.client.get(url, params=params)
         except Exception as e:
-            print(f"Steam API playtime error: {e}")
+            logger.warning("Steam API playtime error: %s", e)
+            return None
+
+        hours = None
+        # Ищем CS2 в списке игр игрока (у приватных профилей списка нет)
+        games = data.get('response', {}).get('games', [])
+        for game in games:
+            if game.get('appid') == 730:  # CS2 App ID
+                # playtime_forever в минутах, конвертируем в часы
+                hours = round(game.get('playtime_forever', 0) / 60, 1)
+                break
 
-        return 0  # Возвращаем 0 часов при ошибке или отсутствии игры
\ No newline at end of file
+        self._cache_store('playtime', {steam_id: hours})
+        return hours
+
+    def get_player_profile(self, steam_id, use_cache=True):
+        """
+        Получает профиль и время игры в CS2 одновременно.
+        Оба запроса к Steam выполняются параллельно в общем пуле потоков,
+        поэтому ожидание занимает примерно один запрос вместо двух.
+
+        Args:
+            steam_id (str): Steam ID игрока
+            use_cache (bool): Разрешить ответы из кэша
+
+        Returns:
+            dict: {'summary': данные игрока или None, 'playtime': часы в CS2}
+        """
+        # bind_context - чтобы вызовы Steam из пула попали в замеры запроса (Server-Timing)
+        executor = get_executor()
+        summary = executor.submit(bind_context(self.get_player_summary), steam_id, use_cache)
+        playtime = executor.submit(bind_context(self.get_cs2_playtime), steam_id, use_cache)
+        return {'summary': summary.result(), 'playtime': playtime.result()}
+
+    def get_player_profiles(self, steam_ids, use_cache=True):
+        """
+        Получает профили и время игры для многих игроков.
+        Профили запрашиваются пачками GetPlayerSummaries, а время игры -
+        отдельными запросами, которые выполняются параллельно.
+        Число одновременных запросов ограничено размером пула
+        (STEAM_API_MAX_WORKERS).
+
+        Args:
+            steam_ids (iterable): Steam ID игроков
+            use_cache (bool): Разрешить ответы из кэша
+
+        Returns:
+            dict: {steam_id: {'summary': ..., 'playtime': ...}}
+        """
+        ids = list(dict.fromkeys(str(steam_id) for steam_id in steam_ids))
+        executor = get_executor()
+
+        summaries = executor.submit(bind_context(self.get_player_summaries), ids, use_cache)
+        playtimes = [executor.submit(bind_context(self.get_cs2_playtime), steam_id, use_cache) for steam_id in ids]
+        playtimes = [playtime.result() for playtime in playtimes]
+        summaries = summaries.result()
+
+        return {
+            steam_id: {'summary': summaries.get(steam_id), 'playtime': playtime}
+            for steam_id, playtime in zip(ids, playtimes)
+        }
+
+    # ------------------------------------------------------------------
+    # Кэш ответов Steam
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _cache_key(endpoint, steam_id):
+        return f"{CACHE_PREFIX}:{endpoint}:{steam_id}"
+
+    def _cache_lookup(self, endpoint, steam_ids):
+        """
+        Ищет ответы в кэше одним запросом get_many.
+
+        Returns:
+            tuple: (cached, stale, missing)
+                   cached - {steam_id: значение} для найденных записей
+                            (свежих и устаревших, None - negative cache)
+                   stale - Steam ID с устаревшими записями
+                   missing - Steam ID без записей в кэше
+        """
+        keys = {self._cache_key(endpoint, steam_id): steam_id for steam_id in steam_ids}
+        entries = cache.get_many(list(keys))
+        now = time.time()
+
+        cached, stale, missing = {}, [], []
+        for key, steam_id in keys.items():
+            entry = entries.get(key)
+            if entry is None:
+                missing.append(steam_id)
+                continue
+            cached[steam_id] = entry['value']
+            if entry['expires'] <= now:
+                stale.append(steam_id)
+
+        name = f"steam_{endpoint}"
+        for result, count in (('hit', len(cached) - len(stale)), ('stale', len(stale)), ('miss', len(missing))):
+            if count:
+                metrics.CACHE_REQUESTS.inc(count, cache=name, result=result)
+        return cached, stale, missing
+
+    def _cache_store(self, endpoint, values):
+        """
+        Сохраняет ответы в кэш.
+        Запись считается свежей TTL секунд, после чего еще
+        STEAM_CACHE_STALE_TTL секунд может отдаваться как устаревшая.
+        Пустые ответы (None) хранятся с коротким negative TTL.
+        """
+        now = time.time()
+        positive, negative = {}, {}
+        for steam_id, value in values.items():
+            target = positive if value is not None else negative
+            target[self._cache_key(endpoint, steam_id)] = value
+
+        for entries, ttl in ((positive, settings.STEAM_CACHE_TTL[endpoint]),
+                             (negative, settings.STEAM_CACHE_NEGATIVE_TTL)):
+            if entries:
+                cache.set_many(
+                    {key: {'value': value, 'expires': now + ttl} for key, value in entries.items()},
+                    timeout=ttl + settings.STEAM_CACHE_STALE_TTL,
+                )
+
+    def _revalidate_in_background(self, endpoint, steam_ids, refresh):
+        """
+        Запускает фоновое обновление устаревших записей в общем пуле потоков.
+        Блокировка одна на пачку (cache.add по хэшу отсортированных Steam ID),
+        чтобы одну и ту же пачку не обновляли одновременно несколько запросов
+        и чтобы не делать запрос к кэшу на каждый Steam ID.
+
+        Args:
+            endpoint (str): 'summary' или 'playtime'
+            steam_ids (list): Steam ID с устаревшими записями
+            refresh (callable): Обновляет записи, получает список Steam ID
+        """
+        digest = hashlib.sha1(','.join(sorted(steam_ids)).encode()).hexdigest()
+        lock = self._cache_key(f"{endpoint}-refresh", digest)
+        if not cache.add(lock, True, timeout=settings.STEAM_API_READ_TIMEOUT * 2):
+            return
+
+        def run():
+            try:
+                refresh(steam_ids)
+            finally:
+                cache.delete(lock)
+                # Поток пула переиспользуется - закрываем его соединения с БД (кэш, ORM)
+                connections.close_all()
+
+        get_executor().submit(run)
+
+
+_steam_api = None
+_steam_api_lock = threading.Lock()
+
+
+def get_steam_api():
+    """
+    Возвращает общий экземпляр SteamAPI для процесса.
+    Избавляет от создания нового объекта на каждое обновление игрока.
+    """
+    global _steam_api
+    if _steam_api is None:
+        with _steam_api_lock:
+            if _steam_api is None:
+                _steam_api = SteamAPI()
+    return _steam_api
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Возвращает общий пул потоков для параллельных запросов к Steam.
+    Размер пула (STEAM_API_MAX_WORKERS) ограничивает число одновременных запросов.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.STEAM_API_MAX_WORKERS,
+                    thread_name_prefix='steam-api',
+                )
+    return _executor
@@ -0,0 +1,113 @@
+import json
+import threading
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from django.conf import settings
+from requests.structures import CaseInsensitiveDict
+
+# Заголовки ответа, которые сохраняются в кассете (Retry-After нужен для повторов)
+RECORDED_HEADERS = ('Content-Type', 'Retry-After')
+
+
+class CassetteMiss(requests.RequestException):
+    """В кассете нет ответа на запрос (режим replay не обращается к сети)."""
+
+
+class Cassette:
+    """
+    Запись и воспроизведение ответов Steam API (record/replay) для тестов без сети.
+    Ответ ищется по пути метода и параметрам запроса без ключа API,
+    поэтому кассету, записанную с локального FakeSteamServer, можно
+    воспроизводить с любым STEAM_API_BASE_URL. На один запрос хранится
+    последний ответ.
+    """
+
+    def __init__(self, path, mode='replay'):
+        """
+        Args:
+            path (str): JSON файл кассеты
+            mode (str): 'replay' - только из кассеты, 'record' - запросы в сеть с записью ответов
+        """
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.interactions = {}
+        if self.path.exists():
+            self.interactions = json.loads(self.path.read_text(encoding='utf-8'))['interactions']
+
+    @staticmethod
+    def request_key(url, params):
+        """Путь и отсортированные параметры без ключа API: /ISteamUser/GetPlayerSummaries/v2/?steamids=..."""
+        query = sorted((name, str(value)) for name, value in (params or {}).items() if name != 'key')
+        return f"{urlsplit(url).path}?{urlencode(query)}"
+
+    def get(self, session, url, params, timeout):
+        """
+        GET запрос через кассету.
+
+        Returns:
+            requests.Response: Записанный (replay) или настоящий (record) ответ
+
+        Raises:
+            CassetteMiss: replay, а ответа на запрос в кассете нет
+        """
+        key = self.request_key(url, params)
+        if self.mode == 'replay':
+            entry = self.interactions.get(key)
+            if entry is None:
+                raise CassetteMiss(f"No recorded Steam response for {key}")
+            return self._response(url, entry)
+
+        response = session.get(url, params=params, timeout=timeout)
+        entry = {
+            'status': response.status_code,
+            'headers': {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers},
+        }
+        try:
+            entry['json'] = response.json()
+        except ValueError:
+            entry['text'] = response.text
+        with self.lock:
+            self.interactions[key] = entry
+            self.save()
+        return response
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(
+            json.dumps({'interactions': self.interactions}, indent=2, sort_keys=True) + '\n', encoding='utf-8'
+        )
+
+    @staticmethod
+    def _response(url, entry):
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.headers = CaseInsensitiveDict(entry.get('headers', {}))
+        body = json.dumps(entry['json']) if 'json' in entry else entry.get('text', '')
+        response._content = body.encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = url
+        return response
+
+
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette():
+    """
+    Кассета из настроек STEAM_API_CASSETTE / STEAM_API_CASSETTE_MODE
+    или None, если запросы идут в сеть напрямую. Файл читается один раз.
+    """
+    path = settings.STEAM_API_CASSETTE
+    if not path:
+        return None
+    key = (str(path), settings.STEAM_API_CASSETTE_MODE)
+    with _cassettes_lock:
+        if key not in _cassettes:
+            _cassettes[key] = Cassette(*key)
+        return _cassettes[key]
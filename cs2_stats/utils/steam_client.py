@@ -0,0 +1,246 @@
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+from . import metrics
+from .steam_cassette import get_cassette
+from .timing import timed_function
+
+
+# HTTP статусы, при которых запрос к Steam имеет смысл повторить
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты запросов (token bucket).
+    Один экземпляр разделяется всеми потоками процесса:
+    каждый запрос забирает токен, токены пополняются с постоянной скоростью.
+    """
+
+    def __init__(self, rate, capacity):
+        """
+        Args:
+            rate (float): Скорость пополнения (токенов в секунду), 0 - без ограничений
+            capacity (int): Максимальный запас токенов (размер всплеска)
+        """
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Забирает один токен, при необходимости ожидая его появления.
+
+        Returns:
+            float: Время ожидания в секундах
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            # Спим вне блокировки, чтобы не задерживать другие потоки
+            time.sleep(delay)
+            waited += delay
+
+
+class SteamHTTPClient:
+    """
+    HTTP клиент для Steam Web API.
+    - держит пул keep-alive соединений (requests.Session)
+    - повторяет запросы при 429/5xx и сетевых ошибках с экспоненциальной
+      задержкой и случайным разбросом (jitter)
+    - соблюдает общий для процесса лимит частоты запросов
+    - считает запросы, повторы, ошибки и суммарную задержку
+    """
+
+    def __init__(self, timeout=(3.05, 10), max_retries=3, backoff_base=0.5,
+                 backoff_max=8.0, rate=10.0, burst=10, pool_size=10):
+        """
+        Args:
+            timeout (tuple): Таймауты (соединение, чтение) в секундах
+            max_retries (int): Максимум повторов одного запроса
+            backoff_base (float): Базовая задержка перед первым повтором
+            backoff_max (float): Верхняя граница задержки
+            rate (float): Запросов в секунду на процесс (0 - без ограничений)
+            burst (int): Допустимый всплеск запросов
+            pool_size (int): Размер пула соединений
+        """
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limiter = TokenBucket(rate, burst)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'requests': 0,          # Отправленные HTTP запросы (включая повторы)
+            'retries': 0,           # Повторы после 429/5xx/сетевых ошибок
+            'errors': 0,            # Запросы, завершившиеся ошибкой после всех попыток
+            'throttled': 0,         # Ответы 429 от Steam
+            'latency_seconds': 0.0, # Суммарное время HTTP запросов
+            'rate_limit_wait_seconds': 0.0,  # Суммарное ожидание лимитера
+        }
+
+    @timed_function('steam')
+    def get(self, url, params=None):
+        """
+        GET запрос с повторами и ограничением частоты.
+
+        Args:
+            url (str): Адрес метода Steam API
+            params (dict): Параметры запроса
+
+        Returns:
+            dict: Разобранный JSON ответа
+
+        Raises:
+            requests.RequestException: Если запрос не удался после всех попыток
+        """
+        endpoint = endpoint_name(url)
+        attempt = 0
+        while True:
+            waited = self.limiter.acquire()
+            started = time.perf_counter()
+            try:
+                response = self._send(url, params)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                status = 'timeout' if isinstance(e, requests.Timeout) else 'connection_error'
+                self._record(endpoint, status, started, waited)
+                if attempt >= self.max_retries:
+                    self._error(endpoint, status)
+                    raise
+            else:
+                self._record(endpoint, str(response.status_code), started, waited)
+                if response.status_code == 429:
+                    self._inc('throttled')
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    try:
+                        response.raise_for_status()
+                    except requests.HTTPError:
+                        self._error(endpoint, str(response.status_code))
+                        raise
+                    return response.json()
+                retry_after = self._retry_after(response)
+                if retry_after is not None:
+                    attempt += 1
+                    self._inc('retries')
+                    time.sleep(min(retry_after, self.backoff_max))
+                    continue
+
+            attempt += 1
+            self._inc('retries')
+            time.sleep(self._backoff(attempt))
+
+    def _send(self, url, params):
+        """Один HTTP запрос - в сеть или через кассету record/replay (STEAM_API_CASSETTE)."""
+        cassette = get_cassette()
+        if cassette is None:
+            return self.session.get(url, params=params, timeout=self.timeout)
+        return cassette.get(self.session, url, params, self.timeout)
+
+    def max_duration(self):
+        """
+        Верхняя оценка времени одного get() со всеми повторами (секунды):
+        каждая попытка - таймауты соединения и чтения, между попытками -
+        задержка не больше backoff_max (в том числе по Retry-After).
+        Ожидание лимитера частоты не учитывается.
+        """
+        connect, read = self.timeout if isinstance(self.timeout, tuple) else (self.timeout, self.timeout)
+        return (self.max_retries + 1) * (connect + read) + self.max_retries * self.backoff_max
+
+    def _backoff(self, attempt):
+        """Экспоненциальная задержка с полным jitter: random(0, base * 2^n)."""
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+    @staticmethod
+    def _retry_after(response):
+        """Значение заголовка Retry-After в секундах (если Steam его прислал)."""
+        value = response.headers.get('Retry-After')
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return None
+
+    def _record(self, endpoint, status, started, waited):
+        latency = time.perf_counter() - started
+        with self._metrics_lock:
+            self._metrics['requests'] += 1
+            self._metrics['latency_seconds'] += latency
+            self._metrics['rate_limit_wait_seconds'] += waited
+        # Общие для всех процессов метрики (/metrics)
+        metrics.STEAM_REQUESTS.inc(endpoint=endpoint, status=status)
+        metrics.STEAM_SECONDS.observe(latency, endpoint=endpoint)
+        if waited:
+            metrics.STEAM_RATE_LIMIT_WAIT.inc(waited)
+
+    def _error(self, endpoint, reason):
+        self._inc('errors')
+        metrics.STEAM_ERRORS.inc(endpoint=endpoint, reason=reason)
+
+    def _inc(self, name):
+        with self._metrics_lock:
+            self._metrics[name] += 1
+
+    def metrics(self):
+        """
+        Снимок счетчиков клиента.
+
+        Returns:
+            dict: Копия счетчиков (requests, retries, errors, throttled,
+                  latency_seconds, rate_limit_wait_seconds)
+        """
+        with self._metrics_lock:
+            return dict(self._metrics)
+
+
+def endpoint_name(url):
+    """Метод Steam API из адреса: .../ISteamUser/GetPlayerSummaries/v2/ -> GetPlayerSummaries."""
+    parts = [part for part in url.split('/') if part]
+    return parts[-2] if len(parts) >= 2 else url
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Возвращает общий для процесса экземпляр SteamHTTPClient.
+    Создается при первом обращении с параметрами из настроек Django.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = SteamHTTPClient(
+                    timeout=(settings.STEAM_API_CONNECT_TIMEOUT, settings.STEAM_API_READ_TIMEOUT),
+                    max_retries=settings.STEAM_API_MAX_RETRIES,
+                    rate=settings.STEAM_API_RATE_LIMIT,
+                    burst=settings.STEAM_API_RATE_BURST,
+                    pool_size=settings.STEAM_API_POOL_SIZE,
+                )
+    return _client
@@ -0,0 +1,166 @@
+import contextvars
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+
+from django.template.backends.django import DjangoTemplates
+
+# Замеры текущего запроса. Устанавливается ServerTimingMiddleware;
+# вне запроса (команды, воркеры) и при выключенном REQUEST_TIMING - None,
+# и все хуки ниже сводятся к одному чтению contextvar
+_current = contextvars.ContextVar('cs2_stats_request_timings', default=None)
+
+_NOT_TIMED = nullcontext()
+
+
+class RequestTimings:
+    """
+    Замеры одного запроса по этапам: число вызовов и суммарное время.
+    Этапы могут быть вложенными, а параллельные вызовы (запросы к Steam
+    в пуле потоков) суммируются, поэтому сумма этапов может быть больше
+    общего времени запроса.
+    """
+
+    def __init__(self):
+        self.stages = {}  # этап -> [число вызовов, секунды]
+        self.lock = threading.Lock()  # Этапы добавляются и из потоков пула Steam
+
+    def add(self, stage, seconds):
+        with self.lock:
+            entry = self.stages.setdefault(stage, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def measure_query(self, execute, sql, params, many, context):
+        """Обертка connection.execute_wrapper: время и число SQL-запросов."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add('db', time.perf_counter() - started)
+
+    def as_dict(self):
+        """{этап: {'count': ..., 'ms': ...}} - для структурированного лога."""
+        with self.lock:
+            return {stage: {'count': count, 'ms': round(seconds * 1000, 2)}
+                    for stage, (count, seconds) in self.stages.items()}
+
+    def header(self, total):
+        """
+        Значение заголовка Server-Timing.
+
+        Args:
+            total (float): Общее время запроса в секундах
+
+        Returns:
+            str: Например: db;dur=4.20;desc="7 calls", steam;dur=0.00;desc="0 calls", total;dur=12.50
+        """
+        metrics = [
+            f'{stage};dur={entry["ms"]:.2f};desc="{entry["count"]} calls"'
+            for stage, entry in self.as_dict().items()
+        ]
+        metrics.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(metrics)
+
+
+def start_request():
+    """
+    Начинает сбор замеров в текущем контексте.
+
+    Returns:
+        tuple: (RequestTimings, токен для finish_request)
+    """
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def finish_request(token):
+    """Заканчивает сбор замеров, начатый start_request."""
+    _current.reset(token)
+
+
+def timed(stage):
+    """
+    Контекстный менеджер: время блока добавляется к этапу stage текущего запроса.
+    Вне запроса ничего не измеряет.
+
+    Пример:
+        with timed('steam'):
+            response = session.get(url)
+    """
+    timings = _current.get()
+    if timings is None:
+        return _NOT_TIMED
+    return _Measure(timings, stage)
+
+
+def timed_function(stage):
+    """Декоратор: время каждого вызова функции добавляется к этапу stage."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            timings = _current.get()
+            if timings is None:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings.add(stage, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def bind_context(func):
+    """
+    Привязывает функцию к текущему контексту - для задач пула потоков,
+    которые не наследуют contextvars: их замеры попадут в запрос,
+    который их запустил. Для каждой задачи нужна своя привязка.
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(func, *args, **kwargs)
+
+
+class _Measure:
+    """Замер одного блока with timed(...)."""
+
+    __slots__ = ('timings', 'stage', 'started')
+
+    def __init__(self, timings, stage):
+        self.timings = timings
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.timings.add(self.stage, time.perf_counter() - self.started)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    Шаблонизатор Django, который добавляет время рендеринга шаблонов
+    к этапу 'template' (включая вложенные extends/include).
+    Подключается в TEMPLATES['BACKEND'] вместо DjangoTemplates.
+    """
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+class _TimedTemplate:
+    """Обертка шаблона: замеряет render, остальное передает исходному шаблону."""
+
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return self._template.render(context, request)
@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+
+from ..models import MonthlyStat, PlayerTrend
+
+# Показатели, для которых считаются тренды
+TREND_METRICS = ('kd', 'win_rate')
+
+# Минимум месяцев, чтобы искать аномалии (по 2-3 точкам z-оценка бессмысленна)
+MIN_ANOMALY_MONTHS = 4
+
+# Знаков после запятой в сохраняемых рядах
+PRECISION = 3
+
+
+def load_frame(player_ids=None):
+    """
+    Выгружает месячную статистику одним запросом в DataFrame.
+    Месяцы без матчей в тренды не входят.
+
+    Returns:
+        pd.DataFrame: Строки, отсортированные по игроку, году и месяцу
+    """
+    columns = ['player_id', 'year', 'month', 'matches_played', 'kills', 'deaths', 'wins']
+    stats = MonthlyStat.objects.filter(matches_played__gt=0).order_by('player_id', 'year', 'month')
+    if player_ids is not None:
+        stats = stats.filter(player_id__in=player_ids)
+    return pd.DataFrame.from_records(list(stats.values_list(*columns)), columns=columns)
+
+
+def compute_frame(df):
+    """
+    Считает тренды для всех игроков сразу, векторно по группам pandas.
+    Добавляет колонки: kd, win_rate, <metric>_avg, <metric>_delta, <metric>_z
+    и возвращает наклоны регрессии по игрокам.
+
+    Args:
+        df (pd.DataFrame): Результат load_frame()
+
+    Returns:
+        tuple: (df, slopes) - slopes: DataFrame с колонками <metric>_slope по player_id
+    """
+    df = df.copy()
+    deaths = df['deaths'].to_numpy()
+    df['kd'] = np.divide(df['kills'].to_numpy(), deaths, out=np.zeros(len(df)), where=deaths > 0)
+    df['win_rate'] = df['wins'] / df['matches_played'] * 100
+    # Ось X регрессии - порядковый номер месяца с матчами, как у скользящего
+    # среднего и изменения к прошлому месяцу: пропущенные месяцы не учитываются
+    df['t'] = df.groupby('player_id', sort=False).cumcount()
+
+    groups = df.groupby('player_id', sort=False)
+    months = groups['t'].transform('size')
+    t_centered = df['t'] - groups['t'].transform('mean')
+
+    slopes = pd.DataFrame(index=groups.size().index)
+    for metric in TREND_METRICS:
+        column = groups[metric]
+        # Строки отсортированы по игроку, поэтому порядок результата rolling совпадает с df
+        df[f'{metric}_avg'] = (column.rolling(settings.TREND_WINDOW, min_periods=1).mean()
+                               .to_numpy())
+        df[f'{metric}_delta'] = column.diff()
+
+        std = column.transform('std', ddof=0)
+        z = (df[metric] - column.transform('mean')) / std.where(std > 0)
+        df[f'{metric}_z'] = z.where(months >= MIN_ANOMALY_MONTHS)
+
+        # Наклон МНК: sum(dt * dy) / sum(dt^2) по каждому игроку
+        y_centered = df[metric] - column.transform('mean')
+        numerator = (t_centered * y_centered).groupby(df['player_id'], sort=False).sum()
+        denominator = (t_centered ** 2).groupby(df['player_id'], sort=False).sum()
+        slopes[f'{metric}_slope'] = (numerator / denominator.where(denominator > 0)).fillna(0.0)
+
+    return df, slopes
+
+
+def _rounded(values):
+    """Ряд для JSON: округленные значения, NaN -> None."""
+    return [None if np.isnan(value) else round(value, PRECISION) for value in values.tolist()]
+
+
+def build_trends(df, slopes):
+    """
+    Превращает посчитанный DataFrame в объекты PlayerTrend (без сохранения).
+    Строки одного игрока идут подряд, поэтому они нарезаются по границам групп.
+    """
+    if df.empty:
+        return []
+
+    player_ids = df['player_id'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, player_ids[1:] != player_ids[:-1]])
+    ends = np.r_[starts[1:], len(df)]
+    labels = (df['year'].astype(str) + '-' + df['month'].astype(str).str.zfill(2)).to_numpy()
+    columns = {
+        name: df[name].to_numpy(dtype=float)
+        for metric in TREND_METRICS for name in (f'{metric}_avg', f'{metric}_delta', f'{metric}_z')
+    }
+    slopes = slopes.to_dict('index')
+    threshold = settings.TREND_ANOMALY_Z
+
+    trends = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        player_id = int(player_ids[start])
+        series = {'labels': labels[start:end].tolist()}
+        anomalies = []
+        for metric in TREND_METRICS:
+            series[f'{metric}_avg'] = _rounded(columns[f'{metric}_avg'][start:end])
+            series[f'{metric}_delta'] = _rounded(columns[f'{metric}_delta'][start:end])
+            z = columns[f'{metric}_z'][start:end]
+            for index in np.flatnonzero(np.abs(np.nan_to_num(z)) > threshold).tolist():
+                anomalies.append({'label': series['labels'][index], 'metric': metric,
+                                  'z': round(float(z[index]), 2)})
+        series['anomalies'] = sorted(anomalies, key=lambda anomaly: anomaly['label'])
+
+        trends.append(PlayerTrend(
+            player_id=player_id,
+            months=end - start,
+            kd_slope=round(slopes[player_id]['kd_slope'], 4),
+            win_rate_slope=round(slopes[player_id]['win_rate_slope'], 4),
+            kd_delta=series['kd_delta'][-1],
+            win_rate_delta=series['win_rate_delta'][-1],
+            series=series,
+        ))
+    return trends
+
+
+def compute_trends(player_ids=None):
+    """
+    Пересчитывает тренды игроков одним пакетом: одна выгрузка MonthlyStat,
+    векторный расчет в pandas и upsert результатов.
+
+    Args:
+        player_ids (iterable): Пересчитать только этих игроков (None - всех)
+
+    Returns:
+        dict: players (сохранено трендов), deleted (игроки без матчей), rows (строк статистики)
+    """
+    if player_ids is not None:
+        player_ids = list(player_ids)
+
+    df = load_frame(player_ids)
+    trends = build_trends(*compute_frame(df)) if not df.empty else []
+
+    # Тренды игроков, у которых не осталось месяцев с матчами
+    stale = PlayerTrend.objects.exclude(
+        player_id__in=MonthlyStat.objects.filter(matches_played__gt=0).values('player_id')
+    )
+    if player_ids is not None:
+        stale = stale.filter(player_id__in=player_ids)
+
+    with transaction.atomic():
+        deleted, _ = stale.delete()
+        PlayerTrend.objects.bulk_create(
+            trends, batch_size=500, update_conflicts=True, unique_fields=['player'],
+            update_fields=['months', 'kd_slope', 'win_rate_slope', 'kd_delta',
+                           'win_rate_delta', 'series', 'computed_at'],
+        )
+    return {'players': len(trends), 'deleted': deleted, 'rows': len(df)}
@@ -1,8 +1,37 @@
+import codecs
+import hashlib
+import hmac
+import json
+from itertools import islice
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db.models import Count, Exists, Max, OuterRef, Subquery
+from django.db.models.functions import Lower
+from django.http import (
+    HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse,
+)
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from django.contrib import messages
-from .models import Player, MonthlyStat
-from .forms import MonthlyStatForm
-from .utils.chart_utils import prepare_all_charts, calculate_total_stats
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_GET, require_POST
+from .models import Player, MonthlyStat, SteamRefreshJob, LeaderboardEntry, PlayerTrend, PercentileSketch
+from .forms import MonthlyStatForm, StatImportForm
+from .utils.chart_utils import build_chart_specs, charts_to_json
+from .utils.chart_cache import get_cached_chart_json
+from .utils.exporter import DATASETS, FORMATS, export_chunks, gzip_chunks, parse_watermark
+from .utils.importer import detect_format, import_stats, iter_rows
+from .utils.leaderboard import leaderboard_queryset
+from .utils.matches import ingest_matches
+from .utils.metrics import REGISTRY
+from .utils.pagination import keyset_paginate
+from .utils.percentiles import player_percentiles
+from .utils.player_search import search_players
+from .utils.stat_series import StatSeries
 
 
 def home(request):
@@ -17,55 +46,280 @@ def player_search(request):
     """
     Обработчик поиска игрока.
     Если игрок найден - перенаправляет на его профиль.
-    Если не найден - создает нового и обновляет данные из Steam.
+    Если не найден - создает нового и ставит загрузку данных из Steam
+    в фоновую очередь, не дожидаясь ответа Steam.
+    Запрос не из цифр - ник: перенаправляет в каталог игроков с поиском
+    (игрок со Steam ID из букв не создается).
     """
     if request.method == 'POST':
         steam_id = request.POST.get('steam_id', '').strip()
 
+        # Не число - это не Steam ID, а ник: ищем в каталоге игроков
+        if steam_id and not steam_id.isdigit():
+            return redirect(f"{reverse('player_directory')}?{urlencode({'q': steam_id})}")
+
         if steam_id:
-            # Проверяем есть ли игрок в базе данных
-            player = Player.objects.filter(steam_id=steam_id).first()
+            # Атомарно находим или создаем игрока: одновременные поиски
+            # одного нового Steam ID не упадут на уникальности steam_id
+            player, created = Player.objects.get_or_create(steam_id=steam_id)
 
-            if player:
-                # Игрок существует - переходим к профилю
-                return redirect('player_profile', steam_id=steam_id)
-            else:
-                # Создаем нового игрока
-                player = Player.objects.create(steam_id=steam_id)
-                # Обновляем данные из Steam API
-                player.update_from_steam()
-                return redirect('player_profile', steam_id=steam_id)
+            # Новый игрок - заглушка, данные придут из Steam в фоне.
+            # Существующего обновляем, если данные устарели.
+            # Очередь не создаст вторую задачу для того же Steam ID.
+            if created or not player.is_steam_data_fresh():
+                SteamRefreshJob.enqueue(steam_id)
+            return redirect('player_profile', steam_id=steam_id)
 
     # Если не POST запрос - возвращаем на главную
     return redirect('home')
 
 
+def player_directory(request):
+    """
+    Каталог игроков с поиском по нику или Steam ID (параметр q).
+    Без запроса - все игроки по алфавиту, страницы переключаются курсором.
+    Подсказки при вводе загружаются из api.search_players.
+    """
+    query = request.GET.get('q', '').strip()
+    page = None
+    results = []
+    if query:
+        results = search_players(query, limit=settings.PLAYER_SEARCH_LIMIT)
+    else:
+        players = Player.objects.annotate(nickname_lower=Lower('nickname'))
+        try:
+            page = keyset_paginate(players, ('nickname_lower', 'id'), cursor=request.GET.get('cursor'),
+                                   per_page=settings.PLAYER_DIRECTORY_PAGE_SIZE)
+        except ValueError:
+            page = keyset_paginate(players, ('nickname_lower', 'id'),
+                                   per_page=settings.PLAYER_DIRECTORY_PAGE_SIZE)
+        results = page.items
+
+    context = {
+        'query': query,
+        'players': results,
+        'next_cursor': page.next_cursor if page else None,
+        'is_first_page': page is None or page.start == 1,
+    }
+    return render(request, 'cs2_stats/players.html', context)
+
+
+def _profile_state(request, steam_id):
+    """
+    Все, от чего зависит страница профиля, одним запросом:
+    время обновления игрока из Steam, количество и последнее изменение
+    месячной статистики, время расчета трендов, последняя перестройка
+    распределений процентилей (build_percentiles), наличие задачи обновления
+    и ждет ли она повтора после неудачной попытки.
+    Результат запоминается в request - его используют и ETag, и Last-Modified.
+
+    Returns:
+        dict: Состояние профиля или None, если игрока нет
+    """
+    if not hasattr(request, '_profile_state'):
+        active_jobs = SteamRefreshJob.objects.filter(
+            steam_id=OuterRef('steam_id'), status__in=SteamRefreshJob.ACTIVE_STATUSES
+        )
+        # Процентили на странице меняются при перестройке распределений любого месяца
+        percentiles_built_at = PercentileSketch.objects.order_by('-built_at').values('built_at')[:1]
+        request._profile_state = (
+            Player.objects.filter(steam_id=steam_id)
+            .annotate(
+                stats_count=Count('monthly_stats'),
+                stats_updated_at=Max('monthly_stats__updated_at'),
+                percentiles_built_at=Subquery(percentiles_built_at),
+                refresh_pending=Exists(active_jobs),
+                refresh_retrying=Exists(active_jobs.filter(status=SteamRefreshJob.PENDING, attempts__gt=0)),
+            )
+            .values('last_updated', 'trend__computed_at', 'stats_count', 'stats_updated_at',
+                    'percentiles_built_at', 'refresh_pending', 'refresh_retrying')
+            .first()
+        )
+    return request._profile_state
+
+
+def profile_etag(request, steam_id):
+    """
+    ETag профиля. Количество записей входит в ETag, поэтому удаление
+    месячной статистики тоже меняет его (время изменения при удалении не растет).
+    """
+    state = _profile_state(request, steam_id)
+    if state is None:
+        return None
+    key = '|'.join(str(state[field]) for field in (
+        'last_updated', 'trend__computed_at', 'stats_count', 'stats_updated_at',
+        'percentiles_built_at', 'refresh_pending', 'refresh_retrying',
+    ))
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def profile_last_modified(request, steam_id):
+    """Last-Modified профиля - самое позднее из времен изменения его данных."""
+    state = _profile_state(request, steam_id)
+    if state is None:
+        return None
+    return max(value for value in (
+        state['last_updated'], state['trend__computed_at'], state['stats_updated_at'],
+        state['percentiles_built_at'],
+    ) if value is not None)
+
+
+# Условный GET: если у клиента актуальная копия, возвращается 304
+# без загрузки статистики и построения графиков.
+# no-cache - браузер хранит страницу, но проверяет ее при каждом открытии.
+@cache_control(no_cache=True)
+@condition(etag_func=profile_etag, last_modified_func=profile_last_modified)
 def player_profile(request, steam_id):
     """
     Страница профиля игрока.
     Отображает:
     - Информацию об игроке из Steam
     - Месячную статистику в виде таблицы
-    - Интерактивные графики прогресса
+    - Интерактивные графики прогресса (данные загружаются отдельно
+      из player_charts_json, когда блок графиков появляется на экране)
     - Общую сводную статистику
     """
-    player = get_object_or_404(Player, steam_id=steam_id)
-    monthly_stats = player.monthly_stats.all().order_by('year', 'month')
+    player = get_object_or_404(Player.objects.select_related('trend'), steam_id=steam_id)
+    trend = _player_trend(player)
+
+    # Вся месячная статистика загружается одним запросом в колоночном виде
+    series = StatSeries.from_queryset(player.monthly_stats.all())
+
+    # Версия в URL данных графиков - браузер может хранить их, пока она не изменится
+    charts_url = f"{reverse('player_charts_json', args=[steam_id])}?v={profile_etag(request, steam_id)}"
+    # Итоги за все время и по годам хранятся готовыми (YearStat и поля Player)
+    total_stats = player.total_stats()
+    year_stats = player.year_stats.all()
+    monthly_stats = series.rows()  # Строки для таблиц шаблона
+
+    # Сравнение последнего месяца с матчами со всеми игроками за тот же месяц
+    percentiles = None
+    played = series.has_matches.nonzero()[0]
+    if len(played):
+        last = played[-1]
+        year, month = int(series.years[last]), int(series.months[last])
+        percentiles = player_percentiles(
+            year, month, int(series.matches[last]), int(series.kills[last]),
+            int(series.deaths[last]), int(series.wins[last]),
+            # Та же версия распределений, что и в ETag страницы
+            version=_profile_state(request, steam_id)['percentiles_built_at'],
+        )
+        if percentiles:
+            percentiles['label'] = series.labels[last]
 
-    # Подготавливаем графики и общую статистику
-    charts = prepare_all_charts(monthly_stats)
-    total_stats = calculate_total_stats(monthly_stats)
+    # Данные из Steam еще загружаются фоновым воркером
+    # (уже известно из запроса состояния профиля для ETag).
+    # После неудачной попытки повтор будет не скоро - страница не перезагружается
+    state = _profile_state(request, steam_id)
 
     context = {
         'player': player,
         'monthly_stats': monthly_stats,
-        'charts': charts,
+        'has_charts': bool(series),
+        'charts_url': charts_url,
         'total_stats': total_stats,
+        'year_stats': year_stats,
+        'percentiles': percentiles,
+        'trend': trend,
+        'steam_refresh_pending': state['refresh_pending'],
+        'steam_refresh_retrying': state['refresh_retrying'],
     }
 
     return render(request, 'cs2_stats/player_profile.html', context)
 
 
+@condition(etag_func=profile_etag, last_modified_func=profile_last_modified)
+def player_charts_json(request, steam_id):
+    """
+    Данные всех графиков профиля одним компактным JSON для Plotly.
+    Запрос с актуальной версией (?v=ETag профиля) можно кэшировать
+    в браузере надолго: при изменении данных страница профиля
+    выдаст новый URL. Без версии ответ проверяется при каждом запросе.
+    """
+    player = get_object_or_404(Player.objects.select_related('trend'), steam_id=steam_id)
+    trend = _player_trend(player)
+
+    # Статистика загружается только если JSON нет в кэше: он меняется
+    # только вместе со статистикой игрока или после нового расчета трендов
+    payload = get_cached_chart_json(
+        player.pk,
+        lambda: charts_to_json(build_chart_specs(StatSeries.from_queryset(player.monthly_stats.all()), trend)),
+        variant=f"trend{trend.computed_at.timestamp()}" if trend else '',
+    )
+
+    response = HttpResponse(payload, content_type='application/json')
+    if request.GET.get('v') == profile_etag(request, steam_id):
+        patch_cache_control(response, private=True, max_age=settings.CHART_CACHE_TTL)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def _player_trend(player):
+    """Готовые тренды игрока (команда compute_trends) или None."""
+    try:
+        return player.trend
+    except PlayerTrend.DoesNotExist:
+        return None
+
+
+def leaderboard(request):
+    """
+    Рейтинг игроков по K/D, win rate или убийствам за матч.
+    Фильтры: год (по умолчанию - все время), страна, минимум матчей.
+    Строки читаются из таблицы LeaderboardEntry по индексу,
+    страницы переключаются курсором (keyset-пагинация).
+    """
+    metric = request.GET.get('metric', 'kd')
+    if metric not in LeaderboardEntry.METRICS:
+        metric = 'kd'
+
+    try:
+        year = int(request.GET.get('year') or LeaderboardEntry.ALL_TIME)
+    except ValueError:
+        year = LeaderboardEntry.ALL_TIME
+    try:
+        min_matches = max(0, int(request.GET.get('min_matches', settings.LEADERBOARD_MIN_MATCHES)))
+    except ValueError:
+        min_matches = settings.LEADERBOARD_MIN_MATCHES
+    country = request.GET.get('country', '').strip().upper()
+
+    queryset = leaderboard_queryset(metric, year=year, country=country, min_matches=min_matches)
+    try:
+        page = keyset_paginate(queryset, (f'-{metric}', 'player_id'),
+                               cursor=request.GET.get('cursor'),
+                               per_page=settings.LEADERBOARD_PAGE_SIZE)
+    except ValueError:
+        # Поврежденный курсор - показываем первую страницу
+        page = keyset_paginate(queryset, (f'-{metric}', 'player_id'),
+                               per_page=settings.LEADERBOARD_PAGE_SIZE)
+
+    # Значения фильтров для формы (читаются по индексам таблицы рейтинга)
+    years = (LeaderboardEntry.objects.exclude(year=LeaderboardEntry.ALL_TIME)
+             .order_by('-year').values_list('year', flat=True).distinct())
+    countries = (LeaderboardEntry.objects.filter(year=LeaderboardEntry.ALL_TIME).exclude(country='')
+                 .order_by('country').values_list('country', flat=True).distinct())
+
+    # Параметры фильтров без курсора - для ссылок на следующую и первую страницу
+    params = request.GET.copy()
+    params.pop('cursor', None)
+
+    context = {
+        'entries': list(enumerate(page.items, start=page.start)),
+        'next_cursor': page.next_cursor,
+        'is_first_page': page.start == 1,
+        'query': params.urlencode(),
+        'metric': metric,
+        'metrics': LeaderboardEntry.METRICS,
+        'year': year,
+        'years': years,
+        'country': country,
+        'countries': countries,
+        'min_matches': min_matches,
+    }
+    return render(request, 'cs2_stats/leaderboard.html', context)
+
+
 def add_monthly_stat(request, steam_id):
     """
     Добавление новой статистики за месяц.
@@ -97,6 +351,43 @@ def add_monthly_stat(request, steam_id):
     return render(request, 'cs2_stats/add_stat.html', context)
 
 
+def import_monthly_stats(request, steam_id):
+    """
+    Загрузка месячной статистики игрока из файла CSV или JSONL.
+    Файл читается построчно и записывается пачками, существующие
+    месяцы обновляются. После импорта показывается отчет
+    с отклоненными строками.
+    """
+    player = get_object_or_404(Player, steam_id=steam_id)
+    report = None
+
+    if request.method == 'POST':
+        form = StatImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            # Загруженный файл читается по строкам, без загрузки в память целиком
+            lines = codecs.iterdecode(upload, 'utf-8-sig')
+            try:
+                report = import_stats(iter_rows(lines, detect_format(upload.name)), player=player)
+            except UnicodeDecodeError:
+                # Пачки до ошибки уже записаны - каждая в своей транзакции
+                form.add_error('file', "The file is not UTF-8 text. "
+                                       "Rows before the first invalid byte may already be imported.")
+            else:
+                if report.imported:
+                    messages.success(request, f'✅ Imported {report.imported} monthly statistics!')
+    else:
+        form = StatImportForm()
+
+    context = {
+        'player': player,
+        'form': form,
+        'report': report,
+        'stat_fields': ', '.join(MonthlyStatForm.Meta.fields),  # Колонки файла для подсказки
+    }
+    return render(request, 'cs2_stats/import_stats.html', context)
+
+
 def edit_monthly_stat(request, stat_id):
     """
     Редактирование существующей статистики.
@@ -132,4 +423,110 @@ def delete_monthly_stat(request, stat_id):
 
     stat.delete()
     messages.success(request, '✅ Statistics deleted successfully!')
-    return redirect('player_profile', steam_id=steam_id)
\ No newline at end of file
+    return redirect('player_profile', steam_id=steam_id)
+
+
+def export_data(request, dataset, fmt):
+    """
+    Потоковая выгрузка игроков или месячной статистики в CSV/JSONL.
+    Параметры запроса:
+    - since: только строки, измененные начиная с этого времени (ISO 8601)
+    - gzip=1: сжимать ответ на лету
+    Доступна staff-пользователям или по токену EXPORT_API_TOKEN.
+    В заголовке X-Export-Watermark возвращается время начала выгрузки -
+    его нужно передать в since при следующей инкрементальной выгрузке.
+    """
+    if dataset not in DATASETS or fmt not in FORMATS:
+        return HttpResponseBadRequest(f"Unknown export: {dataset}.{fmt}")
+    if not _token_allowed(request, settings.EXPORT_API_TOKEN):
+        return HttpResponseForbidden("Export requires a staff account or a valid token")
+
+    since = None
+    if request.GET.get('since'):
+        try:
+            since = parse_watermark(request.GET['since'])
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+
+    # Водяной знак берется до чтения данных: строки, измененные во время
+    # выгрузки, попадут и в следующую выгрузку
+    watermark = timezone.now()
+    chunks = export_chunks(dataset, fmt, since)
+    filename = f"{dataset}.{fmt}"
+    if request.GET.get('gzip') == '1':
+        response = StreamingHttpResponse(gzip_chunks(chunks), content_type='application/gzip')
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(chunks, content_type=f"{FORMATS[fmt]}; charset=utf-8")
+
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['X-Export-Watermark'] = watermark.isoformat()
+    patch_cache_control(response, no_store=True)
+    return response
+
+
+@csrf_exempt
+@require_POST
+def ingest_matches_api(request):
+    """
+    Пакетная загрузка матчей: тело запроса - JSONL (объект матча на строку)
+    или JSON-массив объектов, не больше MATCH_INGEST_MAX_BATCH матчей.
+    Поля матча: steam_id, played_at, map_name, kills, deaths, result, external_id.
+    Весь пакет записывается одной транзакцией вместе с месячной статистикой.
+    Доступна только по токену MATCH_INGEST_TOKEN: CSRF для нее отключен,
+    поэтому сессия staff-пользователя не подходит.
+
+    Returns:
+        JsonResponse: Отчет загрузки (ingested, skipped, rejected, errors)
+    """
+    if not _token_allowed(request, settings.MATCH_INGEST_TOKEN, allow_staff=False):
+        return JsonResponse({'error': "Ingestion requires a valid token"}, status=403)
+
+    limit = settings.MATCH_INGEST_MAX_BATCH
+    if request.content_type == 'application/json':
+        try:
+            payload = json.loads(request.body)
+        except ValueError as e:
+            return JsonResponse({'error': f"Invalid JSON: {e}"}, status=400)
+        if not isinstance(payload, list):
+            return JsonResponse({'error': "Expected a JSON array of matches"}, status=400)
+        rows = [(index, row if isinstance(row, dict) else "Expected a JSON object")
+                for index, row in enumerate(payload[:limit + 1], start=1)]
+    else:
+        # JSONL читается из запроса построчно
+        rows = list(islice(iter_rows(codecs.iterdecode(request, 'utf-8'), 'jsonl'), limit + 1))
+    if len(rows) > limit:
+        return JsonResponse({'error': f"At most {limit} matches per request"}, status=413)
+
+    report = ingest_matches(rows, chunk_size=limit)
+    return JsonResponse({
+        'rows': report.rows,
+        'ingested': report.imported,
+        'skipped': report.skipped,
+        'rejected': report.rejected,
+        'errors': [{'line': line, 'error': message} for line, message in report.errors],
+    })
+
+
+@require_GET
+def metrics(request):
+    """
+    Метрики всех процессов приложения в текстовом формате Prometheus:
+    время запросов по представлениям, вызовы и ошибки Steam API,
+    попадания в кэши, время построения графиков.
+    Доступ - staff или заголовок "Authorization: Bearer <METRICS_TOKEN>".
+    """
+    if not _token_allowed(request, settings.METRICS_TOKEN):
+        return HttpResponseForbidden("Metrics require a staff account or a valid token")
+
+    # Свои приращения - в общее хранилище, чтобы ответ их уже учитывал
+    REGISTRY.flush()
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _token_allowed(request, token, allow_staff=True):
+    """Запрос с заголовком "Authorization: Bearer <token>" (или staff-пользователя, если allow_staff)."""
+    if allow_staff and request.user.is_authenticated and request.user.is_staff:
+        return True
+    header = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(header.encode(), f"Bearer {token}".encode())